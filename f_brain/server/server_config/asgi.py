@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Mode ASGI (endpoints asynchrones sous /api/async/) :
+    uvicorn server_config.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+ou, avec docker-compose : SERVER_MODE=asgi docker-compose up
 """
 
 import os
@@ -14,3 +18,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server_config.settings')
 
 application = get_asgi_application()
+
+# Une seule boucle d'événements par processus : un AsyncClient httpx partagé
+from weather.http_client import enable_shared_async_client  # noqa: E402
+
+enable_shared_async_client()
+
+# Tampon write-behind : déposé dans le spool sur SIGTERM/SIGINT
+from weather.ingest import start_write_behind  # noqa: E402
+
+start_write_behind()
@@ -17,8 +17,10 @@ from pathlib import Path
 # Import Celery components
 try:
     from celery.schedules import crontab
+    from kombu import Queue
 except ImportError:
     crontab = None
+    Queue = None
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -62,10 +64,14 @@ INSTALLED_APPS = [
     "rest_framework",
     "django_celery_results",  # For storing Celery task results in database
     "django_celery_beat",  # For periodic task scheduling
+    "django_prometheus",  # Métriques Prometheus (/metrics)
     "weather",  # Custom app for weather search
 ]
 
 MIDDLEWARE = [
+    # Latence par vue (django-prometheus) : premier et dernier middlewares
+    "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "weather.metrics.RequestMetricsMiddleware",  # En cours, requêtes SQL par requête
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # WhiteNoise pour les fichiers statiques
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -75,6 +81,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django_prometheus.middleware.PrometheusAfterMiddleware",
 ]
 
 ROOT_URLCONF = "server_config.urls"
@@ -153,6 +160,179 @@ else:
     DATABASES = {"default": sqlite_db}
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# "default" : cache local au processus (L1)
+# "shared"  : cache partagé entre les conteneurs web/celery (L2), Redis
+#             (REDIS_URL, paquet `redis`). Sans Redis, pas de L2 : chaque
+#             processus n'utilise que son cache local (un cache en base
+#             coûterait plusieurs requêtes SQL par lecture/verrou).
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "weather-l1",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+if REDIS_URL:
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+
+# Cache de la météo actuelle (voir weather/services.py)
+WEATHER_CACHE_L1_ALIAS = "default"
+WEATHER_CACHE_L2_ALIAS = "shared" if REDIS_URL else None
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))  # secondes
+WEATHER_CACHE_L1_TTL = int(os.getenv("WEATHER_CACHE_L1_TTL", "30"))  # secondes
+WEATHER_CACHE_LOCK_TIMEOUT = int(os.getenv("WEATHER_CACHE_LOCK_TIMEOUT", "10"))
+
+
+# ================================
+# OPENWEATHERMAP
+# ================================
+
+OPENWEATHERMAP_API_KEY = os.getenv(
+    "OPENWEATHERMAP_API_KEY",
+    os.getenv("OPENWEATHER_API_KEY", "ee56bd2e1c87bf3900aa88cfd2cee8ac"),
+)
+OPENWEATHERMAP_BASE_URL = os.getenv(
+    "OPENWEATHERMAP_BASE_URL", "https://api.openweathermap.org/data/2.5"
+)
+
+# Client HTTP partagé (voir weather/http_client.py)
+OPENWEATHERMAP_CONNECT_TIMEOUT = float(os.getenv("OPENWEATHERMAP_CONNECT_TIMEOUT", "3.05"))
+OPENWEATHERMAP_READ_TIMEOUT = float(os.getenv("OPENWEATHERMAP_READ_TIMEOUT", "10"))
+OPENWEATHERMAP_MAX_RETRIES = int(os.getenv("OPENWEATHERMAP_MAX_RETRIES", "2"))
+OPENWEATHERMAP_BACKOFF_FACTOR = float(os.getenv("OPENWEATHERMAP_BACKOFF_FACTOR", "0.3"))
+OPENWEATHERMAP_BACKOFF_JITTER = float(os.getenv("OPENWEATHERMAP_BACKOFF_JITTER", "0.3"))
+# Au plus 1 nouvelle tentative pour 5 requêtes (réserve de 10 jetons)
+OPENWEATHERMAP_RETRY_BUDGET_RATIO = float(os.getenv("OPENWEATHERMAP_RETRY_BUDGET_RATIO", "0.2"))
+OPENWEATHERMAP_RETRY_BUDGET_RESERVE = int(os.getenv("OPENWEATHERMAP_RETRY_BUDGET_RESERVE", "10"))
+# Connexions keep-alive conservées par hôte (et nombre maximal simultané)
+OPENWEATHERMAP_POOL_CONNECTIONS = int(os.getenv("OPENWEATHERMAP_POOL_CONNECTIONS", "4"))
+OPENWEATHERMAP_POOL_MAXSIZE = int(os.getenv("OPENWEATHERMAP_POOL_MAXSIZE", "20"))
+
+# Quota d'appels commun à tous les processus, compté dans le cache partagé
+# (voir weather/ratelimit.py)
+OPENWEATHERMAP_RATE_LIMIT_PER_MINUTE = int(os.getenv("OPENWEATHERMAP_RATE_LIMIT_PER_MINUTE", "60"))
+OPENWEATHERMAP_RATE_LIMIT_BURST = int(os.getenv("OPENWEATHERMAP_RATE_LIMIT_BURST", "10"))
+
+# Nombre d'appels simultanés dans bulk_weather_update
+WEATHER_BULK_CONCURRENCY = int(os.getenv("WEATHER_BULK_CONCURRENCY", "8"))
+
+# Endpoint /api/v1/weather/batch
+WEATHER_BATCH_MAX_CITIES = int(os.getenv("WEATHER_BATCH_MAX_CITIES", "50"))
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "10"))
+
+# Écriture différée des recherches (voir weather/ingest.py) : "off", "memory" ou "celery"
+WEATHER_WRITE_BEHIND_MODE = os.getenv("WEATHER_WRITE_BEHIND_MODE", "off").lower()
+WEATHER_WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WEATHER_WRITE_BEHIND_BATCH_SIZE", "200"))
+WEATHER_WRITE_BEHIND_INTERVAL = float(os.getenv("WEATHER_WRITE_BEHIND_INTERVAL", "2"))
+WEATHER_WRITE_BEHIND_SPOOL_DIR = os.getenv(
+    "WEATHER_WRITE_BEHIND_SPOOL_DIR", str(BASE_DIR / "var" / "write_behind")
+)
+# Recherches en attente au-delà desquelles l'insertion redevient synchrone
+WEATHER_WRITE_BEHIND_MAX_ROWS = int(os.getenv("WEATHER_WRITE_BEHIND_MAX_ROWS", "10000"))
+# Échecs d'un lot avant son dépôt dans le dead-letter
+WEATHER_WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WEATHER_WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+# Outbox des tâches Celery (voir weather/outbox.py)
+WEATHER_OUTBOX_BATCH_SIZE = int(os.getenv("WEATHER_OUTBOX_BATCH_SIZE", "500"))
+WEATHER_OUTBOX_MAX_BATCHES = int(os.getenv("WEATHER_OUTBOX_MAX_BATCHES", "100"))
+WEATHER_OUTBOX_RELAY_INTERVAL = float(os.getenv("WEATHER_OUTBOX_RELAY_INTERVAL", "1"))
+
+# Au plus une tâche async_weather_processing par ville et par fenêtre (0 : désactivé)
+WEATHER_PROCESSING_COALESCE_WINDOW = int(os.getenv("WEATHER_PROCESSING_COALESCE_WINDOW", "60"))  # secondes
+
+# Rétention des recherches et partitionnement PostgreSQL optionnel de
+# weather_weathersearch par searched_at (voir weather/partitions.py) :
+# "off", "day" ou "month"
+WEATHER_SEARCH_RETENTION_DAYS = int(os.getenv("WEATHER_SEARCH_RETENTION_DAYS", "30"))
+WEATHER_PARTITIONING = os.getenv("WEATHER_PARTITIONING", "off").lower()
+WEATHER_PARTITIONS_AHEAD = int(os.getenv("WEATHER_PARTITIONS_AHEAD", "3"))
+
+# Archive des recherches expirées avant suppression (voir weather/archive.py) :
+# format "auto" (Parquet si pyarrow est installé), "parquet" ou "jsonl"
+WEATHER_ARCHIVE_ENABLED = os.getenv("WEATHER_ARCHIVE_ENABLED", "True").lower() == "true"
+WEATHER_ARCHIVE_DIR = os.getenv("WEATHER_ARCHIVE_DIR", str(BASE_DIR / "var" / "archive"))
+WEATHER_ARCHIVE_FORMAT = os.getenv("WEATHER_ARCHIVE_FORMAT", "auto").lower()
+WEATHER_ARCHIVE_CHUNK_SIZE = int(os.getenv("WEATHER_ARCHIVE_CHUNK_SIZE", "5000"))
+
+# Taille de page maximale des endpoints d'historique (voir weather/history.py)
+WEATHER_HISTORY_MAX_LIMIT = int(os.getenv("WEATHER_HISTORY_MAX_LIMIT", "100"))
+
+# Cache-Control des endpoints de lecture (voir weather/conditional.py), en secondes
+WEATHER_HISTORY_MAX_AGE = int(os.getenv("WEATHER_HISTORY_MAX_AGE", "5"))
+WEATHER_RECORD_MAX_AGE = int(os.getenv("WEATHER_RECORD_MAX_AGE", "86400"))
+
+# Cache de bord nginx (proxy/edge-cache.conf, voir weather/edge_cache.py) :
+# durée en cache au proxy des réponses /api/v1/weather/ et /api/v1/history/
+WEATHER_EDGE_WEATHER_MAX_AGE = int(os.getenv("WEATHER_EDGE_WEATHER_MAX_AGE", "60"))  # secondes
+WEATHER_EDGE_HISTORY_MAX_AGE = int(os.getenv("WEATHER_EDGE_HISTORY_MAX_AGE", "30"))  # secondes
+# Adresse interne du proxy pour rafraîchir l'historique après de nouvelles
+# recherches (http://nginx:8080 ; "" : pas de rafraîchissement, l'historique
+# expire après WEATHER_EDGE_HISTORY_MAX_AGE)
+WEATHER_EDGE_CACHE_URL = os.getenv("WEATHER_EDGE_CACHE_URL", "")
+# Hôtes publics du site (en-tête Host des clients, qui fait partie de la clé de cache)
+WEATHER_EDGE_CACHE_HOSTS = [
+    host.strip()
+    for host in os.getenv("WEATHER_EDGE_CACHE_HOSTS", "localhost").split(",")
+    if host.strip()
+]
+WEATHER_EDGE_CACHE_REFRESH_PATHS = [
+    path.strip()
+    for path in os.getenv(
+        "WEATHER_EDGE_CACHE_REFRESH_PATHS", "/api/v1/history/,/api/v1/history/?limit=10"
+    ).split(",")
+    if path.strip()
+]
+WEATHER_EDGE_CACHE_REFRESH_INTERVAL = int(os.getenv("WEATHER_EDGE_CACHE_REFRESH_INTERVAL", "60"))  # secondes
+
+# Exports de données (voir weather/exporters.py)
+WEATHER_EXPORT_DIR = os.getenv("WEATHER_EXPORT_DIR", str(BASE_DIR / "var" / "exports"))
+WEATHER_EXPORT_CHUNK_SIZE = int(os.getenv("WEATHER_EXPORT_CHUNK_SIZE", "5000"))
+
+# Résultats des tâches Celery (voir weather/task_results.py) : au-delà de
+# WEATHER_TASK_RESULT_MAX_BYTES (JSON), le résultat est écrit dans un fichier
+WEATHER_TASK_RESULT_MAX_BYTES = int(os.getenv("WEATHER_TASK_RESULT_MAX_BYTES", "8192"))
+WEATHER_TASK_RESULT_DIR = os.getenv(
+    "WEATHER_TASK_RESULT_DIR", str(BASE_DIR / "var" / "task_results")
+)
+WEATHER_TASK_RESULT_SWEEP_CHUNK_SIZE = int(os.getenv("WEATHER_TASK_RESULT_SWEEP_CHUNK_SIZE", "1000"))
+WEATHER_TASK_RESULT_SWEEP_MAX_BATCHES = int(os.getenv("WEATHER_TASK_RESULT_SWEEP_MAX_BATCHES", "100"))
+
+# Alertes météo incrémentales (voir weather/alerts.py) : une alerte par ville,
+# condition et fenêtre de WEATHER_ALERT_WINDOW_HOURS heures
+WEATHER_ALERT_WINDOW_HOURS = int(os.getenv("WEATHER_ALERT_WINDOW_HOURS", "24"))
+WEATHER_ALERT_BATCH_SIZE = int(os.getenv("WEATHER_ALERT_BATCH_SIZE", "5000"))
+WEATHER_ALERT_MAX_BATCHES = int(os.getenv("WEATHER_ALERT_MAX_BATCHES", "20"))
+# Abonnements des utilisateurs aux alertes (voir weather/subscriptions.py) :
+# conditions par requête de rapprochement, lots d'envoi des notifications,
+# expéditeur des emails ("" : notifications écrites dans les logs)
+WEATHER_ALERT_SUBSCRIPTIONS_ENABLED = (
+    os.getenv("WEATHER_ALERT_SUBSCRIPTIONS_ENABLED", "True").lower() == "true"
+)
+WEATHER_ALERT_MATCH_TERMS = int(os.getenv("WEATHER_ALERT_MATCH_TERMS", "100"))
+WEATHER_ALERT_MATCH_BATCH_SIZE = int(os.getenv("WEATHER_ALERT_MATCH_BATCH_SIZE", "5000"))
+WEATHER_ALERT_MATCH_MAX_BATCHES = int(os.getenv("WEATHER_ALERT_MATCH_MAX_BATCHES", "20"))
+WEATHER_ALERT_NOTIFICATION_BATCH_SIZE = int(os.getenv("WEATHER_ALERT_NOTIFICATION_BATCH_SIZE", "500"))
+WEATHER_ALERT_NOTIFICATION_MAX_BATCHES = int(os.getenv("WEATHER_ALERT_NOTIFICATION_MAX_BATCHES", "20"))
+WEATHER_ALERT_EMAIL_FROM = os.getenv("WEATHER_ALERT_EMAIL_FROM", "")
+
+# Taille des lots de suppression de database_maintenance
+WEATHER_MAINTENANCE_DELETE_CHUNK_SIZE = int(os.getenv("WEATHER_MAINTENANCE_DELETE_CHUNK_SIZE", "1000"))
+
+# Traitements incrémentaux (voir weather/watermarks.py et weather/rollups.py) :
+# seules les recherches insérées depuis au moins ce délai sont traitées
+WEATHER_WATERMARK_SETTLE_SECONDS = int(os.getenv("WEATHER_WATERMARK_SETTLE_SECONDS", "30"))
+WEATHER_ROLLUP_BATCH_SIZE = int(os.getenv("WEATHER_ROLLUP_BATCH_SIZE", "5000"))
+WEATHER_ROLLUP_MAX_BATCHES = int(os.getenv("WEATHER_ROLLUP_MAX_BATCHES", "20"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -205,7 +385,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
-CORS_EXPOSE_HEADERS = ["Content-Type", "X-CSRFToken"]
+CORS_EXPOSE_HEADERS = ["Content-Type", "X-CSRFToken", "X-Next-Cursor", "Link"]
 CORS_ALLOW_HEADERS = [
     "accept",
     "accept-encoding",
@@ -237,12 +417,16 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 
 # Celery result expiration (results expire after 1 hour)
+# Purge par lots toutes les 15 minutes (sweep_task_results) ; la purge
+# quotidienne de Celery (celery.backend_cleanup) ne trouve plus que le reliquat
 CELERY_RESULT_EXPIRES = 3600
 
 # Celery task settings
 CELERY_TASK_ALWAYS_EAGER = False  # Set to True for synchronous execution in tests
 CELERY_TASK_EAGER_PROPAGATES = True
 CELERY_TASK_IGNORE_RESULT = False
+# Les tâches ignore_result (weather/tasks.py) enregistrent quand même leurs échecs
+CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED = True
 
 # Celery Beat settings for periodic tasks
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
@@ -256,44 +440,107 @@ CELERY_WORKER_DISABLE_RATE_LIMITS = False
 CELERY_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 
+# Files par type de charge, chacune consommée par son worker (voir docker-compose.yml) :
+# - interactive : tâches déclenchées par les requêtes (prefork, courtes)
+# - upstream    : appels réseau à OpenWeatherMap/au proxy (pool de threads)
+# - batch       : maintenance et traitements lourds en base (prefork)
+# Priorités de 0 à 9 (9 : la plus haute) dans chaque file (RabbitMQ x-max-priority)
+CELERY_TASK_QUEUES = (
+    tuple(
+        Queue(name, routing_key=name, queue_arguments={"x-max-priority": 9})
+        for name in ("interactive", "upstream", "batch")
+    )
+    if Queue
+    else ()
+)
+CELERY_TASK_DEFAULT_QUEUE = "interactive"
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_QUEUE_MAX_PRIORITY = 9
+CELERY_TASK_ROUTES = {
+    "weather.tasks.persist_weather_searches": {"queue": "interactive", "priority": 9},
+    "weather.tasks.relay_outbox_events": {"queue": "interactive", "priority": 8},
+    "weather.tasks.async_weather_processing": {"queue": "interactive", "priority": 7},
+    "weather.tasks.test_celery_task": {"queue": "interactive", "priority": 0},
+    "weather.tasks.refresh_edge_cache": {"queue": "upstream", "priority": 7},
+    "weather.tasks.send_alert_notifications": {"queue": "upstream", "priority": 6},
+    "weather.tasks.bulk_weather_update": {"queue": "upstream", "priority": 3},
+    "weather.tasks.update_weather_rollups": {"queue": "batch", "priority": 7},
+    "weather.tasks.send_weather_alerts": {"queue": "batch", "priority": 6},
+    "weather.tasks.match_alert_subscriptions": {"queue": "batch", "priority": 6},
+    "weather.tasks.generate_weather_statistics": {"queue": "batch", "priority": 5},
+    "weather.tasks.export_weather_data": {"queue": "batch", "priority": 4},
+    "weather.tasks.maintain_weather_partitions": {"queue": "batch", "priority": 3},
+    "weather.tasks.cleanup_old_searches": {"queue": "batch", "priority": 2},
+    "weather.tasks.sweep_task_results": {"queue": "batch", "priority": 2},
+    "weather.tasks.database_maintenance": {"queue": "batch", "priority": 1},
+}
+
+# Port des métriques Prometheus de chaque worker (voir weather/celery_metrics.py, 0 : désactivé)
+WEATHER_CELERY_METRICS_PORT = int(os.getenv("WEATHER_CELERY_METRICS_PORT", "9808"))
+
 # Celery Beat Schedule - Tâches périodiques automatisées
+# (file et priorité de chaque tâche : CELERY_TASK_ROUTES)
 # ================================
 if crontab:
     CELERY_BEAT_SCHEDULE = {
         "cleanup-old-searches": {
             "task": "weather.tasks.cleanup_old_searches",
             "schedule": crontab(hour=2, minute=0),
-            "options": {"queue": "default"},
+        },
+        "update-weather-rollups": {
+            "task": "weather.tasks.update_weather_rollups",
+            "schedule": crontab(minute="*/5"),
+            "options": {"expire_seconds": 300},
+        },
+        "maintain-weather-partitions": {
+            "task": "weather.tasks.maintain_weather_partitions",
+            "schedule": crontab(hour=1, minute=0),
         },
         "generate-weather-statistics": {
             "task": "weather.tasks.generate_weather_statistics",
             "schedule": crontab(hour=6, minute=0),
-            "options": {"queue": "default"},
         },
         "check-weather-alerts": {
             "task": "weather.tasks.send_weather_alerts",
-            "schedule": crontab(minute=0, hour="*/2"),
-            "options": {"queue": "default"},
+            "schedule": crontab(minute="*/5"),
+            "options": {"expire_seconds": 300},
         },
         "database-maintenance": {
             "task": "weather.tasks.database_maintenance",
             "schedule": crontab(hour=3, minute=0, day_of_week=0),
-            "options": {"queue": "default"},
         },
         "export-weather-data-json": {
             "task": "weather.tasks.export_weather_data",
             "schedule": crontab(hour=7, minute=0, day_of_week=1),
             "args": ("json",),
-            "options": {"queue": "default"},
+            "kwargs": {"incremental": True},
+        },
+        "match-alert-subscriptions": {
+            "task": "weather.tasks.match_alert_subscriptions",
+            "schedule": crontab(minute="*"),
+            "options": {"expire_seconds": 60},
+        },
+        # Filet de sécurité : l'envoi est déclenché après chaque rapprochement
+        "send-alert-notifications": {
+            "task": "weather.tasks.send_alert_notifications",
+            "schedule": crontab(minute="*/5"),
+            "options": {"expire_seconds": 300},
+        },
+        "sweep-task-results": {
+            "task": "weather.tasks.sweep_task_results",
+            "schedule": crontab(minute="*/15"),
+            "options": {"expire_seconds": 900},
+        },
+        "relay-outbox-events": {
+            "task": "weather.tasks.relay_outbox_events",
+            "schedule": crontab(minute="*"),
+            "options": {"expire_seconds": 60},
         },
         "celery-health-check": {
             "task": "weather.tasks.test_celery_task",
             "schedule": crontab(minute="*/15"),
             "args": ("Health check - Système opérationnel",),
-            "options": {
-                "queue": "default",
-                "expires": 900,
-            },
+            "options": {"expire_seconds": 900},
         },
         "bulk-update-european-capitals": {
             "task": "weather.tasks.bulk_weather_update",
@@ -313,7 +560,6 @@ if crontab:
                 ],
             ),
             "options": {
-                "queue": "default",
                 "soft_time_limit": 300,
                 "time_limit": 600,
             },
@@ -29,5 +29,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("weather.urls")),
     path("api/v1/", include("weather.api_urls")),  # Nouvelles URLs d'API
+    path("api/async/", include("weather.async_urls")),  # Endpoints asynchrones (ASGI)
+    path("", include("django_prometheus.urls")),  # Métriques Prometheus (/metrics)
     path("", home),
 ]
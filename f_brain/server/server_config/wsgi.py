@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server_config.settings')
 
 application = get_wsgi_application()
+
+# Tampon write-behind : déposé dans le spool sur SIGTERM/SIGINT
+from weather.ingest import start_write_behind  # noqa: E402
+
+start_write_behind()
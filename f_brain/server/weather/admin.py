@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import WeatherSearch
+from .conditional import bump_history_version
+from .models import (
+    AlertNotification,
+    AlertSubscription,
+    CitySearchStats,
+    WeatherAlert,
+    WeatherSearch,
+)
 
 # Celery task result imports - just for customization, not re-registration
 from django_celery_results.models import TaskResult
@@ -9,7 +16,8 @@ from django_celery_beat.models import PeriodicTask
 @admin.register(WeatherSearch)
 class WeatherSearchAdmin(admin.ModelAdmin):
     list_display = ("city", "country", "temperature", "description", "searched_at")
-    list_filter = ("city", "country", "searched_at")
+    # Pas de filtre par ville (SELECT DISTINCT sur toute la table) : voir CitySearchStats
+    list_filter = ("country", "searched_at")
     search_fields = ("city", "country", "description")
     readonly_fields = ("searched_at",)
     fieldsets = (
@@ -30,6 +38,70 @@ class WeatherSearchAdmin(admin.ModelAdmin):
         ("Metadata", {"fields": ("searched_at",)}),
     )
 
+    # Historique modifié : les validateurs (ETag) doivent changer
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_history_version()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_history_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_history_version()
+
+
+@admin.register(CitySearchStats)
+class CitySearchStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        "display_city",
+        "country",
+        "search_count",
+        "last_temperature",
+        "last_description",
+        "last_searched_at",
+    )
+    list_filter = ("country",)
+    search_fields = ("city", "display_city")
+    readonly_fields = [field.name for field in CitySearchStats._meta.fields]
+
+    def has_add_permission(self, request):
+        # Lignes maintenues par weather/ingest.py
+        return False
+
+
+@admin.register(WeatherAlert)
+class WeatherAlertAdmin(admin.ModelAdmin):
+    list_display = ("display_city", "country", "condition", "value", "window_start", "created_at")
+    list_filter = ("condition", "country")
+    search_fields = ("city", "display_city")
+    readonly_fields = [field.name for field in WeatherAlert._meta.fields]
+
+    def has_add_permission(self, request):
+        # Lignes créées par weather/alerts.py
+        return False
+
+
+@admin.register(AlertSubscription)
+class AlertSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("user", "city", "country", "metric", "operator", "threshold", "is_active")
+    list_filter = ("metric", "operator", "is_active")
+    search_fields = ("city", "user__username")
+    raw_id_fields = ("user",)
+
+
+@admin.register(AlertNotification)
+class AlertNotificationAdmin(admin.ModelAdmin):
+    list_display = ("subscription", "value", "searched_at", "created_at", "sent_at")
+    list_select_related = ("subscription",)
+    raw_id_fields = ("subscription",)
+    readonly_fields = [field.name for field in AlertNotification._meta.fields]
+
+    def has_add_permission(self, request):
+        # Lignes créées par weather/subscriptions.py
+        return False
+
 
 # Note: TaskResult and PeriodicTask are already registered by django_celery_results and django_celery_beat
 # Their admin interfaces are automatically available in the Django admin panel
@@ -0,0 +1,125 @@
+"""
+Alertes météo sur les conditions extrêmes (models.EXTREME_CONDITIONS).
+
+evaluate_alerts() ne lit que les recherches ajoutées depuis le passage
+précédent (position enregistrée, voir weather/watermarks.py), et parmi
+elles seulement les recherches extrêmes (index partiel search_extreme_idx).
+Une alerte est enregistrée (WeatherAlert) une seule fois par ville, condition
+et fenêtre de WEATHER_ALERT_WINDOW_HOURS heures : les recherches suivantes de
+la même fenêtre ne la déclenchent plus.
+"""
+
+import logging
+import operator
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import EXTREME_CONDITIONS, EXTREME_WEATHER, WeatherAlert, WeatherSearch
+from .services import normalize_location
+from .watermarks import advance_watermark, lock_watermark, settled_position
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "weather-alerts"
+
+OPERATORS = {"gte": operator.ge, "lte": operator.le}
+
+CONDITIONS = tuple(
+    (condition, measure, OPERATORS[lookup], threshold)
+    for condition, measure, lookup, threshold in EXTREME_CONDITIONS
+)
+
+FIELDS = ("id", "city", "country", "searched_at", "temperature", "wind_speed", "humidity")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def window_start(moment, hours=None):
+    """
+    Début de la fenêtre d'alerte contenant `moment` (fenêtres alignées sur UTC)
+    """
+    window = timedelta(hours=hours or settings.WEATHER_ALERT_WINDOW_HOURS)
+    return EPOCH + ((moment - EPOCH) // window) * window
+
+
+def alerts_for(rows):
+    """
+    Alertes déclenchées par un lot de recherches (dictionnaires), une par
+    ville, condition et fenêtre : la première recherche de la fenêtre
+    """
+    alerts = {}
+    for row in rows:
+        city, country = normalize_location(row["city"], row["country"])
+        window = window_start(row["searched_at"])
+        for condition, measure, compare, threshold in CONDITIONS:
+            if compare(row[measure], threshold):
+                alerts.setdefault(
+                    (city, country, condition, window),
+                    WeatherAlert(
+                        city=city,
+                        country=country,
+                        display_city=row["city"],
+                        condition=condition,
+                        window_start=window,
+                        search_id=row["id"],
+                        value=row[measure],
+                        searched_at=row["searched_at"],
+                    ),
+                )
+    return alerts
+
+
+def record_alerts(alerts):
+    """
+    Enregistre les alertes qui n'ont pas encore été émises ; retourne les
+    nouvelles
+    """
+    if not alerts:
+        return []
+    windows = {key[3] for key in alerts}
+    cities = {key[0] for key in alerts}
+    emitted = set(
+        WeatherAlert.objects.filter(window_start__in=windows, city__in=cities).values_list(
+            "city", "country", "condition", "window_start"
+        )
+    )
+    new = [alert for key, alert in alerts.items() if key not in emitted]
+    # ignore_conflicts : filet de sécurité, les passages sont sérialisés par le verrou
+    WeatherAlert.objects.bulk_create(new, ignore_conflicts=True)
+    return new
+
+
+def evaluate_alerts(batch_size=None, max_batches=None):
+    """
+    Évalue les nouvelles recherches, par lots de `batch_size` recherches
+    extrêmes (au plus `max_batches` lots). Retourne (nouvelles alertes,
+    recherches extrêmes lues).
+    """
+    batch_size = batch_size or settings.WEATHER_ALERT_BATCH_SIZE
+    max_batches = max_batches or settings.WEATHER_ALERT_MAX_BATCHES
+
+    new_alerts = []
+    scanned = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            watermark = lock_watermark(WATERMARK_NAME)
+            end = settled_position(watermark, WeatherSearch)
+            rows = list(
+                WeatherSearch.objects.filter(id__gt=watermark.position, id__lte=end)
+                .filter(EXTREME_WEATHER)
+                .order_by("id")
+                .values(*FIELDS)[:batch_size]
+            )
+            new_alerts.extend(record_alerts(alerts_for(rows)))
+            # Lot incomplet : plus aucune recherche extrême jusqu'à `end`
+            advance_watermark(watermark, rows[-1]["id"] if len(rows) == batch_size else end)
+
+        scanned += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if new_alerts:
+        logger.warning(f"Alertes météo: {len(new_alerts)} nouvelles alertes")
+    return new_alerts, scanned
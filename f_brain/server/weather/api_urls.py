@@ -1,7 +1,9 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import api_views
 
 urlpatterns = [
     path("weather/", api_views.get_weather, name="api_get_weather"),
+    re_path(r"^weather/batch/?$", api_views.get_weather_batch, name="api_get_weather_batch"),
     path("history/", api_views.get_weather_history, name="api_get_history"),
+    re_path(r"^history/export/?$", api_views.export_weather_history, name="api_export_history"),
 ]
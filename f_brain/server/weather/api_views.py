@@ -1,16 +1,51 @@
-import os
 import json
+from itertools import islice
+
 import requests
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from .archive import iter_archived
+from .conditional import (
+    history_cache_control,
+    history_validators,
+    not_modified,
+    set_validators,
+)
+from .edge_cache import set_edge_cache
+from .exporters import EXPORT_FIELDS
+from .history import (
+    accepts_gzip,
+    clamp_limit,
+    csv_lines,
+    decode_cursor,
+    filter_searches,
+    history_queryset,
+    ndjson_lines,
+    paginate,
+    parse_moment,
+    set_next_page,
+)
+from .ingest import record_search, record_searches
 from .models import WeatherSearch
-from .tasks import async_weather_processing
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-OPENWEATHERMAP_API_KEY = os.getenv(
-    "OPENWEATHER_API_KEY", "ee56bd2e1c87bf3900aa88cfd2cee8ac"
+from .responses import (
+    SEARCH_FIELDS,
+    FastJsonResponse,
+    is_slim,
+    project_rows,
+    query_flag,
+    requested_fields,
+    weather_result,
+)
+from .services import (
+    UPSTREAM_ERROR_MESSAGE,
+    WeatherAPIError,
+    fetch_current_weather_many,
+    get_current_weather,
+    weather_search_from_payload,
 )
 
 
@@ -22,95 +57,288 @@ def get_weather(request):
     """
     city = request.GET.get("city")
     if not city:
-        return JsonResponse(
+        return FastJsonResponse(
             {"error": "Le paramètre 'city' est requis"},
             status=400,
         )
-
-    # Call OpenWeatherMap API
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHERMAP_API_KEY}&units=metric"
+    try:
+        fields = requested_fields(request.GET, SEARCH_FIELDS)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        weather_data = response.json()
-
-        # Enregistrement des données dans la base de données
-        weather_record = WeatherSearch(
-            city=weather_data["name"],
-            temperature=weather_data["main"]["temp"],
-            humidity=weather_data["main"]["humidity"],
-            wind_speed=weather_data["wind"]["speed"],
-            pressure=weather_data["main"]["pressure"],
-            description=weather_data["weather"][0]["description"],
-            icon=weather_data["weather"][0]["icon"],
-            country=weather_data["sys"]["country"],
-        )
-        weather_record.save()
-
-        # Traitement asynchrone des données météo
-        async_weather_processing.delay(
-            {
-                "city": weather_data["name"],
-                "temperature": weather_data["main"]["temp"],
-                "humidity": weather_data["main"]["humidity"],
-                "description": weather_data["weather"][0]["description"],
-                "country": weather_data["sys"]["country"],
-            }
-        )
+        # Météo actuelle (cache partagé, puis OpenWeatherMap)
+        weather_data = get_current_weather(city)
 
-        # Transformer l'objet en dictionnaire pour la réponse JSON
-        saved_record = {
-            "id": weather_record.id,
-            "city": weather_record.city,
-            "temperature": weather_record.temperature,
-            "humidity": weather_record.humidity,
-            "wind_speed": weather_record.wind_speed,
-            "pressure": weather_record.pressure,
-            "description": weather_record.description,
-            "icon": weather_record.icon,
-            "country": weather_record.country,
-            "searched_at": weather_record.searched_at.isoformat() if hasattr(weather_record, 'searched_at') else None,
-        }
+        # Enregistrement des données dans la base de données, avec le
+        # traitement asynchrone en outbox (éventuellement différé : voir weather/ingest.py)
+        weather_record = record_search(
+            weather_search_from_payload(weather_data), enqueue_processing=True
+        )
 
-        return JsonResponse({"data": weather_data, "saved_record": saved_record})
+        # Rafales sur une même ville absorbées par le cache de bord (proxy)
+        return set_edge_cache(
+            FastJsonResponse(
+                weather_result(weather_data, weather_record, fields, is_slim(request.GET))
+            ),
+            settings.WEATHER_EDGE_WEATHER_MAX_AGE,
+        )
 
-    except requests.exceptions.RequestException as e:
-        return JsonResponse({"error": str(e)}, status=500)
+    except WeatherAPIError as e:
+        return FastJsonResponse({"error": str(e)}, status=e.status_code)
+    except requests.exceptions.RequestException:
+        # Détail non renvoyé : il contient l'URL appelée (clé d'API)
+        return FastJsonResponse({"error": UPSTREAM_ERROR_MESSAGE}, status=500)
     except KeyError as e:
-        return JsonResponse(
+        return FastJsonResponse(
             {"error": f"Données de l'API incorrectes: {str(e)}"},
             status=500,
         )
 
 
+def _parse_batch_locations(request):
+    """
+    Villes demandées : ?city=Paris&city=Rome,IT en GET, ou en POST
+    {"cities": ["Paris", {"city": "Rome", "country": "IT"}]}
+    """
+    if request.method == "POST":
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ValueError("Corps JSON invalide")
+        entries = body.get("cities") if isinstance(body, dict) else body
+        if not isinstance(entries, list):
+            raise ValueError("Le champ 'cities' doit être une liste")
+    else:
+        entries = request.GET.getlist("city")
+
+    locations = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            city, country = entry.get("city", ""), entry.get("country", "")
+        elif isinstance(entry, str):
+            city, _, country = entry.partition(",")
+        else:
+            raise ValueError(f"Ville invalide: {entry!r}")
+        if not isinstance(city, str) or not isinstance(country, str):
+            raise ValueError(f"Ville invalide: {entry!r}")
+        city, country = city.strip(), country.strip()
+        if not city:
+            raise ValueError("Chaque entrée doit contenir une ville")
+        locations.append((city, country))
+    return locations
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def get_weather_batch(request):
+    """
+    Endpoint pour obtenir la météo de plusieurs villes en une seule requête.
+
+    Les appels sont faits en parallèle (via le cache), les recherches sont
+    enregistrées en une seule insertion ; le résultat de chaque ville (données
+    ou erreur) est renvoyé dans l'ordre de la demande.
+    """
+    try:
+        locations = _parse_batch_locations(request)
+        fields = requested_fields(request.GET, SEARCH_FIELDS)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+    slim = is_slim(request.GET)
+
+    if not locations:
+        return FastJsonResponse(
+            {"error": "Au moins une ville est requise"},
+            status=400,
+        )
+    if len(locations) > settings.WEATHER_BATCH_MAX_CITIES:
+        return FastJsonResponse(
+            {"error": f"Au plus {settings.WEATHER_BATCH_MAX_CITIES} villes par requête"},
+            status=400,
+        )
+
+    results = [None] * len(locations)
+    pending = []  # (index, données API, recherche à enregistrer)
+
+    for index, weather_data, error in fetch_current_weather_many(
+        locations, max_workers=settings.WEATHER_BATCH_CONCURRENCY
+    ):
+        city, country = locations[index]
+        query = {"city": city, "country": country}
+        if isinstance(error, WeatherAPIError):
+            results[index] = {"query": query, "error": str(error), "status": error.status_code}
+        elif error is not None:
+            results[index] = {"query": query, "error": UPSTREAM_ERROR_MESSAGE, "status": 500}
+        else:
+            try:
+                pending.append((index, weather_data, weather_search_from_payload(weather_data)))
+            except (KeyError, IndexError) as e:
+                results[index] = {
+                    "query": query,
+                    "error": f"Données de l'API incorrectes: {str(e)}",
+                    "status": 500,
+                }
+
+    # Enregistrement de toutes les recherches (et de leur traitement
+    # asynchrone en outbox) en une seule transaction
+    created = record_searches(
+        [search for _, _, search in pending], enqueue_processing=True
+    )
+
+    for (index, weather_data, _), weather_record in zip(pending, created):
+        city, country = locations[index]
+        results[index] = weather_result(
+            weather_data,
+            weather_record,
+            fields,
+            slim,
+            query={"city": city, "country": country},
+        )
+
+    return FastJsonResponse(
+        {
+            "results": results,
+            "successful": len(created),
+            "failed": len(locations) - len(created),
+        }
+    )
+
+
+HISTORY_FIELDS = (
+    "id",
+    "city",
+    "temperature",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "description",
+    "icon",
+    "country",
+    "searched_at",
+)
+
+
 @require_http_methods(["GET"])
 def get_weather_history(request):
     """
-    Endpoint pour récupérer l'historique des recherches météo
+    Endpoint pour récupérer l'historique des recherches météo, par pages
+    (paramètres limit, cursor, city, country, start, end ; page suivante dans
+    l'en-tête X-Next-Cursor). Avec include_archive=1, l'historique continue
+    dans les recherches archivées ; fields=... limite les champs renvoyés.
+    """
+    # Pas de nouvelle recherche depuis la version du client : 304 sans lire la page
+    etag, last_modified = history_validators()
+    response = not_modified(request, etag, last_modified, **history_cache_control())
+    if response is not None:
+        return _edge_cached_history(response)
+
+    limit = clamp_limit(request.GET.get("limit"))
+    include_archive = query_flag(request.GET, "include_archive")
+
+    try:
+        fields = requested_fields(request.GET, SEARCH_FIELDS, default=HISTORY_FIELDS)
+        rows = list(
+            history_queryset(WeatherSearch.objects.all(), request.GET, fields, limit)
+        )
+        if include_archive and len(rows) <= limit:
+            rows.extend(_archived_history(request.GET, fields, rows, limit + 1 - len(rows)))
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    rows, next_cursor = paginate(rows, limit)
+    history_data = project_rows(rows, fields)
+
+    response = set_next_page(FastJsonResponse(history_data, safe=False), request, next_cursor)
+    return _edge_cached_history(
+        set_validators(response, etag, last_modified, **history_cache_control())
+    )
+
+
+def _edge_cached_history(response):
+    """
+    Historique en cache au proxy (revalidé par ETag à l'expiration) ; le
+    navigateur garde WEATHER_HISTORY_MAX_AGE
+    """
+    return set_edge_cache(
+        response,
+        settings.WEATHER_EDGE_HISTORY_MAX_AGE,
+        max_age=settings.WEATHER_HISTORY_MAX_AGE,
+    )
+
+
+def _archived_history(params, fields, rows, count):
+    """
+    Recherches archivées qui suivent `rows` (mêmes filtres et curseur)
+    """
+    fields = tuple(dict.fromkeys(fields + ("id", "searched_at")))
+    if rows:
+        cursor = (rows[-1]["searched_at"], rows[-1]["id"])
+    elif params.get("cursor"):
+        cursor = decode_cursor(params["cursor"])
+    else:
+        cursor = None
+    archived = iter_archived(
+        start=parse_moment(params["start"]) if params.get("start") else None,
+        end=parse_moment(params["end"], end=True) if params.get("end") else None,
+        city=params.get("city"),
+        country=params.get("country"),
+        newest_first=True,
+        before=cursor,
+    )
+    seen_ids = {row["id"] for row in rows}
+    selected = (
+        dict({field: row[field] for field in fields}, archived=True)
+        for row in archived
+        if row["id"] not in seen_ids
+    )
+    return list(islice(selected, count))
+
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@require_http_methods(["GET"])
+def export_weather_history(request):
+    """
+    Téléchargement en flux de l'historique (CSV ou NDJSON), filtrable par
+    city, country, start et end ; compressé en gzip si le client l'accepte.
+    Les lignes sont lues par un curseur côté serveur : la mémoire utilisée
+    ne dépend pas de la taille de la période.
     """
+    export_format = request.GET.get("format", "csv").lower()
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return FastJsonResponse(
+            {"error": "Le paramètre 'format' doit valoir 'csv' ou 'ndjson'"},
+            status=400,
+        )
+
     try:
-        limit = int(request.GET.get("limit", 10))
-    except ValueError:
-        limit = 10
-    
-    history = WeatherSearch.objects.all()[:limit]
-
-    # Transformer les objets en dictionnaires
-    history_data = []
-    for record in history:
-        history_data.append({
-            "id": record.id,
-            "city": record.city,
-            "temperature": record.temperature,
-            "humidity": record.humidity,
-            "wind_speed": record.wind_speed,
-            "pressure": record.pressure,
-            "description": record.description,
-            "icon": record.icon,
-            "country": record.country,
-            "searched_at": record.searched_at.isoformat() if hasattr(record, 'searched_at') else None,
-        })
-
-    return JsonResponse(history_data, safe=False)
\ No newline at end of file
+        searches = filter_searches(WeatherSearch.objects.all(), request.GET)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    rows = (
+        searches.order_by("searched_at", "id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=settings.WEATHER_EXPORT_CHUNK_SIZE)
+    )
+    lines = csv_lines(rows) if export_format == "csv" else ndjson_lines(rows)
+    content = (chunk.encode("utf-8") for chunk in lines)
+
+    gzipped = accepts_gzip(request.headers.get("Accept-Encoding", ""))
+    if gzipped:
+        content = compress_sequence(content)
+
+    response = StreamingHttpResponse(
+        content, content_type=EXPORT_CONTENT_TYPES[export_format]
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="weather-history.{export_format}"'
+    )
+    if gzipped:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
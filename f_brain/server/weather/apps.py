@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class WeatherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'weather'
+
+    def ready(self):
+        # Requêtes SQL comptées par requête HTTP (voir weather/metrics.py)
+        from . import celery_metrics  # noqa: F401 (signaux Celery)
+        from .metrics import install_query_counter
+
+        connection_created.connect(install_query_counter, dispatch_uid="weather-query-counter")
@@ -0,0 +1,305 @@
+"""
+Archive froide des recherches météo expirées.
+
+Avant suppression (cleanup_old_searches), les recherches sont écrites en flux
+(.iterator()) dans des fichiers compressés, rangés par jour :
+
+    WEATHER_ARCHIVE_DIR/date=2026-09-17/searches-<premier id>-<dernier id>.parquet
+    WEATHER_ARCHIVE_DIR/date=2026-09-17/searches-<premier id>-<dernier id>.jsonl.gz
+
+Format Parquet si pyarrow est installé (WEATHER_ARCHIVE_FORMAT="auto" ou
+"parquet"), sinon JSON Lines compressé en gzip. iter_archived() relit les deux
+formats, en flux, pour compléter l'historique au-delà de la durée de
+rétention.
+"""
+
+import gzip
+import heapq
+import json
+import logging
+import os
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .services import normalize_location
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    "id",
+    "public_id",
+    "city",
+    "country",
+    "temperature",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "description",
+    "icon",
+    "searched_at",
+)
+
+
+def archive_format():
+    archive_format = settings.WEATHER_ARCHIVE_FORMAT
+    if archive_format == "auto":
+        return "parquet" if pyarrow is not None else "jsonl"
+    if archive_format == "parquet" and pyarrow is None:
+        raise RuntimeError("WEATHER_ARCHIVE_FORMAT=parquet nécessite le paquet pyarrow")
+    return archive_format
+
+
+def _partition_dir(day):
+    return Path(settings.WEATHER_ARCHIVE_DIR) / f"date={day.isoformat()}"
+
+
+class _JsonlWriter:
+    extension = "jsonl.gz"
+
+    def __init__(self, path):
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            row = dict(
+                row,
+                public_id=str(row["public_id"]),
+                searched_at=row["searched_at"].isoformat(),
+            )
+            self.file.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    extension = "parquet"
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, rows):
+        rows = [dict(row, public_id=str(row["public_id"])) for row in rows]
+        table = pyarrow.Table.from_pylist(rows)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path, table.schema, compression="zstd"
+            )
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _DayFile:
+    """
+    Fichier d'archive d'un jour, écrit sous un nom temporaire puis renommé
+    une fois complet (premier et dernier id connus)
+    """
+
+    def __init__(self, day, writer_class):
+        self.day = day
+        self.directory = _partition_dir(day)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = (
+            self.directory / f".searches-{os.getpid()}.{writer_class.extension}.tmp"
+        )
+        self.writer = writer_class(self.tmp_path)
+        self.extension = writer_class.extension
+        self.first_id = None
+        self.last_id = None
+        self.pending = []
+
+    def add(self, row, chunk_size):
+        if self.first_id is None:
+            self.first_id = row["id"]
+        self.last_id = row["id"]
+        self.pending.append(row)
+        if len(self.pending) >= chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.writer.write(self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        path = self.directory / f"searches-{self.first_id}-{self.last_id}.{self.extension}"
+        os.replace(self.tmp_path, path)
+        return path
+
+
+def archive_searches(queryset, chunk_size=None):
+    """
+    Écrit les recherches de `queryset` dans l'archive, par jour.
+    Les lignes déjà présentes dans un fichier du jour (archivées par un
+    passage dont la suppression a échoué) ne sont pas réécrites.
+    Retourne (nombre de lignes écrites, plus grand id archivé) : seules les
+    lignes jusqu'à cet id doivent ensuite être supprimées.
+    """
+    chunk_size = chunk_size or settings.WEATHER_ARCHIVE_CHUNK_SIZE
+    writer_class = _ParquetWriter if archive_format() == "parquet" else _JsonlWriter
+
+    count = 0
+    max_id = None
+    day = None
+    archived_ids = set()
+    current = None
+    rows = queryset.order_by("searched_at", "id").values(*ARCHIVE_FIELDS)
+    try:
+        for row in rows.iterator(chunk_size=chunk_size):
+            max_id = row["id"] if max_id is None else max(max_id, row["id"])
+            if row["searched_at"].date() != day:
+                if current is not None:
+                    current.close()
+                    current = None
+                day = row["searched_at"].date()
+                archived_ids = _archived_ids(day)
+            if row["id"] in archived_ids:
+                continue
+            if current is None:
+                current = _DayFile(day, writer_class)
+            current.add(row, chunk_size)
+            count += 1
+        if current is not None:
+            current.close()
+    except Exception:
+        if current is not None and current.tmp_path.exists():
+            current.tmp_path.unlink()
+        raise
+
+    if count:
+        logger.info(f"Archive: {count} recherches archivées")
+    return count, max_id
+
+
+def _day_files(day):
+    """
+    Fichiers complets d'un jour (les fichiers temporaires sont ignorés)
+    """
+    return sorted(_partition_dir(day).glob("searches-*"))
+
+
+def _read_file(path, columns=None):
+    """
+    Lignes d'un fichier d'archive, lues en flux (par groupe de lignes Parquet
+    ou ligne à ligne en JSON Lines), dans l'ordre d'écriture
+    """
+    if path.name.endswith(".parquet"):
+        if pyarrow is None:
+            raise RuntimeError(f"Lecture de {path.name} impossible sans pyarrow")
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(columns=columns):
+            yield from batch.to_pylist()
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+        for line in archive_file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if columns is not None:
+                row = {column: row[column] for column in columns}
+            if "searched_at" in row:
+                row["searched_at"] = parse_datetime(row["searched_at"])
+            yield row
+
+
+def _archived_ids(day):
+    """
+    Ids déjà archivés pour un jour
+    """
+    return {
+        row["id"]
+        for path in _day_files(day)
+        for row in _read_file(path, columns=["id"])
+    }
+
+
+def archived_days():
+    """
+    Jours présents dans l'archive, du plus ancien au plus récent
+    """
+    root = Path(settings.WEATHER_ARCHIVE_DIR)
+    if not root.is_dir():
+        return []
+    days = []
+    for directory in root.glob("date=*"):
+        try:
+            days.append(date.fromisoformat(directory.name[len("date="):]))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def _sort_key(row):
+    return row["searched_at"], row["id"]
+
+
+def iter_archived(
+    start=None, end=None, city=None, country=None, newest_first=False, before=None
+):
+    """
+    Recherches archivées (dictionnaires, searched_at en datetime) entre
+    `start` inclus et `end` exclu, éventuellement filtrées par ville/pays
+    (comparaison normalisée) et limitées à celles qui précèdent `before`
+    (curseur (searched_at, id)), triées par date de recherche.
+    Les fichiers d'un jour, chacun trié, sont fusionnés en flux ; un id
+    présent dans plusieurs fichiers n'est retourné qu'une fois. Dans l'ordre
+    antichronologique, seules les lignes retenues d'un jour sont gardées en
+    mémoire pour être inversées.
+    """
+    location = normalize_location(city, country) if city else None
+
+    def matches(row):
+        if start is not None and row["searched_at"] < start:
+            return False
+        if end is not None and row["searched_at"] >= end:
+            return False
+        if before is not None and _sort_key(row) >= before:
+            return False
+        if location is not None:
+            row_city, row_country = normalize_location(row["city"], row["country"])
+            if row_city != location[0] or (location[1] and row_country != location[1]):
+                return False
+        return True
+
+    days = archived_days()
+    if newest_first:
+        days.reverse()
+
+    for day in days:
+        if start is not None and day < start.date():
+            continue
+        if end is not None and day > end.date():
+            continue
+        if before is not None and day > before[0].date():
+            continue
+        merged = heapq.merge(
+            *(_read_file(path) for path in _day_files(day)), key=_sort_key
+        )
+        seen_ids = set()
+        rows = []
+        for row in merged:
+            if row["id"] in seen_ids:
+                continue
+            seen_ids.add(row["id"])
+            if not matches(row):
+                continue
+            if newest_first:
+                rows.append(row)
+            else:
+                yield row
+        if newest_first:
+            yield from reversed(rows)
@@ -0,0 +1,17 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path("weather/", async_views.get_weather, name="async_get_weather"),
+    path("history/", async_views.get_weather_history, name="async_get_history"),
+    path(
+        "history/<int:search_id>/",
+        async_views.get_weather_by_id,
+        name="async_get_weather_by_id",
+    ),
+    path(
+        "history/<uuid:public_id>/",
+        async_views.get_weather_by_id,
+        name="async_get_weather_by_public_id",
+    ),
+]
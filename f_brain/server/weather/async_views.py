@@ -0,0 +1,135 @@
+"""
+Versions asynchrones des endpoints météo (à servir en mode ASGI, voir asgi.py).
+
+Pendant l'attente d'OpenWeatherMap ou de la base de données, la boucle
+d'événements traite d'autres requêtes au lieu de bloquer un thread.
+"""
+
+import httpx
+from django.views.decorators.http import require_http_methods
+from .api_views import HISTORY_FIELDS
+from .conditional import (
+    ahistory_validators,
+    history_cache_control,
+    not_modified,
+    record_cache_control,
+    record_etag,
+    set_validators,
+)
+from .history import clamp_limit, history_queryset, paginate, set_next_page
+from .ingest import arecord_search
+from .models import WeatherSearch
+from .responses import (
+    SEARCH_FIELDS,
+    FastJsonResponse,
+    is_slim,
+    project_rows,
+    requested_fields,
+    weather_result,
+)
+from .services import (
+    UPSTREAM_ERROR_MESSAGE,
+    WeatherAPIError,
+    aget_current_weather,
+    weather_search_from_payload,
+)
+from .views import RECORD_FIELDS, record_data
+
+
+@require_http_methods(["GET"])
+async def get_weather(request):
+    """
+    Endpoint asynchrone pour obtenir les données météo d'une ville
+    et les enregistrer dans la base de données
+    """
+    city = request.GET.get("city")
+    if not city:
+        return FastJsonResponse(
+            {"error": "Le paramètre 'city' est requis"},
+            status=400,
+        )
+    try:
+        fields = requested_fields(request.GET, SEARCH_FIELDS)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    try:
+        # Météo actuelle (cache partagé, puis OpenWeatherMap)
+        weather_data = await aget_current_weather(city)
+
+        # Enregistrement des données dans la base de données, avec le
+        # traitement asynchrone en outbox (éventuellement différé : voir weather/ingest.py)
+        weather_record = await arecord_search(
+            weather_search_from_payload(weather_data), enqueue_processing=True
+        )
+
+        return FastJsonResponse(
+            weather_result(weather_data, weather_record, fields, is_slim(request.GET))
+        )
+
+    except WeatherAPIError as e:
+        return FastJsonResponse({"error": str(e)}, status=e.status_code)
+    except httpx.HTTPError:
+        # Détail non renvoyé : il contient l'URL appelée (clé d'API)
+        return FastJsonResponse({"error": UPSTREAM_ERROR_MESSAGE}, status=500)
+    except KeyError as e:
+        return FastJsonResponse(
+            {"error": f"Données de l'API incorrectes: {str(e)}"},
+            status=500,
+        )
+
+
+@require_http_methods(["GET"])
+async def get_weather_history(request):
+    """
+    Endpoint asynchrone pour récupérer l'historique des recherches météo,
+    par pages (curseur de la page suivante dans X-Next-Cursor)
+    """
+    etag, last_modified = await ahistory_validators()
+    response = not_modified(request, etag, last_modified, **history_cache_control())
+    if response is not None:
+        return response
+
+    limit = clamp_limit(request.GET.get("limit"))
+    try:
+        fields = requested_fields(request.GET, SEARCH_FIELDS, default=HISTORY_FIELDS)
+        queryset = history_queryset(WeatherSearch.objects.all(), request.GET, fields, limit)
+        rows, next_cursor = paginate([row async for row in queryset], limit)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    history_data = project_rows(rows, fields)
+
+    response = set_next_page(FastJsonResponse(history_data, safe=False), request, next_cursor)
+    return set_validators(response, etag, last_modified, **history_cache_control())
+
+
+@require_http_methods(["GET"])
+async def get_weather_by_id(request, search_id=None, public_id=None):
+    """
+    Endpoint asynchrone pour récupérer une recherche météo par son identifiant
+    (id ou public_id)
+    """
+    if public_id is not None:
+        searches = WeatherSearch.objects.filter(public_id=public_id)
+    else:
+        searches = WeatherSearch.objects.filter(pk=search_id)
+    # 304 seulement si la recherche existe encore
+    if not await searches.aexists():
+        return FastJsonResponse({"error": "Weather search not found"}, status=404)
+    etag = record_etag(public_id if public_id is not None else search_id)
+    response = not_modified(request, etag=etag, **record_cache_control())
+    if response is not None:
+        return response
+
+    try:
+        fields = requested_fields(request.GET, SEARCH_FIELDS, default=RECORD_FIELDS)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+    try:
+        search = await searches.aget()
+    except WeatherSearch.DoesNotExist:
+        return FastJsonResponse({"error": "Weather search not found"}, status=404)
+
+    weather_data = record_data(search, fields)
+    return set_validators(FastJsonResponse(weather_data), etag, **record_cache_control())
@@ -0,0 +1,174 @@
+"""
+Métriques Prometheus des tâches Celery, par nom de tâche, à partir des
+signaux Celery (pas de consommateur d'événements à faire tourner à part) :
+
+- attente dans la file : de la publication (en-tête sent_at ajouté par
+  before_task_publish, ou heure prévue pour une tâche différée) au début de
+  l'exécution ;
+- durée d'exécution, par état final ;
+- nouvelles tentatives et échecs (par type d'exception) ;
+- taille du résultat enregistré (JSON), pour les tâches qui en stockent un ;
+- tâches en cours.
+
+Chaque worker expose ses métriques sur WEATHER_CELERY_METRICS_PORT (serveur
+HTTP démarré par worker_init). Avec le pool prefork, PROMETHEUS_MULTIPROC_DIR
+doit pointer vers un répertoire vide au démarrage pour agréger les processus
+enfants (voir docker-compose.yml).
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    task_success,
+    worker_init,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from kombu.utils.json import dumps
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+SENT_AT_HEADER = "sent_at"
+
+TASK_QUEUE_WAIT = Histogram(
+    "weather_celery_task_queue_wait_seconds",
+    "Attente des tâches entre leur publication et le début de leur exécution",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+TASK_RUNTIME = Histogram(
+    "weather_celery_task_runtime_seconds",
+    "Durée d'exécution des tâches",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+TASK_RETRIES = Counter(
+    "weather_celery_task_retries_total",
+    "Nouvelles tentatives de tâches",
+    ["task"],
+)
+TASK_FAILURES = Counter(
+    "weather_celery_task_failures_total",
+    "Tâches en échec",
+    ["task", "exception"],
+)
+TASK_RESULT_SIZE = Histogram(
+    "weather_celery_task_result_bytes",
+    "Taille (JSON) des résultats de tâches enregistrés",
+    ["task"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+TASKS_IN_PROGRESS = Gauge(
+    "weather_celery_tasks_in_progress",
+    "Tâches en cours d'exécution",
+    ["task"],
+    multiprocess_mode="livesum",
+)
+
+# Début d'exécution des tâches en cours du processus, par id de tâche
+_started = {}
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value.timestamp() if isinstance(value, datetime) else None
+
+
+@before_task_publish.connect
+def stamp_sent_at(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers[SENT_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def task_started(sender=None, task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    TASKS_IN_PROGRESS.labels(task=task.name).inc()
+
+    sent_at = getattr(task.request, SENT_AT_HEADER, None)
+    if sent_at is None:
+        return  # tâche exécutée sans passer par le broker (eager, apply)
+    queued_since = float(sent_at)
+    eta = _timestamp(task.request.eta)
+    if eta is not None:
+        # Tâche différée : l'attente commence à l'heure prévue
+        queued_since = max(queued_since, eta)
+    TASK_QUEUE_WAIT.labels(task=task.name).observe(max(0.0, time.time() - queued_since))
+
+
+@task_postrun.connect
+def task_finished(sender=None, task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    TASKS_IN_PROGRESS.labels(task=task.name).dec()
+    if started is not None:
+        TASK_RUNTIME.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@task_retry.connect
+def task_retried(sender=None, **kwargs):
+    TASK_RETRIES.labels(task=sender.name).inc()
+
+
+@task_failure.connect
+def task_failed(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.labels(task=sender.name, exception=type(exception).__name__).inc()
+
+
+@task_success.connect
+def task_succeeded(sender=None, result=None, **kwargs):
+    if sender.ignore_result or sender.request.ignore_result:
+        return
+    try:
+        size = len(dumps(result).encode("utf-8"))
+    except (TypeError, ValueError):
+        return
+    TASK_RESULT_SIZE.labels(task=sender.name).observe(size)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """
+    Serveur HTTP des métriques, dans le processus principal du worker
+    """
+    port = settings.WEATHER_CELERY_METRICS_PORT
+    if not port:
+        return
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    try:
+        start_http_server(port, registry=registry)
+    except OSError as e:
+        logger.warning(f"Métriques Celery non exposées sur le port {port}: {e}")
+        return
+    logger.info(f"Métriques Celery exposées sur le port {port}")
+
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
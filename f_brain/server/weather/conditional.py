@@ -0,0 +1,98 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) et Cache-Control des
+endpoints de lecture.
+
+- Une recherche enregistrée ne change jamais : ETag fort dérivé de son
+  identifiant et Cache-Control immutable. Son existence est vérifiée avant
+  (une recherche supprimée donne 404, pas 304).
+- L'historique change quand une recherche est ajoutée, modifiée ou purgée :
+  Last-Modified = max(searched_at) et ETag faible = max(id) et version de
+  l'historique (HistoryVersion, incrémentée par chaque écriture : une purge
+  peut supprimer des lignes au milieu sans changer max(id)). Les maximums
+  sont lus dans les index, sans parcourir la table.
+
+Si le client (ou le proxy) possède déjà la version courante, la réponse 304
+est renvoyée avant la requête principale.
+"""
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import HistoryVersion, WeatherSearch
+
+
+def record_etag(key):
+    """
+    ETag fort d'une recherche (`key` : id ou public_id de l'URL)
+    """
+    return f'"search-{key}"'
+
+
+HISTORY_STATE = {
+    "last_id": Max("id"),
+    "last_searched_at": Max("searched_at"),
+}
+
+HISTORY_VERSION = HistoryVersion.objects.order_by("id").values_list("version", flat=True)
+
+
+def bump_history_version():
+    """
+    Invalide les validateurs de l'historique ; à appeler dans la transaction
+    qui modifie WeatherSearch, ou juste après la suppression
+    """
+    if not HistoryVersion.objects.update(version=F("version") + 1, updated_at=timezone.now()):
+        HistoryVersion.objects.create(version=1)
+
+
+def _history_validators(state, version):
+    last_searched_at = state["last_searched_at"]
+    etag = f'W/"history-{state["last_id"] or 0}-{version or 0}"'
+    last_modified = int(last_searched_at.timestamp()) if last_searched_at else None
+    return etag, last_modified
+
+
+def history_validators():
+    """
+    (ETag, Last-Modified) de l'historique
+    """
+    return _history_validators(
+        WeatherSearch.objects.aggregate(**HISTORY_STATE), HISTORY_VERSION.first()
+    )
+
+
+async def ahistory_validators():
+    return _history_validators(
+        await WeatherSearch.objects.aaggregate(**HISTORY_STATE), await HISTORY_VERSION.afirst()
+    )
+
+
+def not_modified(request, etag=None, last_modified=None, **cache_control):
+    """
+    Réponse 304 (ou 412) si les validateurs du client sont à jour, sinon None
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified, **cache_control)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None, **cache_control):
+    if etag:
+        response.headers.setdefault("ETag", etag)
+    if last_modified:
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+    if cache_control:
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def record_cache_control():
+    return {"public": True, "max_age": settings.WEATHER_RECORD_MAX_AGE, "immutable": True}
+
+
+def history_cache_control():
+    return {"public": True, "max_age": settings.WEATHER_HISTORY_MAX_AGE}
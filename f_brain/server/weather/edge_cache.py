@@ -0,0 +1,94 @@
+"""
+Cache de bord (micro-cache nginx, voir proxy/edge-cache.conf).
+
+Le proxy ne met en cache que les réponses qui portent une durée explicite :
+
+- X-Accel-Expires : durée en cache au proxy (retiré par nginx de la réponse)
+- Cache-Control : s-maxage pour les caches partagés, max-age pour le navigateur
+- Vary : Origin est ajouté par django-cors-headers (une variante par origine)
+
+Les erreurs n'ont pas ces en-têtes et ne sont donc jamais mises en cache.
+
+Après l'enregistrement de nouvelles recherches, les pages d'historique les plus
+demandées (WEATHER_EDGE_CACHE_REFRESH_PATHS) sont rafraîchies au proxy par la
+tâche refresh_edge_cache, sur le port interne du proxy qui contourne le cache
+et remplace l'entrée. La clé de cache contient l'hôte : la requête porte
+l'en-tête Host public (WEATHER_EDGE_CACHE_HOSTS), pas celui du proxy. Au plus
+un rafraîchissement est en attente à la fois, quel que soit le nombre de
+recherches enregistrées (par processus sans Redis, voir
+services.coalescing_cache).
+"""
+
+import logging
+
+import requests
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+
+from .outbox import outbox_event
+from .services import coalescing_cache
+
+logger = logging.getLogger(__name__)
+
+REFRESH_PENDING_KEY = "weather:edge:refresh-pending"
+
+
+def set_edge_cache(response, edge_max_age, max_age=0):
+    """
+    Réponse mise en cache `edge_max_age` secondes au proxy, `max_age` au navigateur
+    """
+    if edge_max_age <= 0:
+        return response
+    patch_cache_control(response, public=True, max_age=max_age, s_maxage=edge_max_age)
+    response["X-Accel-Expires"] = str(edge_max_age)
+    return response
+
+
+def edge_refresh_event():
+    """
+    OutboxEvent de rafraîchissement de l'historique au proxy, ou None si le
+    cache de bord n'est pas configuré ou qu'un rafraîchissement est déjà en
+    attente (il couvrira les recherches enregistrées entre-temps)
+    """
+    if not settings.WEATHER_EDGE_CACHE_URL or not settings.WEATHER_EDGE_CACHE_REFRESH_PATHS:
+        return None
+    try:
+        pending = not coalescing_cache().add(
+            REFRESH_PENDING_KEY, 1, settings.WEATHER_EDGE_CACHE_REFRESH_INTERVAL
+        )
+    except Exception as e:
+        logger.warning(f"Cache de bord: état du rafraîchissement indisponible: {e}")
+        pending = False
+    if pending:
+        return None
+    return outbox_event("weather.tasks.refresh_edge_cache")
+
+
+def refresh_edge_pages(paths=None, timeout=5):
+    """
+    Rafraîchit les pages d'historique en cache au proxy ; retourne le nombre
+    de pages rafraîchies
+    """
+    # Libère la place avant les requêtes : une recherche enregistrée pendant
+    # le rafraîchissement en programme un nouveau
+    try:
+        coalescing_cache().delete(REFRESH_PENDING_KEY)
+    except Exception as e:
+        logger.warning(f"Cache de bord: état du rafraîchissement indisponible: {e}")
+
+    base_url = settings.WEATHER_EDGE_CACHE_URL.rstrip("/")
+    refreshed = 0
+    with requests.Session() as session:
+        for host in settings.WEATHER_EDGE_CACHE_HOSTS:
+            for path in paths or settings.WEATHER_EDGE_CACHE_REFRESH_PATHS:
+                try:
+                    response = session.get(
+                        f"{base_url}{path}", headers={"Host": host}, timeout=timeout
+                    )
+                    response.raise_for_status()
+                    refreshed += 1
+                except requests.exceptions.RequestException as e:
+                    logger.warning(
+                        f"Cache de bord: rafraîchissement de {host}{path} impossible: {e}"
+                    )
+    return refreshed
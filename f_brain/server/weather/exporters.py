@@ -0,0 +1,234 @@
+"""
+Export des recherches météo dans des fichiers (CSV ou JSON Lines compressés
+en gzip, ou Parquet si pyarrow est installé).
+
+Les lignes sont lues en flux (.values_list().iterator()) et écrites au fur et
+à mesure : la mémoire utilisée ne dépend pas de la taille de la table. En mode
+incrémental, seules les recherches ajoutées depuis l'export précédent du même
+format sont exportées (position enregistrée, voir weather/watermarks.py).
+"""
+
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .models import WeatherSearch
+from .watermarks import get_watermark, settled_position, swap_watermark
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = (
+    "id",
+    "city",
+    "country",
+    "temperature",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "description",
+    "icon",
+    "searched_at",
+)
+
+CSV_HEADER = (
+    "ID",
+    "City",
+    "Country",
+    "Temperature",
+    "Humidity",
+    "Wind Speed",
+    "Pressure",
+    "Description",
+    "Icon",
+    "Searched At",
+)
+
+# "json" : ancien nom du format, exporté en JSON Lines
+FORMAT_ALIASES = {"json": "jsonl"}
+
+
+class _CsvWriter:
+    extension = "csv.gz"
+
+    def __init__(self, path):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CSV_HEADER)
+
+    def write(self, rows):
+        self.writer.writerows(row[:-1] + (row[-1].isoformat(),) for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _JsonlWriter:
+    extension = "jsonl.gz"
+
+    def __init__(self, path):
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["searched_at"] = record["searched_at"].isoformat()
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    extension = "parquet"
+
+    def __init__(self, path):
+        self.writer = None
+        self.path = path
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        table = pyarrow.table(dict(zip(EXPORT_FIELDS, columns)))
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path, table.schema, compression="zstd"
+            )
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {
+    "csv": _CsvWriter,
+    "jsonl": _JsonlWriter,
+    "parquet": _ParquetWriter,
+}
+
+
+def _writer_class(export_format):
+    export_format = FORMAT_ALIASES.get(export_format.lower(), export_format.lower())
+    if export_format not in WRITERS:
+        raise ValueError(f"Format d'export non supporté: {export_format}")
+    if export_format == "parquet" and pyarrow is None:
+        raise ValueError("Le format parquet nécessite le paquet pyarrow")
+    return export_format, WRITERS[export_format]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as export_file:
+        for block in iter(lambda: export_file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_rows(queryset, tmp_path, writer_class, chunk_size):
+    writer = writer_class(tmp_path)
+    count = 0
+    max_id = None
+    batch = []
+    try:
+        rows = queryset.order_by("id").values_list(*EXPORT_FIELDS)
+        for row in rows.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                writer.write(batch)
+                count += len(batch)
+                max_id = batch[-1][0]
+                batch = []
+        if batch:
+            writer.write(batch)
+            count += len(batch)
+            max_id = batch[-1][0]
+        writer.close()
+    except Exception:
+        writer.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return count, max_id
+
+
+def _tmp_path(path):
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def write_export(queryset, path, writer_class, chunk_size):
+    """
+    Écrit les recherches de `queryset` dans `path` ; retourne le nombre de
+    lignes et le plus grand id exporté
+    """
+    tmp_path = _tmp_path(path)
+    count, max_id = _write_rows(queryset, tmp_path, writer_class, chunk_size)
+    os.replace(tmp_path, path)
+    return count, max_id
+
+
+def export_searches(export_format="csv", incremental=False, directory=None, chunk_size=None):
+    """
+    Exporte les recherches dans un fichier de `directory` (WEATHER_EXPORT_DIR
+    par défaut). Retourne le chemin, le nombre de lignes et le SHA-256 du
+    fichier ; en mode incrémental sans nouvelle recherche, aucun fichier
+    n'est créé (path=None).
+    """
+    export_format, writer_class = _writer_class(export_format)
+    directory = Path(directory or settings.WEATHER_EXPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    chunk_size = chunk_size or settings.WEATHER_EXPORT_CHUNK_SIZE
+    stamp = timezone.now().strftime("%Y%m%dT%H%M%S")
+
+    if not incremental:
+        path = directory / f"weather-searches-{stamp}.{writer_class.extension}"
+        count, _ = write_export(WeatherSearch.objects.all(), path, writer_class, chunk_size)
+        since_id = None
+    else:
+        # Fichier écrit hors transaction, puis position avancée seulement si
+        # aucun autre export ne l'a fait entre-temps
+        watermark = get_watermark(f"weather-export-{export_format}")
+        since_id = watermark.position
+        end = settled_position(watermark, WeatherSearch)
+        queryset = WeatherSearch.objects.filter(id__gt=since_id, id__lte=end)
+        path = directory / (
+            f"weather-searches-{stamp}-from-{since_id + 1}.{writer_class.extension}"
+        )
+        tmp_path = _tmp_path(path)
+        count, max_id = _write_rows(queryset, tmp_path, writer_class, chunk_size)
+        if count and not swap_watermark(watermark, max_id):
+            logger.warning(
+                f"Export incrémental {export_format} depuis {since_id}: position "
+                "déjà avancée par un autre export, fichier abandonné"
+            )
+            count = 0
+        if not count:
+            tmp_path.unlink(missing_ok=True)
+            return {
+                "format": export_format,
+                "path": None,
+                "row_count": 0,
+                "sha256": None,
+                "since_id": since_id,
+            }
+        os.replace(tmp_path, path)
+
+    result = {
+        "format": export_format,
+        "path": str(path),
+        "row_count": count,
+        "sha256": _sha256(path),
+        "since_id": since_id,
+    }
+    logger.info(f"Export: {count} recherches écrites dans {path}")
+    return result
@@ -0,0 +1,210 @@
+"""
+Filtres, pagination et sérialisation en flux de l'historique des recherches
+météo.
+
+La pagination est par curseur (keyset) sur (searched_at, id), du plus récent
+au plus ancien : chaque page est une requête indexée de `limit` lignes, quelle
+que soit sa profondeur. Le curseur de la page suivante est un jeton opaque
+renvoyé dans les en-têtes X-Next-Cursor et Link.
+
+L'export (csv_lines, ndjson_lines) est compressé en gzip si le client
+l'accepte (accepts_gzip).
+"""
+
+import base64
+import binascii
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exporters import CSV_HEADER, EXPORT_FIELDS
+
+
+def parse_moment(value, end=False):
+    """
+    Date ("2026-10-01") ou date/heure ISO 8601 ; une date seule en borne de
+    fin inclut toute la journée
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    if moment is None:
+        raise ValueError(f"Date invalide: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_searches(queryset, params):
+    """
+    Filtre city, country, start (inclus) et end (exclu) ; ValueError si une
+    date est invalide
+    """
+    city = (params.get("city") or "").strip()
+    if city:
+        queryset = queryset.filter(city__iexact=city)
+    country = (params.get("country") or "").strip()
+    if country:
+        queryset = queryset.filter(country=country.upper())
+    if params.get("start"):
+        queryset = queryset.filter(searched_at__gte=parse_moment(params["start"]))
+    if params.get("end"):
+        queryset = queryset.filter(searched_at__lt=parse_moment(params["end"], end=True))
+    return queryset
+
+
+def clamp_limit(value, default=10):
+    """
+    Taille de page demandée, bornée à WEATHER_HISTORY_MAX_LIMIT
+    """
+    try:
+        limit = int(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, settings.WEATHER_HISTORY_MAX_LIMIT))
+
+
+def encode_cursor(searched_at, search_id):
+    payload = json.dumps([searched_at.isoformat(), search_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    (searched_at, id) d'un curseur ; ValueError s'il est invalide
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        searched_at, search_id = json.loads(payload)
+        moment = parse_datetime(searched_at)
+        if moment is None or not isinstance(search_id, int):
+            raise ValueError
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Curseur invalide")
+    return moment, search_id
+
+
+def before_cursor(queryset, cursor):
+    """
+    Recherches strictement plus anciennes que la position (searched_at, id)
+    """
+    searched_at, search_id = cursor
+    return queryset.filter(
+        Q(searched_at__lt=searched_at) | Q(searched_at=searched_at, id__lt=search_id)
+    )
+
+
+def history_queryset(queryset, params, fields, limit):
+    """
+    Page de l'historique (filtres et curseur de `params`), projetée sur
+    `fields` : limit + 1 lignes au plus, la dernière ne servant qu'à savoir
+    s'il existe une page suivante. ValueError si un paramètre est invalide.
+    """
+    queryset = filter_searches(queryset, params)
+    if params.get("cursor"):
+        queryset = before_cursor(queryset, decode_cursor(params["cursor"]))
+    fields = tuple(dict.fromkeys(tuple(fields) + ("id", "searched_at")))
+    return queryset.order_by("-searched_at", "-id").values(*fields)[:limit + 1]
+
+
+def paginate(rows, limit):
+    """
+    (lignes de la page, curseur de la page suivante ou None)
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["searched_at"], rows[-1]["id"])
+
+
+def set_next_page(response, request, next_cursor):
+    """
+    En-têtes X-Next-Cursor et Link (rel="next") de la page suivante
+    """
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        response["X-Next-Cursor"] = next_cursor
+        response["Link"] = (
+            f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+        )
+    return response
+
+
+class _Echo:
+    """
+    Pseudo-fichier pour csv.writer : retourne la ligne au lieu de l'écrire
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, batch_size=500):
+    """
+    En-tête puis lignes CSV de tuples EXPORT_FIELDS, regroupées par lots
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row[:-1] + (row[-1].isoformat(),)))
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def ndjson_lines(rows, batch_size=500):
+    """
+    Un objet JSON par ligne pour chaque tuple EXPORT_FIELDS, regroupés par lots
+    """
+    batch = []
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        record["searched_at"] = record["searched_at"].isoformat()
+        batch.append(json.dumps(record) + "\n")
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Vrai si l'en-tête Accept-Encoding accepte gzip : "gzip" (ou "x-gzip"), à
+    défaut "*", avec une qualité non nulle ("gzip;q=0" le refuse)
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
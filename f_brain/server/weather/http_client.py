@@ -0,0 +1,252 @@
+"""
+Client HTTP partagé pour tous les appels à OpenWeatherMap.
+
+Une seule Session `requests` par processus : les connexions TCP/TLS sont
+réutilisées (keep-alive), le nombre de connexions par hôte est borné, chaque
+appel a des timeouts de connexion/lecture, et les nouvelles tentatives
+(backoff exponentiel avec jitter) sont limitées par un budget global.
+
+Les vues asynchrones utilisent l'équivalent httpx avec les mêmes réglages :
+voir openweathermap_aget(). Le client httpx n'est partagé qu'en mode ASGI (une
+boucle d'événements par processus) ; sous WSGI, chaque appel a le sien.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import UPSTREAM_RETRIES, record_upstream
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class RetryBudget:
+    """
+    Budget de nouvelles tentatives partagé par le processus.
+
+    Chaque requête crédite `ratio` jeton, chaque nouvelle tentative en consomme
+    un : quand l'API est en panne, les retries ne multiplient pas la charge.
+    """
+
+    def __init__(self, ratio, reserve):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, float(self.reserve))
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class BudgetedRetry(Retry):
+    """
+    Retry urllib3 qui abandonne dès que le budget global est épuisé
+    """
+
+    def increment(self, *args, **kwargs):
+        if not _retry_budget.withdraw():
+            logger.warning("Budget de nouvelles tentatives OpenWeatherMap épuisé")
+            UPSTREAM_RETRIES.labels(outcome="budget_exhausted").inc()
+            return Retry.increment(self.new(total=0), *args, **kwargs)
+        UPSTREAM_RETRIES.labels(outcome="retried").inc()
+        return super().increment(*args, **kwargs)
+
+
+_retry_budget = RetryBudget(
+    ratio=settings.OPENWEATHERMAP_RETRY_BUDGET_RATIO,
+    reserve=settings.OPENWEATHERMAP_RETRY_BUDGET_RESERVE,
+)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    retries = BudgetedRetry(
+        total=settings.OPENWEATHERMAP_MAX_RETRIES,
+        backoff_factor=settings.OPENWEATHERMAP_BACKOFF_FACTOR,
+        backoff_jitter=settings.OPENWEATHERMAP_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.OPENWEATHERMAP_POOL_CONNECTIONS,
+        pool_maxsize=settings.OPENWEATHERMAP_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Session partagée du processus (recréée après un fork des workers Celery)
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def _request_args(endpoint, params):
+    url = f"{settings.OPENWEATHERMAP_BASE_URL.rstrip('/')}/{endpoint}"
+    params.setdefault("units", "metric")
+    params["appid"] = settings.OPENWEATHERMAP_API_KEY
+    return url, params
+
+
+def openweathermap_get(endpoint, **params):
+    """
+    GET sur l'API OpenWeatherMap (ex: endpoint="weather", q="Paris,FR")
+    """
+    url, params = _request_args(endpoint, params)
+
+    _retry_budget.deposit()
+    started = time.perf_counter()
+    try:
+        response = get_session().get(
+            url,
+            params=params,
+            timeout=(
+                settings.OPENWEATHERMAP_CONNECT_TIMEOUT,
+                settings.OPENWEATHERMAP_READ_TIMEOUT,
+            ),
+        )
+    except requests.exceptions.RequestException:
+        record_upstream(endpoint, started)
+        raise
+    record_upstream(endpoint, started, response)
+    return response
+
+
+# ================================
+# CLIENT ASYNCHRONE (httpx)
+# ================================
+
+_async_client = None
+_async_client_loop = None
+_shared_async_client = False
+
+
+def enable_shared_async_client():
+    """
+    Active l'AsyncClient partagé (appelé par server_config/asgi.py : sous
+    uvicorn, une seule boucle d'événements par processus)
+    """
+    global _shared_async_client
+    _shared_async_client = True
+
+
+def _build_async_client():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.OPENWEATHERMAP_READ_TIMEOUT,
+            connect=settings.OPENWEATHERMAP_CONNECT_TIMEOUT,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.OPENWEATHERMAP_POOL_MAXSIZE,
+            max_keepalive_connections=settings.OPENWEATHERMAP_POOL_MAXSIZE,
+        ),
+    )
+
+
+def _close_async_client(client, loop):
+    """
+    Ferme un AsyncClient remplacé, dans sa propre boucle si elle tourne encore
+    (ses connexions ne peuvent être fermées que par elle)
+    """
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+def get_async_client():
+    """
+    AsyncClient httpx partagé par la boucle d'événements courante (mode ASGI
+    seulement). Si la boucle change, l'ancien client est fermé avant d'être
+    remplacé.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        if _async_client is not None:
+            _close_async_client(_async_client, _async_client_loop)
+        _async_client = _build_async_client()
+        _async_client_loop = loop
+    return _async_client
+
+
+def _backoff_delay(attempt):
+    delay = settings.OPENWEATHERMAP_BACKOFF_FACTOR * (2 ** attempt)
+    return delay + random.uniform(0, settings.OPENWEATHERMAP_BACKOFF_JITTER)
+
+
+async def openweathermap_aget(endpoint, **params):
+    """
+    Version asynchrone de openweathermap_get() (mêmes timeouts, retries et budget)
+    """
+    if _shared_async_client:
+        return await _aget(get_async_client(), endpoint, params)
+    # Hors ASGI (vue asynchrone sous WSGI : une boucle par requête), un client
+    # par appel, fermé à la fin
+    async with _build_async_client() as client:
+        return await _aget(client, endpoint, params)
+
+
+async def _aget(client, endpoint, params):
+    url, params = _request_args(endpoint, params)
+
+    _retry_budget.deposit()
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code not in RETRY_STATUS_CODES:
+                record_upstream(endpoint, started, response)
+                return response
+            error = None
+        except httpx.TransportError as e:
+            response, error = None, e
+
+        give_up = attempt >= settings.OPENWEATHERMAP_MAX_RETRIES
+        if not give_up and not _retry_budget.withdraw():
+            UPSTREAM_RETRIES.labels(outcome="budget_exhausted").inc()
+            give_up = True
+        if give_up:
+            record_upstream(endpoint, started, response)
+            if error is not None:
+                raise error
+            return response
+
+        UPSTREAM_RETRIES.labels(outcome="retried").inc()
+        await asyncio.sleep(_backoff_delay(attempt))
+        attempt += 1
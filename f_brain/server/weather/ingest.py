@@ -0,0 +1,500 @@
+"""
+Enregistrement des recherches météo (WeatherSearch).
+
+Toutes les écritures de recherches passent par ce module. Selon
+WEATHER_WRITE_BEHIND_MODE, record_searches() écrit immédiatement ou diffère
+l'insertion hors du chemin de la requête :
+
+- "off"    : INSERT dans la requête (comportement par défaut)
+- "memory" : tampon en mémoire du processus, vidé par bulk_create par lots
+- "celery" : tampon en mémoire vidé en publiant un lot à la tâche
+             persist_weather_searches (le broker assure la durabilité)
+
+Les tâches déclenchées par une recherche (async_weather_processing) sont
+écrites dans l'outbox dans la même transaction que la recherche elle-même,
+au plus une par ville toutes les WEATHER_PROCESSING_COALESCE_WINDOW secondes.
+Le compteur de recherches par ville (CitySearchStats) est mis à jour dans la
+même transaction, avec le rafraîchissement de l'historique en cache au proxy
+(voir weather/edge_cache.py).
+
+Le tampon est vidé dès qu'il atteint WEATHER_WRITE_BEHIND_BATCH_SIZE ou toutes
+les WEATHER_WRITE_BEHIND_INTERVAL secondes, et une dernière fois à l'arrêt du
+processus. Ce qui ne peut pas être écrit à l'arrêt (ou à la réception de
+SIGTERM/SIGINT) est déposé dans WEATHER_WRITE_BEHIND_SPOOL_DIR puis rejoué au
+démarrage suivant. Le tampon est borné (WEATHER_WRITE_BEHIND_MAX_ROWS) et un
+lot qui échoue WEATHER_WRITE_BEHIND_MAX_ATTEMPTS fois part dans le dead-letter
+(commande replay_write_behind).
+"""
+
+import atexit
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .conditional import bump_history_version
+from .edge_cache import edge_refresh_event
+from .models import CitySearchStats, OutboxEvent, WeatherSearch
+from .outbox import outbox_event
+from .services import coalescing_cache, normalize_location
+
+logger = logging.getLogger(__name__)
+
+ROW_FIELDS = (
+    "public_id",
+    "city",
+    "country",
+    "temperature",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "description",
+    "icon",
+    "searched_at",
+)
+
+
+def search_to_row(search):
+    """
+    Dictionnaire sérialisable en JSON d'une recherche non enregistrée
+    """
+    row = {field: getattr(search, field) for field in ROW_FIELDS}
+    row["public_id"] = str(row["public_id"])
+    row["searched_at"] = row["searched_at"].isoformat()
+    return row
+
+
+def row_to_search(row):
+    values = dict(row)
+    values.pop("enqueue_processing", None)
+    values["public_id"] = uuid.UUID(values["public_id"])
+    values["searched_at"] = parse_datetime(values["searched_at"])
+    return WeatherSearch(**values)
+
+
+def processing_payload(search):
+    return {
+        "city": search.city,
+        "temperature": search.temperature,
+        "humidity": search.humidity,
+        "description": search.description,
+        "country": search.country,
+    }
+
+
+def processing_event(search):
+    return outbox_event("weather.tasks.async_weather_processing", processing_payload(search))
+
+
+def should_enqueue_processing(search):
+    """
+    Réserve le traitement de la ville pour la fenêtre de regroupement.
+
+    Seule la première recherche d'une ville dans la fenêtre obtient la clé
+    (cache.add est atomique, une commande Redis) ; les suivantes sont
+    couvertes par sa tâche. Si le cache est indisponible, la tâche est
+    ajoutée quand même.
+    """
+    window = settings.WEATHER_PROCESSING_COALESCE_WINDOW
+    if window <= 0:
+        return True
+    city, country = normalize_location(search.city, search.country)
+    key = f"weather:processing:{quote(city, safe='')}:{country}"
+    try:
+        return coalescing_cache().add(key, 1, window)
+    except Exception as e:
+        logger.warning(f"Regroupement du traitement indisponible ({key}): {e}")
+        return True
+
+
+def _observation(search):
+    return {
+        "display_city": search.city,
+        "last_searched_at": search.searched_at,
+        "last_temperature": search.temperature,
+        "last_humidity": search.humidity,
+        "last_wind_speed": search.wind_speed,
+        "last_description": search.description,
+        "last_icon": search.icon,
+    }
+
+
+def _stats_update(count, observation, now):
+    """
+    Valeurs d'un seul UPDATE de CitySearchStats : compteur incrémenté (F()) et
+    dernière observation, sauf si la ligne en a déjà une plus récente (une
+    écriture différée ne doit pas la remplacer)
+    """
+    newer = Q(last_searched_at__isnull=True) | Q(
+        last_searched_at__lte=observation["last_searched_at"]
+    )
+    values = {
+        field: Case(
+            When(newer, then=Value(value)),
+            default=F(field),
+            output_field=CitySearchStats._meta.get_field(field),
+        )
+        for field, value in observation.items()
+    }
+    return {"search_count": F("search_count") + count, "updated_at": now, **values}
+
+
+def _update_city_stats(searches):
+    """
+    Incrémente CitySearchStats (F(), sans relecture) et enregistre la
+    dernière observation de chaque ville du lot, en un UPDATE par ville
+    """
+    groups = {}
+    for search in searches:
+        key = normalize_location(search.city, search.country)
+        count, latest = groups.get(key, (0, search))
+        if search.searched_at >= latest.searched_at:
+            latest = search
+        groups[key] = (count + 1, latest)
+
+    now = timezone.now()
+    for (city, country), (count, latest) in groups.items():
+        observation = _observation(latest)
+        stats = CitySearchStats.objects.filter(city=city, country=country)
+        if stats.update(**_stats_update(count, observation, now)):
+            continue
+        try:
+            with transaction.atomic():
+                CitySearchStats.objects.create(
+                    city=city, country=country, search_count=count, **observation
+                )
+        except IntegrityError:
+            # Ligne créée entre-temps par une autre transaction
+            stats.update(**_stats_update(count, observation, now))
+
+
+def save_searches(searches, events=()):
+    """
+    Insertion directe d'un lot de recherches (une seule requête par lot), des
+    événements outbox associés et des compteurs par ville, dans une même
+    transaction
+    """
+    if not searches:
+        return []
+    batch_size = settings.WEATHER_WRITE_BEHIND_BATCH_SIZE
+    with transaction.atomic():
+        created = WeatherSearch.objects.bulk_create(searches, batch_size=batch_size)
+        _update_city_stats(created)
+        # Historique en cache au proxy : rafraîchi après ces recherches
+        refresh = edge_refresh_event()
+        if refresh is not None:
+            events = [*events, refresh]
+        if events:
+            OutboxEvent.objects.bulk_create(events, batch_size=batch_size)
+        bump_history_version()
+    return created
+
+
+def save_rows(rows):
+    """
+    Insère des lignes sérialisées par search_to_row() (tampon write-behind)
+    """
+    searches = [row_to_search(row) for row in rows]
+    events = [
+        processing_event(search)
+        for search, row in zip(searches, rows)
+        if row.get("enqueue_processing")
+    ]
+    return save_searches(searches, events)
+
+
+class WriteBehindBuffer:
+    """
+    Tampon de recherches vidé par un thread d'arrière-plan.
+
+    Au-delà de `max_rows` lignes en attente, add() écrit le lot lui-même
+    (contre-pression : la requête attend l'insertion). Un lot en échec est
+    retenté aux vidages suivants sans bloquer les autres ; après
+    `max_attempts` échecs il est déposé dans le dead-letter (sous-dossier
+    "dead-letter" du spool), rejoué seulement à la demande.
+    """
+
+    def __init__(self, flush_batch, batch_size, interval, spool_dir, max_rows, max_attempts):
+        self.flush_batch = flush_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.spool_dir = Path(spool_dir)
+        self.dead_letter_dir = self.spool_dir / "dead-letter"
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self._rows = []
+        # Lots en échec : [(lignes, nombre d'échecs)]
+        self._retries = []
+        # Réentrant : le gestionnaire de signal peut interrompre add()
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows) + sum(len(batch) for batch, _ in self._retries)
+
+    def add(self, rows):
+        with self._lock:
+            self._ensure_thread()
+            overflow = self.pending() + len(rows) > self.max_rows
+            if not overflow:
+                self._rows.extend(rows)
+            full = len(self._rows) >= self.batch_size
+        if overflow:
+            logger.warning(
+                f"Write-behind: tampon plein ({self.max_rows} recherches), "
+                f"insertion synchrone de {len(rows)} recherches"
+            )
+            self.flush_batch(rows)
+        elif full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Un thread par processus (les workers peuvent être créés par fork)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="weather-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        self.replay_spool()
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur lors du vidage du tampon write-behind: {e}")
+
+    def _take(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            retries, self._retries = self._retries, []
+        return rows, retries
+
+    def flush(self):
+        """
+        Écrit le tampon par lots, en commençant par les lots en échec ;
+        retourne le nombre de recherches enregistrées
+        """
+        rows, retries = self._take()
+        batches = retries + [
+            (rows[start:start + self.batch_size], 0)
+            for start in range(0, len(rows), self.batch_size)
+        ]
+        written = 0
+        for batch, failures in batches:
+            try:
+                self.flush_batch(batch)
+                written += len(batch)
+            except Exception as e:
+                failures += 1
+                if failures >= self.max_attempts:
+                    path = self._spool(batch, self.dead_letter_dir)
+                    logger.error(
+                        f"Write-behind: {len(batch)} recherches en échec {failures} fois "
+                        f"({e}), déposées dans {path}"
+                    )
+                else:
+                    logger.warning(
+                        f"Write-behind: échec d'un lot de {len(batch)} recherches ({e}), "
+                        "retenté au prochain vidage"
+                    )
+                    with self._lock:
+                        self._retries.append((batch, failures))
+        if written:
+            logger.info(f"Write-behind: {written} recherches enregistrées")
+        return written
+
+    def shutdown(self):
+        """
+        Vidage final à l'arrêt du processus ; le reste part dans le spool
+        """
+        try:
+            self.flush()
+        finally:
+            self.spool_pending()
+
+    def spool_pending(self):
+        """
+        Dépose tout le tampon dans le spool (rejoué au démarrage suivant),
+        sans accès à la base
+        """
+        rows, retries = self._take()
+        rows = [row for batch, _ in retries for row in batch] + rows
+        if rows:
+            path = self._spool(rows, self.spool_dir)
+            logger.warning(f"Write-behind: {len(rows)} recherches déposées dans {path}")
+        return len(rows)
+
+    def _spool(self, rows, directory):
+        if not rows:
+            return None
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}-{time.time_ns()}.jsonl"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as spool_file:
+            for row in rows:
+                spool_file.write(json.dumps(row) + "\n")
+        # Fichier complet avant d'être visible par replay_spool()
+        os.replace(tmp_path, path)
+        return path
+
+    def replay_spool(self, dead_letter=False):
+        """
+        Rejoue les fichiers du spool (ou du dead-letter) ; retourne le nombre
+        de recherches enregistrées
+        """
+        directory = self.dead_letter_dir if dead_letter else self.spool_dir
+        if not directory.is_dir():
+            return 0
+        replayed = 0
+        for path in sorted(directory.glob("*.jsonl")):
+            # Le renommage réserve le fichier à un seul processus
+            claimed = path.with_name(f"{path.name}.{os.getpid()}.replaying")
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue
+            try:
+                with open(claimed, encoding="utf-8") as spool_file:
+                    rows = [json.loads(line) for line in spool_file if line.strip()]
+                for start in range(0, len(rows), self.batch_size):
+                    self.flush_batch(rows[start:start + self.batch_size])
+                claimed.unlink()
+                replayed += len(rows)
+                logger.info(f"Write-behind: {len(rows)} recherches rejouées depuis {path.name}")
+            except Exception as e:
+                claimed.rename(path)
+                logger.error(f"Write-behind: rejeu impossible de {path.name}: {e}")
+        return replayed
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM, signal.SIGINT)):
+        """
+        Dépose le tampon dans le spool à la réception de SIGTERM/SIGINT
+        (atexit ne s'exécute pas si le signal termine le processus), puis
+        laisse faire le gestionnaire précédent. Uniquement depuis le thread
+        principal.
+        """
+        for signum in signals:
+            previous = signal.getsignal(signum)
+
+            def handler(signum, frame, previous=previous):
+                self.spool_pending()
+                if callable(previous):
+                    previous(signum, frame)
+                elif previous != signal.SIG_IGN:
+                    signal.signal(signum, signal.SIG_DFL)
+                    os.kill(os.getpid(), signum)
+
+            signal.signal(signum, handler)
+
+
+def _flush_to_database(rows):
+    save_rows(rows)
+
+
+def _flush_to_celery(rows):
+    from .tasks import persist_weather_searches
+
+    persist_weather_searches.delay(rows)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                flush_batch = (
+                    _flush_to_celery
+                    if settings.WEATHER_WRITE_BEHIND_MODE == "celery"
+                    else _flush_to_database
+                )
+                _buffer = WriteBehindBuffer(
+                    flush_batch,
+                    batch_size=settings.WEATHER_WRITE_BEHIND_BATCH_SIZE,
+                    interval=settings.WEATHER_WRITE_BEHIND_INTERVAL,
+                    spool_dir=settings.WEATHER_WRITE_BEHIND_SPOOL_DIR,
+                    max_rows=settings.WEATHER_WRITE_BEHIND_MAX_ROWS,
+                    max_attempts=settings.WEATHER_WRITE_BEHIND_MAX_ATTEMPTS,
+                )
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def start_write_behind():
+    """
+    À appeler au démarrage du serveur (thread principal) : crée le tampon et
+    installe les gestionnaires de SIGTERM/SIGINT
+    """
+    if not write_behind_enabled():
+        return
+    try:
+        get_buffer().install_signal_handlers()
+    except ValueError:
+        # Hors du thread principal (serveur de développement avec rechargement)
+        logger.warning("Write-behind: gestionnaires de signaux non installés")
+
+
+def write_behind_enabled():
+    return settings.WEATHER_WRITE_BEHIND_MODE in ("memory", "celery")
+
+
+def record_searches(searches, enqueue_processing=False):
+    """
+    Enregistre des recherches, immédiatement ou via le tampon write-behind.
+
+    Avec enqueue_processing=True, une tâche async_weather_processing est
+    ajoutée à l'outbox pour chaque ville qui n'en a pas déjà une dans la
+    fenêtre de regroupement. En mode différé les objets n'ont pas encore de
+    clé primaire (id=None) : public_id sert d'identifiant dans les réponses.
+    """
+    enqueue = [
+        enqueue_processing and should_enqueue_processing(search) for search in searches
+    ]
+
+    if not write_behind_enabled():
+        events = [
+            processing_event(search) for search, flag in zip(searches, enqueue) if flag
+        ]
+        return save_searches(searches, events)
+
+    rows = []
+    for search, flag in zip(searches, enqueue):
+        row = search_to_row(search)
+        row["enqueue_processing"] = flag
+        rows.append(row)
+    get_buffer().add(rows)
+    return searches
+
+
+def record_search(search, enqueue_processing=False):
+    return record_searches([search], enqueue_processing)[0]
+
+
+async def arecord_search(search, enqueue_processing=False):
+    if write_behind_enabled() and not enqueue_processing:
+        # Ajout au tampon en mémoire : aucun accès à la base ni au cache
+        return record_search(search, enqueue_processing)
+    return await sync_to_async(record_search)(search, enqueue_processing)
@@ -0,0 +1,60 @@
+"""
+Django management command to publish pending OutboxEvent rows to the Celery broker.
+Runs continuously by default; use --once to drain the outbox a single time.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from weather.outbox import relay_all
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox events to the Celery broker in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.WEATHER_OUTBOX_BATCH_SIZE,
+            help="Number of events published per batch",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.WEATHER_OUTBOX_RELAY_INTERVAL,
+            help="Seconds to wait when the outbox is empty",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        if options["once"]:
+            published = relay_all(batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Published {published} events"))
+            return
+
+        self.stdout.write(
+            f"Relaying outbox events every {options['interval']}s (Ctrl+C to stop)"
+        )
+        while True:
+            close_old_connections()
+            try:
+                published = relay_all(
+                    batch_size, max_batches=settings.WEATHER_OUTBOX_MAX_BATCHES
+                )
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Relay error: {e}"))
+                published = 0
+            if published:
+                self.stdout.write(f"Published {published} events")
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,24 @@
+"""
+Django management command to replay write-behind spool files into the database.
+Use --dead-letter for batches that failed WEATHER_WRITE_BEHIND_MAX_ATTEMPTS times.
+"""
+
+from django.core.management.base import BaseCommand
+
+from weather.ingest import get_buffer
+
+
+class Command(BaseCommand):
+    help = "Replay spooled write-behind searches (or the dead-letter spool)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dead-letter",
+            action="store_true",
+            help="Replay the dead-letter spool instead of the regular spool",
+        )
+
+    def handle(self, *args, **options):
+        buffer = get_buffer()
+        replayed = buffer.replay_spool(dead_letter=options["dead_letter"])
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} searches"))
@@ -19,6 +19,11 @@ class Command(BaseCommand):
             action="store_true",
             help="Clear existing periodic tasks before creating new ones",
         )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Update existing periodic tasks instead of skipping them",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -28,6 +33,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         dry_run = options.get("dry_run", False)
         clear_existing = options.get("clear", False)
+        update_existing = options.get("update", False)
 
         if dry_run:
             self.stdout.write(
@@ -71,7 +77,7 @@ class Command(BaseCommand):
                 # Check if task already exists
                 existing_task = PeriodicTask.objects.filter(name=task_name).first()
 
-                if existing_task and not clear_existing:
+                if existing_task and not (clear_existing or update_existing):
                     self.stdout.write(
                         self.style.WARNING(
                             f"  Task '{task_name}' already exists, skipping..."
@@ -121,20 +127,15 @@ class Command(BaseCommand):
                 if task_kwargs:
                     task_data["kwargs"] = json.dumps(task_kwargs)
 
-                # Set queue and other options
-                if "queue" in task_options:
-                    task_data["queue"] = task_options["queue"]
-                if "expires" in task_options:
-                    # Convert expires to datetime if it's an integer (seconds)
-                    expires_value = task_options["expires"]
-                    if isinstance(expires_value, int):
-                        from datetime import datetime, timedelta
-
-                        task_data["expires"] = datetime.now() + timedelta(
-                            seconds=expires_value
-                        )
-                    else:
-                        task_data["expires"] = expires_value
+                # Set queue and other options (no queue: CELERY_TASK_ROUTES decides,
+                # which also clears a queue left by a previous sync)
+                task_data["queue"] = task_options.get("queue")
+                task_data["priority"] = task_options.get("priority")
+                # Per-run expiry in seconds (the "expires" PeriodicTask field is an
+                # absolute date that disables the task for good once passed, so it
+                # is cleared for tasks synced by an earlier version)
+                task_data["expire_seconds"] = task_options.get("expire_seconds")
+                task_data["expires"] = None
 
                 if dry_run:
                     self.stdout.write(f"  Would create periodic task:")
@@ -0,0 +1,57 @@
+"""
+Django management command to set up time partitioning of weather_weathersearch (PostgreSQL).
+Converts the table on first run when WEATHER_PARTITIONING is "day" or "month",
+then creates upcoming partitions. Safe to run on every deploy; no-op on SQLite.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from weather.partitions import (
+    convert_to_partitioned,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    partitioning_enabled,
+)
+
+
+class Command(BaseCommand):
+    help = "Partition weather_weathersearch by searched_at and create upcoming partitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.WEATHER_PARTITIONS_AHEAD,
+            help="Number of future periods to create partitions for",
+        )
+        parser.add_argument(
+            "--list",
+            action="store_true",
+            help="List existing partitions and exit",
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning_enabled():
+            self.stdout.write(
+                f"Partitioning disabled (WEATHER_PARTITIONING={settings.WEATHER_PARTITIONING}, "
+                f"database={connection.vendor})"
+            )
+            return
+
+        if options["list"]:
+            for name, start, end in list_partitions():
+                self.stdout.write(f"{name}: {start:%Y-%m-%d} -> {end:%Y-%m-%d}")
+            return
+
+        if not is_partitioned():
+            self.stdout.write("Converting weather_weathersearch to a partitioned table...")
+            convert_to_partitioned(options["ahead"])
+            self.stdout.write(self.style.SUCCESS("Table converted"))
+
+        partitions = ensure_partitions(options["ahead"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(partitions)} current/upcoming partitions ready")
+        )
@@ -0,0 +1,141 @@
+"""
+Métriques Prometheus du tier web (exposées sur /metrics par django-prometheus).
+
+django-prometheus mesure la latence par vue ; ce module ajoute :
+
+- les appels à OpenWeatherMap : durée, code HTTP, nouvelles tentatives ;
+- le cache météo : lectures L1/L2 réussies ou manquées ;
+- par requête HTTP : requêtes en cours, nombre et durée des requêtes SQL
+  (RequestMetricsMiddleware).
+
+Avec plusieurs processus (uvicorn --workers), PROMETHEUS_MULTIPROC_DIR doit
+pointer vers un répertoire vide au démarrage (voir docker-compose.yml).
+"""
+
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import Counter, Gauge, Histogram
+
+UPSTREAM_LATENCY = Histogram(
+    "weather_upstream_request_duration_seconds",
+    "Durée des appels à OpenWeatherMap (nouvelles tentatives comprises)",
+    ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPSTREAM_RESPONSES = Counter(
+    "weather_upstream_responses_total",
+    "Réponses d'OpenWeatherMap par code HTTP (\"error\" : pas de réponse)",
+    ["endpoint", "status"],
+)
+UPSTREAM_RETRIES = Counter(
+    "weather_upstream_retries_total",
+    "Nouvelles tentatives d'appel à OpenWeatherMap",
+    ["outcome"],  # "retried" ou "budget_exhausted"
+)
+CACHE_LOOKUPS = Counter(
+    "weather_cache_lookups_total",
+    "Lectures du cache météo",
+    ["layer", "result"],  # layer : l1/l2, result : hit/miss
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "weather_http_requests_in_flight",
+    "Requêtes HTTP en cours de traitement",
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_QUERIES = Histogram(
+    "weather_http_request_db_queries",
+    "Nombre de requêtes SQL par requête HTTP",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    "weather_http_request_db_duration_seconds",
+    "Durée cumulée des requêtes SQL par requête HTTP",
+    ["view"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def record_cache_lookup(layer, data):
+    CACHE_LOOKUPS.labels(layer=layer, result="miss" if data is None else "hit").inc()
+    return data
+
+
+def record_upstream(endpoint, started, response=None):
+    UPSTREAM_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+    status = str(response.status_code) if response is not None else "error"
+    UPSTREAM_RESPONSES.labels(endpoint=endpoint, status=status).inc()
+
+
+# Statistiques SQL de la requête HTTP en cours : [nombre, durée]. La variable de
+# contexte suit la requête dans les threads de sync_to_async (vues asynchrones).
+_request_queries = ContextVar("weather_request_queries", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Wrapper d'exécution SQL (connection.execute_wrappers), installé sur chaque
+    connexion par WeatherConfig.ready()
+    """
+    stats = _request_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "<unresolved>"
+
+
+def _start_request():
+    REQUESTS_IN_FLIGHT.inc()
+    stats = [0, 0.0]
+    return _request_queries.set(stats), stats
+
+
+def _finish_request(request, token, stats):
+    _request_queries.reset(token)
+    REQUESTS_IN_FLIGHT.dec()
+    view = _view_name(request)
+    REQUEST_DB_QUERIES.labels(view=view).observe(stats[0])
+    REQUEST_DB_DURATION.labels(view=view).observe(stats[1])
+
+
+@sync_and_async_middleware
+def RequestMetricsMiddleware(get_response):
+    """
+    Requêtes en cours et requêtes SQL par requête HTTP, par vue
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token, stats = _start_request()
+            try:
+                return await get_response(request)
+            finally:
+                _finish_request(request, token, stats)
+
+    else:
+
+        def middleware(request):
+            token, stats = _start_request()
+            try:
+                return get_response(request)
+            finally:
+                _finish_request(request, token, stats)
+
+    return middleware
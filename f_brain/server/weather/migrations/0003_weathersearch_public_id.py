@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+def gen_public_ids(apps, schema_editor):
+    # Un UUID distinct par ligne existante (le défaut n'est évalué qu'une fois)
+    WeatherSearch = apps.get_model('weather', 'WeatherSearch')
+    batch = []
+    for search in WeatherSearch.objects.only('id').iterator(chunk_size=2000):
+        search.public_id = uuid.uuid4()
+        batch.append(search)
+        if len(batch) >= 2000:
+            WeatherSearch.objects.bulk_update(batch, ['public_id'])
+            batch = []
+    if batch:
+        WeatherSearch.objects.bulk_update(batch, ['public_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0002_alter_weathersearch_options_weathersearch_country_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weathersearch',
+            name='public_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(gen_public_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='weathersearch',
+            name='public_id',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='weathersearch',
+            name='searched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
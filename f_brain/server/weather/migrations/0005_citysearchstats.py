@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_city_stats(apps, schema_editor):
+    # Même normalisation que services.normalize_location
+    WeatherSearch = apps.get_model('weather', 'WeatherSearch')
+    CitySearchStats = apps.get_model('weather', 'CitySearchStats')
+    counts = Counter()
+    groups = WeatherSearch.objects.values('city', 'country').annotate(n=Count('id')).order_by()
+    for group in groups:
+        city = " ".join((group['city'] or "").split()).casefold()
+        country = (group['country'] or "").strip().upper()
+        counts[(city, country)] += group['n']
+    CitySearchStats.objects.bulk_create(
+        [
+            CitySearchStats(city=city, country=country, search_count=count)
+            for (city, country), count in counts.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0004_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitySearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('search_count', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('city', 'country'), name='unique_city_search_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_city_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+OBSERVATION_FIELDS = (
+    'display_city', 'last_searched_at', 'last_temperature', 'last_humidity',
+    'last_wind_speed', 'last_description', 'last_icon',
+)
+
+
+def backfill_last_observation(apps, schema_editor):
+    # Même normalisation que services.normalize_location
+    WeatherSearch = apps.get_model('weather', 'WeatherSearch')
+    CitySearchStats = apps.get_model('weather', 'CitySearchStats')
+    latest = {}
+    searches = WeatherSearch.objects.order_by('searched_at', 'id').values(
+        'city', 'country', 'searched_at', 'temperature', 'humidity',
+        'wind_speed', 'description', 'icon',
+    )
+    for search in searches.iterator(chunk_size=2000):
+        key = (
+            " ".join((search['city'] or "").split()).casefold(),
+            (search['country'] or "").strip().upper(),
+        )
+        latest[key] = search
+
+    batch = []
+    for stats in CitySearchStats.objects.all():
+        search = latest.get((stats.city, stats.country))
+        if search is None:
+            continue
+        stats.display_city = search['city']
+        stats.last_searched_at = search['searched_at']
+        stats.last_temperature = search['temperature']
+        stats.last_humidity = search['humidity']
+        stats.last_wind_speed = search['wind_speed']
+        stats.last_description = search['description']
+        stats.last_icon = search['icon']
+        batch.append(stats)
+    CitySearchStats.objects.bulk_update(batch, OBSERVATION_FIELDS, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0005_citysearchstats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='citysearchstats',
+            options={'ordering': ['-search_count']},
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='display_city',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_description',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_humidity',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_icon',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_searched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_temperature',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='citysearchstats',
+            name='last_wind_speed',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='citysearchstats',
+            index=models.Index(fields=['-search_count'], name='city_stats_popularity_idx'),
+        ),
+        migrations.RunPython(backfill_last_observation, migrations.RunPython.noop),
+    ]
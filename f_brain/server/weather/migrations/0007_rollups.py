@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0006_citysearchstats_last_observation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.PositiveBigIntegerField(default=0)),
+                ('observed_position', models.PositiveBigIntegerField(default=0)),
+                ('observed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeatherDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('search_count', models.PositiveBigIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('humidity_sum', models.BigIntegerField(default=0)),
+                ('humidity_min', models.IntegerField(null=True)),
+                ('humidity_max', models.IntegerField(null=True)),
+                ('wind_speed_sum', models.FloatField(default=0)),
+                ('wind_speed_min', models.FloatField(null=True)),
+                ('wind_speed_max', models.FloatField(null=True)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='daily_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('city', 'country', 'day'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeatherHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('search_count', models.PositiveBigIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('humidity_sum', models.BigIntegerField(default=0)),
+                ('humidity_min', models.IntegerField(null=True)),
+                ('humidity_max', models.IntegerField(null=True)),
+                ('wind_speed_sum', models.FloatField(default=0)),
+                ('wind_speed_min', models.FloatField(null=True)),
+                ('wind_speed_max', models.FloatField(null=True)),
+                ('hour', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='hourly_rollup_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('city', 'country', 'hour'), name='unique_hourly_rollup')],
+            },
+        ),
+    ]
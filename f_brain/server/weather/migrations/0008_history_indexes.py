@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0007_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weathersearch',
+            index=models.Index(fields=['-searched_at', '-id'], name='search_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weathersearch',
+            index=models.Index(django.db.models.functions.text.Upper('city'), models.OrderBy(models.F('searched_at'), descending=True), models.OrderBy(models.F('id'), descending=True), name='search_city_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weathersearch',
+            index=models.Index(fields=['country', '-searched_at', '-id'], name='search_country_history_idx'),
+        ),
+    ]
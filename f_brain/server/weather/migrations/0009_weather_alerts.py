@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0008_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('display_city', models.CharField(blank=True, max_length=100)),
+                ('condition', models.CharField(choices=[('heat', 'Chaleur extrême'), ('cold', 'Froid extrême'), ('wind', 'Vent fort'), ('humidity', 'Humidité élevée')], max_length=20)),
+                ('window_start', models.DateTimeField()),
+                ('search_id', models.BigIntegerField()),
+                ('value', models.FloatField()),
+                ('searched_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='weathersearch',
+            index=models.Index(condition=models.Q(('temperature__gte', 40), ('temperature__lte', -10), ('wind_speed__gte', 15), ('humidity__gte', 90), _connector='OR'), fields=['id'], name='search_extreme_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatheralert',
+            index=models.Index(fields=['-created_at'], name='weather_alert_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatheralert',
+            index=models.Index(fields=['window_start'], name='weather_alert_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weatheralert',
+            constraint=models.UniqueConstraint(fields=('city', 'country', 'condition', 'window_start'), name='unique_weather_alert'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0009_weather_alerts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('metric', models.CharField(choices=[('temperature', 'Température'), ('humidity', 'Humidité'), ('wind_speed', 'Vitesse du vent'), ('pressure', 'Pression')], max_length=20)),
+                ('operator', models.CharField(choices=[('gte', 'supérieure ou égale à'), ('lte', 'inférieure ou égale à')], max_length=3)),
+                ('threshold', models.FloatField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weather_alert_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField()),
+                ('search_id', models.BigIntegerField()),
+                ('value', models.FloatField()),
+                ('searched_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='weather.alertsubscription')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='alertsubscription',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['city', 'metric', 'operator', 'threshold'], name='subscription_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertnotification',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['id'], name='notification_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertnotification',
+            index=models.Index(fields=['window_start'], name='notification_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertnotification',
+            constraint=models.UniqueConstraint(fields=('subscription', 'window_start'), name='unique_alert_notification'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:35
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0010_alert_subscriptions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='processingwatermark',
+            name='observed_at',
+        ),
+        migrations.RemoveField(
+            model_name='processingwatermark',
+            name='observed_position',
+        ),
+        migrations.AddField(
+            model_name='weathersearch',
+            name='recorded_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+    ]
@@ -1,6 +1,34 @@
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Now, Upper
+from django.utils import timezone
+
+# Conditions météo extrêmes (voir weather/alerts.py) : (condition, mesure,
+# opérateur, seuil). Les seuils figurent aussi dans la condition de l'index
+# partiel search_extreme_idx : les modifier demande une migration.
+EXTREME_CONDITIONS = (
+    ("heat", "temperature", "gte", 40),  # Très chaud
+    ("cold", "temperature", "lte", -10),  # Très froid
+    ("wind", "wind_speed", "gte", 15),  # Vent fort
+    ("humidity", "humidity", "gte", 90),  # Humidité très élevée
+)
+EXTREME_WEATHER = reduce(
+    or_,
+    (
+        Q(**{f"{measure}__{lookup}": threshold})
+        for _, measure, lookup, threshold in EXTREME_CONDITIONS
+    ),
+)
+
 
 class WeatherSearch(models.Model):
+    # Identifiant généré côté application : connu avant l'insertion (write-behind)
+    public_id = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
     city = models.CharField(max_length=100)
     temperature = models.FloatField()
     humidity = models.IntegerField(default=0)
@@ -9,10 +37,282 @@ class WeatherSearch(models.Model):
     description = models.CharField(max_length=255)
     icon = models.CharField(max_length=20, blank=True)
     country = models.CharField(max_length=2, blank=True)
-    searched_at = models.DateTimeField(auto_now_add=True)
+    # Horodatage fixé à la création de l'objet, même si l'insertion est différée
+    searched_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Horodatage de l'insertion, fixé par la base (voir weather/watermarks.py)
+    recorded_at = models.DateTimeField(db_default=Now(), editable=False)
 
     def __str__(self):
         return f"{self.city} - {self.temperature}°C"
     
     class Meta:
-        ordering = ['-searched_at']
\ No newline at end of file
+        ordering = ['-searched_at']
+        indexes = [
+            # Pagination par curseur (searched_at, id) et filtres de l'historique
+            models.Index(fields=['-searched_at', '-id'], name='search_history_idx'),
+            models.Index(Upper('city'), F('searched_at').desc(), F('id').desc(), name='search_city_history_idx'),
+            models.Index(fields=['country', '-searched_at', '-id'], name='search_country_history_idx'),
+            # Recherches extrêmes au-delà de la position des alertes (index partiel)
+            models.Index(fields=['id'], condition=EXTREME_WEATHER, name='search_extreme_idx'),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    Tâche Celery à publier, écrite dans la même transaction que les données
+    qui la déclenchent (voir weather/outbox.py). La ligne est supprimée une
+    fois le message publié sur le broker.
+    """
+    task_name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.task_name} ({self.created_at:%Y-%m-%d %H:%M:%S})"
+
+    class Meta:
+        ordering = ['id']
+
+
+class CitySearchStats(models.Model):
+    """
+    Popularité d'une ville, maintenue à l'insertion des recherches (voir
+    weather/ingest.py) pour ne plus regrouper/compter WeatherSearch.
+    `city` et `country` sont normalisés (voir services.normalize_location) ;
+    `display_city` garde l'orthographe de la dernière recherche.
+    """
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=2, blank=True)
+    display_city = models.CharField(max_length=100, blank=True)
+    search_count = models.PositiveBigIntegerField(default=0)
+    last_searched_at = models.DateTimeField(null=True, blank=True)
+    # Dernière observation
+    last_temperature = models.FloatField(null=True, blank=True)
+    last_humidity = models.IntegerField(null=True, blank=True)
+    last_wind_speed = models.FloatField(null=True, blank=True)
+    last_description = models.CharField(max_length=255, blank=True)
+    last_icon = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.display_city or self.city} ({self.country}) - {self.search_count} recherches"
+
+    class Meta:
+        ordering = ['-search_count']
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country'], name='unique_city_search_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['-search_count'], name='city_stats_popularity_idx'),
+        ]
+
+
+class ProcessingWatermark(models.Model):
+    """
+    Position d'un traitement incrémental sur WeatherSearch (dernier id traité),
+    voir weather/watermarks.py.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class HistoryVersion(models.Model):
+    """
+    Version de l'historique des recherches, incrémentée à chaque insertion,
+    modification ou suppression (voir weather/conditional.py). Une seule ligne.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"historique v{self.version}"
+
+
+class WeatherRollup(models.Model):
+    """
+    Agrégats par ville (normalisée) et par période, maintenus
+    incrémentalement à partir de WeatherSearch (voir weather/rollups.py)
+    """
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=2, blank=True)
+    search_count = models.PositiveBigIntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_min = models.FloatField(null=True)
+    temperature_max = models.FloatField(null=True)
+    humidity_sum = models.BigIntegerField(default=0)
+    humidity_min = models.IntegerField(null=True)
+    humidity_max = models.IntegerField(null=True)
+    wind_speed_sum = models.FloatField(default=0)
+    wind_speed_min = models.FloatField(null=True)
+    wind_speed_max = models.FloatField(null=True)
+
+    class Meta:
+        abstract = True
+
+
+class WeatherHourlyRollup(WeatherRollup):
+    hour = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.city} ({self.country}) {self.hour:%Y-%m-%d %H}h - {self.search_count}"
+
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country', 'hour'], name='unique_hourly_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='hourly_rollup_hour_idx'),
+        ]
+
+
+class WeatherDailyRollup(WeatherRollup):
+    day = models.DateField()
+
+    def __str__(self):
+        return f"{self.city} ({self.country}) {self.day} - {self.search_count}"
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country', 'day'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_rollup_day_idx'),
+        ]
+
+
+class WeatherAlert(models.Model):
+    """
+    Alerte météo émise une seule fois par ville, condition et fenêtre de
+    temps (voir weather/alerts.py)
+    """
+    HEAT = "heat"
+    COLD = "cold"
+    WIND = "wind"
+    HUMIDITY = "humidity"
+    CONDITION_CHOICES = [
+        (HEAT, "Chaleur extrême"),
+        (COLD, "Froid extrême"),
+        (WIND, "Vent fort"),
+        (HUMIDITY, "Humidité élevée"),
+    ]
+
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=2, blank=True)
+    display_city = models.CharField(max_length=100, blank=True)
+    condition = models.CharField(max_length=20, choices=CONDITION_CHOICES)
+    window_start = models.DateTimeField()
+    # Première recherche de la fenêtre qui a déclenché l'alerte (pas de clé
+    # étrangère : weather_weathersearch peut être partitionnée)
+    search_id = models.BigIntegerField()
+    value = models.FloatField()
+    searched_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.display_city or self.city} ({self.country}) - {self.get_condition_display()} {self.window_start:%Y-%m-%d %H}h"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['city', 'country', 'condition', 'window_start'],
+                name='unique_weather_alert',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['-created_at'], name='weather_alert_created_idx'),
+            models.Index(fields=['window_start'], name='weather_alert_window_idx'),
+        ]
+
+
+class AlertSubscription(models.Model):
+    """
+    Seuil d'alerte choisi par un utilisateur pour une ville : une recherche
+    dont la mesure `metric` dépasse `threshold` dans le sens `operator`
+    déclenche une notification (voir weather/subscriptions.py).
+    `city` et `country` sont normalisés (services.normalize_location) ;
+    `country` vide : toutes les villes de ce nom.
+    """
+    METRIC_CHOICES = [
+        ("temperature", "Température"),
+        ("humidity", "Humidité"),
+        ("wind_speed", "Vitesse du vent"),
+        ("pressure", "Pression"),
+    ]
+    OPERATOR_CHOICES = [
+        ("gte", "supérieure ou égale à"),
+        ("lte", "inférieure ou égale à"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="weather_alert_subscriptions",
+    )
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=2, blank=True)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    operator = models.CharField(max_length=3, choices=OPERATOR_CHOICES)
+    threshold = models.FloatField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.city} ({self.country or '*'}) {self.metric} {self.operator} {self.threshold}"
+
+    def save(self, *args, **kwargs):
+        from .services import normalize_location
+
+        self.city, self.country = normalize_location(self.city, self.country)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Rapprochement des recherches : égalités puis plage sur le seuil
+            models.Index(
+                fields=['city', 'metric', 'operator', 'threshold'],
+                condition=Q(is_active=True),
+                name='subscription_match_idx',
+            ),
+        ]
+
+
+class AlertNotification(models.Model):
+    """
+    Notification en attente d'envoi (sent_at vide) ou envoyée, au plus une
+    par abonnement et par fenêtre d'alerte
+    """
+    subscription = models.ForeignKey(
+        AlertSubscription, on_delete=models.CASCADE, related_name="notifications"
+    )
+    window_start = models.DateTimeField()
+    # Recherche qui a déclenché la notification (pas de clé étrangère :
+    # weather_weathersearch peut être partitionnée)
+    search_id = models.BigIntegerField()
+    value = models.FloatField()
+    searched_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subscription} - {self.value} ({self.searched_at:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['subscription', 'window_start'], name='unique_alert_notification'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=Q(sent_at__isnull=True), name='notification_pending_idx'),
+            models.Index(fields=['window_start'], name='notification_window_idx'),
+        ]
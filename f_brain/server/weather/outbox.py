@@ -0,0 +1,77 @@
+"""
+Outbox transactionnel pour les tâches Celery.
+
+Les vues n'appellent plus `.delay()` (publication AMQP synchrone) : elles
+écrivent un OutboxEvent dans la même transaction que la recherche. Un relais
+(commande `relay_outbox` ou tâche périodique `relay_outbox_events`) publie
+ensuite les événements par lots sur le broker, avec une seule connexion.
+
+La publication est "au moins une fois" : si le relais s'arrête entre la
+publication et la suppression des lignes, le lot sera republié.
+"""
+
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_event(task_name, *args, **kwargs):
+    """
+    OutboxEvent (non enregistré) pour la tâche `task_name`
+    """
+    return OutboxEvent(task_name=task_name, args=list(args), kwargs=kwargs)
+
+
+def relay_outbox(batch_size=None):
+    """
+    Publie un lot d'événements en attente puis les supprime.
+
+    Les lignes sont verrouillées avec SKIP LOCKED (PostgreSQL) : plusieurs
+    relais peuvent tourner en parallèle sans publier deux fois le même lot.
+    Retourne le nombre d'événements publiés.
+    """
+    batch_size = batch_size or settings.WEATHER_OUTBOX_BATCH_SIZE
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).order_by("id")[
+                :batch_size
+            ]
+        )
+        if not events:
+            return 0
+
+        with current_app.producer_or_acquire() as producer:
+            for event in events:
+                current_app.send_task(
+                    event.task_name,
+                    args=event.args,
+                    kwargs=event.kwargs,
+                    producer=producer,
+                )
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+    logger.info(f"Outbox: {len(events)} événements publiés")
+    return len(events)
+
+
+def relay_all(batch_size=None, max_batches=None):
+    """
+    Vide l'outbox lot par lot (au plus `max_batches` lots)
+    """
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        published = relay_outbox(batch_size)
+        total += published
+        batches += 1
+        if not published:
+            break
+    return total
@@ -0,0 +1,323 @@
+"""
+Partitionnement de weather_weathersearch par plage de searched_at (PostgreSQL).
+
+Mode optionnel, activé par WEATHER_PARTITIONING ("day" ou "month", "off" par
+défaut). La commande `weather_partitions` convertit une fois la table existante
+puis crée les partitions à venir ; la tâche maintain_weather_partitions les
+crée ensuite chaque jour à l'avance (WEATHER_PARTITIONS_AHEAD périodes). La
+rétention (cleanup_old_searches) supprime alors des partitions entières au
+lieu d'un DELETE massif.
+
+Sur SQLite, ou si le mode est désactivé, la table reste une table simple et
+toutes les fonctions ci-dessous sont sans effet.
+
+Contraintes PostgreSQL :
+- la clé primaire devient (id, searched_at) : l'unicité de `id` repose sur
+  la séquence ;
+- `id` utilise une séquence (nextval) au lieu d'une colonne IDENTITY, non
+  supportée sur une table partitionnée avant PostgreSQL 17 ;
+- une partition par défaut (weather_weathersearch_default) reçoit les
+  insertions hors des partitions existantes (maintenance en retard, horloge
+  décalée) : elles n'échouent jamais. ensure_partitions() déplace ensuite ses
+  lignes dans les partitions de leur période. Ne pas changer
+  WEATHER_PARTITIONING après la conversion (les plages se chevaucheraient).
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .conditional import bump_history_version
+from .models import WeatherSearch
+
+logger = logging.getLogger(__name__)
+
+TABLE = WeatherSearch._meta.db_table
+
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+PARTITION_NAME_RE = re.compile(rf"^{TABLE}_p(\d{{8}}|\d{{6}})$")
+
+
+def partitioning_enabled():
+    return (
+        settings.WEATHER_PARTITIONING in ("day", "month")
+        and connection.vendor == "postgresql"
+    )
+
+
+def is_partitioned():
+    """
+    La table weather_weathersearch est-elle partitionnée ?
+    """
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            )
+            """,
+            [TABLE],
+        )
+        return cursor.fetchone()[0]
+
+
+def period_start(moment, interval):
+    moment = moment.astimezone(dt_timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "month":
+        start = start.replace(day=1)
+    return start
+
+
+def next_period(start, interval):
+    if interval == "day":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(start, interval):
+    suffix = f"{start:%Y%m%d}" if interval == "day" else f"{start:%Y%m}"
+    return f"{TABLE}_p{suffix}"
+
+
+def _partition_bounds(name):
+    """
+    (début, fin) d'une partition d'après son nom ; None si elle n'a pas été
+    créée par ce module
+    """
+    match = PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    suffix = match.group(1)
+    if len(suffix) == 8:
+        start = datetime.strptime(suffix, "%Y%m%d").replace(tzinfo=dt_timezone.utc)
+        return start, next_period(start, "day")
+    start = datetime.strptime(suffix, "%Y%m").replace(tzinfo=dt_timezone.utc)
+    return start, next_period(start, "month")
+
+
+def list_partitions():
+    """
+    Partitions de la table, triées : [(nom, début, fin)]
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s AND pg_table_is_visible(p.oid)
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        bounds = _partition_bounds(name)
+        if bounds:
+            partitions.append((name, *bounds))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _create_partition(cursor, start, interval):
+    name = partition_name(start, interval)
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [start, next_period(start, interval)],
+    )
+    return name
+
+
+def _create_default_partition(cursor):
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(DEFAULT_PARTITION)} "
+        f"PARTITION OF {quote(TABLE)} DEFAULT"
+    )
+
+
+def _drain_default_partition(cursor, interval):
+    """
+    Déplace les lignes de la partition par défaut dans des partitions de
+    leur période (créées détachées, remplies, puis attachées : une partition
+    ne peut pas être créée tant que la partition par défaut contient des
+    lignes de sa plage). Retourne les noms des partitions créées.
+    """
+    quote = connection.ops.quote_name
+    default = quote(DEFAULT_PARTITION)
+    cursor.execute(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"SELECT min(searched_at), max(searched_at) FROM {default}")
+    first, last = cursor.fetchone()
+    if first is None:
+        return []
+
+    existing = {name for name, _, _ in list_partitions()}
+    created = []
+    start = period_start(first, interval)
+    while start <= last:
+        end = next_period(start, interval)
+        name = partition_name(start, interval)
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {default} WHERE searched_at >= %s AND searched_at < %s)",
+            [start, end],
+        )
+        if cursor.fetchone()[0] and name not in existing:
+            partition = quote(name)
+            cursor.execute(
+                f"CREATE TABLE {partition} "
+                f"(LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {default} "
+                f"WHERE searched_at >= %s AND searched_at < %s RETURNING *) "
+                f"INSERT INTO {partition} SELECT * FROM moved",
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {partition} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            created.append(name)
+        start = end
+
+    if created:
+        logger.info(
+            f"Partitionnement: lignes de {DEFAULT_PARTITION} déplacées dans {', '.join(created)}"
+        )
+    return created
+
+
+def _create_partitions(cursor, first, last, interval):
+    created = []
+    start = period_start(first, interval)
+    while start <= last:
+        created.append(_create_partition(cursor, start, interval))
+        start = next_period(start, interval)
+    return created
+
+
+def ensure_partitions(ahead=None):
+    """
+    Crée les partitions de la période courante et des `ahead` suivantes, après
+    avoir vidé la partition par défaut. Retourne les noms des partitions
+    (existantes ou créées).
+    """
+    if not partitioning_enabled() or not is_partitioned():
+        return []
+    interval = settings.WEATHER_PARTITIONING
+    ahead = settings.WEATHER_PARTITIONS_AHEAD if ahead is None else ahead
+
+    last = period_start(timezone.now(), interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _create_default_partition(cursor)
+        drained = _drain_default_partition(cursor, interval)
+        created = _create_partitions(cursor, timezone.now(), last, interval)
+    return [*drained, *created]
+
+
+def convert_to_partitioned(ahead=None):
+    """
+    Remplace weather_weathersearch par une table partitionnée contenant les
+    mêmes lignes (une seule fois, table verrouillée pendant la copie)
+    """
+    if not partitioning_enabled() or is_partitioned():
+        return False
+    interval = settings.WEATHER_PARTITIONING
+    ahead = settings.WEATHER_PARTITIONS_AHEAD if ahead is None else ahead
+    quote = connection.ops.quote_name
+    table = quote(TABLE)
+    legacy = quote(f"{TABLE}_unpartitioned")
+    sequence = quote(f"{TABLE}_id_seq")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min(searched_at), max(id) FROM {table}")
+        first, last_id = cursor.fetchone()
+
+        # Index à recréer sur la table partitionnée (hors clé primaire)
+        cursor.execute(
+            """
+            SELECT i.indexdef FROM pg_indexes i
+            WHERE i.tablename = %s AND i.schemaname = current_schema()
+              AND i.indexname NOT IN (
+                  SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+              )
+            """,
+            [TABLE, TABLE],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE IF EXISTS {sequence}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (searched_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {table}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [f"{TABLE}_id_seq", (last_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [f"{TABLE}_id_seq"])
+
+        last = period_start(timezone.now(), interval)
+        for _ in range(ahead):
+            last = next_period(last, interval)
+        created = _create_partitions(cursor, first or timezone.now(), last, interval)
+        _create_default_partition(cursor)
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+        cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, searched_at)")
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+    logger.info(f"Partitionnement: {TABLE} converti ({len(created)} partitions)")
+    return True
+
+
+def expired_partitions(cutoff):
+    """
+    Partitions entièrement antérieures à `cutoff`
+    """
+    if not is_partitioned():
+        return []
+    return [partition for partition in list_partitions() if partition[2] <= cutoff]
+
+
+def drop_partition(name):
+    """
+    Détache puis supprime une partition (verrou bref, pas de DELETE ligne à ligne)
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+        cursor.execute(f"DROP TABLE {quote(name)}")
+        bump_history_version()
+    logger.info(f"Partitionnement: partition {name} supprimée")
+
+
+def drop_partitions_before(cutoff):
+    """
+    Supprime les partitions entièrement antérieures à `cutoff` ; retourne
+    leurs noms
+    """
+    dropped = []
+    for name, _, _ in expired_partitions(cutoff):
+        drop_partition(name)
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,151 @@
+"""
+Limitation de débit des appels à OpenWeatherMap.
+
+Le quota est commun à tous les processus (workers Celery, serveur web) : un
+seau à jetons est tenu dans Redis (cache partagé L2) et mis à jour par un
+script Lua, atomique, en une seule commande par appel (niveau de jetons et
+date de remplissage, horloge du serveur Redis). Sans Redis, ou s'il ne répond
+pas, un seau à jetons local au processus prend le relais.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe : `rate` jetons par seconde, au plus `capacity`
+    jetons accumulés (taille des rafales autorisées).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self, timeout=None):
+        """
+        Attend un jeton ; retourne False si `timeout` secondes ne suffisent pas
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+# Retire un jeton s'il y en a un ; retourne l'attente (secondes, en texte :
+# Lua tronque les nombres renvoyés) avant le prochain jeton, "0" si pris
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedTokenBucket:
+    """
+    Seau à jetons commun à tous les processus qui partagent le cache Redis
+    `alias` : `rate` jetons par seconde, au plus `capacity` (rafales).
+    `fallback` (un TokenBucket) est utilisé sans Redis ou quand il ne répond
+    pas.
+    """
+
+    def __init__(self, alias, key, rate, capacity, fallback):
+        self.alias = alias
+        self.key = key
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.fallback = fallback
+
+    def _shared(self):
+        return self.alias is not None and isinstance(caches[self.alias], RedisCache)
+
+    def _take(self):
+        """
+        Prend un jeton dans Redis ; retourne 0, ou l'attente avant le suivant
+        """
+        cache = caches[self.alias]
+        key = cache.make_and_validate_key(self.key)
+        client = cache._cache.get_client(key, write=True)
+        script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return float(script(keys=[key], args=[self.rate, self.capacity]))
+
+    def acquire(self, timeout=None):
+        """
+        Attend un jeton ; retourne False si `timeout` secondes ne suffisent pas
+        """
+        if not self._shared():
+            # Pas de cache partagé : quota compté par processus
+            return self.fallback.acquire(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                wait = self._take()
+            except Exception as e:
+                logger.warning(f"Cache '{self.alias}' indisponible pour le quota: {e}")
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                return self.fallback.acquire(remaining)
+            if wait <= 0:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+# Quota OpenWeatherMap partagé par tous les processus :
+# OPENWEATHERMAP_RATE_LIMIT_PER_MINUTE appels par minute, rafales de
+# OPENWEATHERMAP_RATE_LIMIT_BURST appels
+openweathermap_limit = SharedTokenBucket(
+    alias=settings.WEATHER_CACHE_L2_ALIAS,
+    key="weather:ratelimit:openweathermap",
+    rate=settings.OPENWEATHERMAP_RATE_LIMIT_PER_MINUTE / 60.0,
+    capacity=settings.OPENWEATHERMAP_RATE_LIMIT_BURST,
+    fallback=TokenBucket(
+        rate=settings.OPENWEATHERMAP_RATE_LIMIT_PER_MINUTE / 60.0,
+        capacity=settings.OPENWEATHERMAP_RATE_LIMIT_BURST,
+    ),
+)
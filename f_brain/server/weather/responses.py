@@ -0,0 +1,137 @@
+"""
+Réponses JSON de l'API.
+
+- Encodage par orjson s'il est installé (datetime et UUID encodés
+  nativement, sans passer par des dictionnaires intermédiaires), sinon par le
+  module json avec le même rendu : datetime en isoformat(), UUID en texte.
+- Sérialiseurs de WeatherSearch compilés une fois par liste de champs.
+- ?fields=city,temperature : sous-ensemble de champs demandé par le client.
+- ?slim=1 : réponse sans la charge brute d'OpenWeatherMap.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
+from uuid import UUID
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SEARCH_FIELDS = (
+    "id",
+    "public_id",
+    "city",
+    "temperature",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "description",
+    "icon",
+    "country",
+    "searched_at",
+)
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Type non sérialisable en JSON: {type(value).__name__}")
+
+
+def dumps(data):
+    """
+    Encode `data` en JSON (bytes UTF-8)
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(
+        data, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    Équivalent de JsonResponse encodé par dumps()
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
+
+
+@lru_cache(maxsize=64)
+def search_serializer(fields):
+    """
+    Fonction WeatherSearch -> dict limitée à `fields` (tuple), compilée une
+    fois par liste de champs
+    """
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        return lambda search: {fields[0]: getter(search)}
+    return lambda search: dict(zip(fields, getter(search)))
+
+
+def weather_result(weather_data, search, fields, slim=False, **extra):
+    """
+    Recherche enregistrée (champs `fields`), précédée des données brutes
+    d'OpenWeatherMap sauf en mode slim
+    """
+    result = dict(extra)
+    if not slim:
+        result["data"] = weather_data
+    result["saved_record"] = search_serializer(fields)(search)
+    return result
+
+
+def requested_fields(params, allowed, default=None):
+    """
+    Champs demandés par ?fields=a,b (dans l'ordre demandé), sinon `default`
+    (ou `allowed`) ; ValueError si un champ n'est pas dans `allowed`
+    """
+    value = (params.get("fields") or "").strip()
+    if not value:
+        return tuple(default or allowed)
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValueError(
+            f"Champs inconnus: {', '.join(unknown)} (disponibles: {', '.join(allowed)})"
+        )
+    return fields
+
+
+def project_rows(rows, fields, keep=("archived",)):
+    """
+    Lignes limitées à `fields` (et aux clés `keep`) : retire les colonnes
+    ajoutées pour la pagination si elles n'ont pas été demandées
+    """
+    if all(field in fields for field in ("id", "searched_at")):
+        return rows
+    selected = set(fields).union(keep)
+    return [{key: value for key, value in row.items() if key in selected} for row in rows]
+
+
+def query_flag(params, name):
+    """
+    Paramètre booléen de la requête (?name=1, true ou yes)
+    """
+    return (params.get(name) or "").lower() in TRUE_VALUES
+
+
+def is_slim(params):
+    return query_flag(params, "slim")
@@ -0,0 +1,121 @@
+"""
+Agrégats horaires et journaliers des recherches météo par ville.
+
+update_rollups() lit les nouvelles recherches depuis la dernière position
+(voir weather/watermarks.py) et ajoute leurs agrégats aux lignes existantes
+(F(), Least, Greatest), dans la même transaction que l'avancement de la
+position : chaque recherche est comptée une seule fois. Les statistiques sont
+ensuite calculées sur ces tables, dont la taille ne dépend que du nombre de
+villes et de périodes.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+
+from .models import WeatherDailyRollup, WeatherHourlyRollup, WeatherSearch
+from .services import normalize_location
+from .watermarks import advance_watermark, lock_watermark, settled_position
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "weather-rollups"
+
+MEASURES = ("temperature", "humidity", "wind_speed")
+
+
+def _empty_aggregate():
+    aggregate = {"search_count": 0}
+    for measure in MEASURES:
+        aggregate[f"{measure}_sum"] = 0
+        aggregate[f"{measure}_min"] = None
+        aggregate[f"{measure}_max"] = None
+    return aggregate
+
+
+def _add_row(aggregate, row):
+    aggregate["search_count"] += 1
+    for measure in MEASURES:
+        value = row[measure]
+        aggregate[f"{measure}_sum"] += value
+        current_min = aggregate[f"{measure}_min"]
+        current_max = aggregate[f"{measure}_max"]
+        aggregate[f"{measure}_min"] = value if current_min is None else min(current_min, value)
+        aggregate[f"{measure}_max"] = value if current_max is None else max(current_max, value)
+
+
+def _apply(model, period_field, groups):
+    """
+    Ajoute les agrégats d'un lot aux lignes existantes (créées si besoin)
+    """
+    for (city, country, period), aggregate in groups.items():
+        rollups = model.objects.filter(
+            city=city, country=country, **{period_field: period}
+        )
+        changes = {"search_count": F("search_count") + aggregate["search_count"]}
+        for measure in MEASURES:
+            changes[f"{measure}_sum"] = F(f"{measure}_sum") + aggregate[f"{measure}_sum"]
+            changes[f"{measure}_min"] = Least(f"{measure}_min", aggregate[f"{measure}_min"])
+            changes[f"{measure}_max"] = Greatest(f"{measure}_max", aggregate[f"{measure}_max"])
+
+        if rollups.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(
+                    city=city, country=country, **{period_field: period}, **aggregate
+                )
+        except IntegrityError:
+            # Ligne créée entre-temps par une autre transaction
+            rollups.update(**changes)
+
+
+def apply_searches(rows):
+    """
+    Ajoute un lot de recherches (dictionnaires de WeatherSearch.values())
+    aux agrégats horaires et journaliers
+    """
+    hourly = {}
+    daily = {}
+    for row in rows:
+        city, country = normalize_location(row["city"], row["country"])
+        hour = row["searched_at"].replace(minute=0, second=0, microsecond=0)
+        _add_row(hourly.setdefault((city, country, hour), _empty_aggregate()), row)
+        _add_row(daily.setdefault((city, country, hour.date()), _empty_aggregate()), row)
+
+    _apply(WeatherHourlyRollup, "hour", hourly)
+    _apply(WeatherDailyRollup, "day", daily)
+
+
+def update_rollups(batch_size=None, max_batches=None):
+    """
+    Intègre les nouvelles recherches aux agrégats, par lots (au plus
+    `max_batches` lots). Retourne le nombre de recherches intégrées.
+    """
+    batch_size = batch_size or settings.WEATHER_ROLLUP_BATCH_SIZE
+    max_batches = max_batches or settings.WEATHER_ROLLUP_MAX_BATCHES
+
+    total = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            watermark = lock_watermark(WATERMARK_NAME)
+            end = settled_position(watermark, WeatherSearch)
+            rows = list(
+                WeatherSearch.objects.filter(id__gt=watermark.position, id__lte=end)
+                .order_by("id")
+                .values("id", "city", "country", "searched_at", *MEASURES)[:batch_size]
+            )
+            if rows:
+                apply_searches(rows)
+            advance_watermark(watermark, rows[-1]["id"] if rows else watermark.position)
+
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if total:
+        logger.info(f"Agrégats météo: {total} recherches intégrées")
+    return total
@@ -1,36 +1,365 @@
+import asyncio
 import os
-import requests
-from dotenv import load_dotenv
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
 
-# Load environment variables
-load_dotenv()
-#OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY', 'ee56bd2e1c87bf3900aa88cfd2cee8ac')
-OPENWEATHERMAP_API_KEY = 'ee56bd2e1c87bf3900aa88cfd2cee8ac'
+from django.conf import settings
+from django.core.cache import caches
 
+from .http_client import openweathermap_aget, openweathermap_get
+from .metrics import record_cache_lookup
+from .models import WeatherSearch
 
+logger = logging.getLogger(__name__)
 
-def get_weather_from_api(city):
+
+# Message renvoyé au client quand l'appel à OpenWeatherMap échoue (réseau,
+# délai, réponse illisible) : le texte de l'exception contient l'URL
+# appelée, donc la clé d'API
+UPSTREAM_ERROR_MESSAGE = "Service météo indisponible, réessayez plus tard"
+
+
+class WeatherAPIError(Exception):
+    """
+    Erreur renvoyée par l'API OpenWeatherMap (message + code HTTP d'origine)
+    """
+
+    def __init__(self, message, status_code=502):
+        super().__init__(f"OpenWeatherMap API error: {message}")
+        self.message = message
+        self.status_code = status_code
+
+
+def _raise_api_error(response):
+    try:
+        error_message = response.json().get('message', 'Unknown error')
+    except ValueError:
+        error_message = 'Unknown error'
+    raise WeatherAPIError(error_message, status_code=response.status_code)
+
+
+def _location_query(city, country=None):
+    return f"{city},{country}" if country else city
+
+
+def get_weather_from_api(city, country=None):
     """
     Fetch weather data from OpenWeatherMap API
     """
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHERMAP_API_KEY}&units=metric"
-    response = requests.get(url)
-    
+    response = openweathermap_get("weather", q=_location_query(city, country))
+
     if response.status_code == 200:
         return response.json()
-    else:
-        error_message = response.json().get('message', 'Unknown error')
-        raise Exception(f"OpenWeatherMap API error: {error_message}")
+    _raise_api_error(response)
+
+
+async def aget_weather_from_api(city, country=None):
+    """
+    Version asynchrone de get_weather_from_api() (client httpx partagé)
+    """
+    response = await openweathermap_aget("weather", q=_location_query(city, country))
 
-def get_forecast_from_api(city):
+    if response.status_code == 200:
+        return response.json()
+    _raise_api_error(response)
+
+
+def get_forecast_from_api(city, country=None):
     """
     Fetch 5-day forecast data from OpenWeatherMap API
     """
-    url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={OPENWEATHERMAP_API_KEY}&units=metric"
-    response = requests.get(url)
-    
+    response = openweathermap_get("forecast", q=_location_query(city, country))
+
     if response.status_code == 200:
         return response.json()
-    else:
-        error_message = response.json().get('message', 'Unknown error')
-        raise Exception(f"OpenWeatherMap API error: {error_message}")
\ No newline at end of file
+    _raise_api_error(response)
+
+
+# ================================
+# CACHE MÉTÉO (lecture traversante)
+# ================================
+#
+# L1 : cache local au processus (alias WEATHER_CACHE_L1_ALIAS, locmem)
+# L2 : cache partagé entre processus/conteneurs (alias WEATHER_CACHE_L2_ALIAS,
+#      Redis ; None sans Redis : L1 seul)
+# Les requêtes simultanées pour une même clé sont regroupées en un seul appel
+# à OpenWeatherMap : dans le processus via un "vol" partagé entre threads, et
+# entre processus via un verrou court posé dans le cache L2.
+
+
+def coalescing_cache():
+    """
+    Cache des clés de regroupement (cache.add) : L2 (Redis) s'il existe,
+    sinon le cache local, et le regroupement se fait par processus
+    """
+    return caches[settings.WEATHER_CACHE_L2_ALIAS or settings.WEATHER_CACHE_L1_ALIAS]
+
+
+def normalize_location(city, country=None):
+    """
+    Normalise une ville/un pays pour construire une clé de cache stable
+    """
+    city = " ".join((city or "").split()).casefold()
+    country = (country or "").strip().upper()
+    return city, country
+
+
+def weather_cache_key(city, country=None):
+    city, country = normalize_location(city, country)
+    return f"weather:current:{quote(city, safe='')}:{country}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key, loader):
+    """
+    Exécute loader() une seule fois pour tous les threads qui demandent la même clé
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(settings.WEATHER_CACHE_LOCK_TIMEOUT):
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        # Le premier appel est trop lent : on ne bloque pas indéfiniment
+        return loader()
+
+    try:
+        flight.result = loader()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _cache_get(alias, key):
+    try:
+        return caches[alias].get(key)
+    except Exception as e:
+        logger.warning(f"Cache '{alias}' indisponible en lecture: {e}")
+        return None
+
+
+def _cache_set(alias, key, value, timeout):
+    try:
+        caches[alias].set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Cache '{alias}' indisponible en écriture: {e}")
+
+
+def _cache_add(alias, key, value, timeout):
+    try:
+        return caches[alias].add(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Cache '{alias}' indisponible pour le verrou: {e}")
+        # Sans cache partagé, chaque processus appelle l'API lui-même
+        return True
+
+
+def _cache_delete(alias, key):
+    try:
+        caches[alias].delete(key)
+    except Exception as e:
+        logger.warning(f"Cache '{alias}' indisponible en suppression: {e}")
+
+
+def _load_through_shared_cache(key, fetch):
+    """
+    Lit le cache L2 ; en cas d'absence, un seul processus appelle l'API
+    pendant que les autres attendent que la valeur soit publiée dans L2.
+    """
+    shared = settings.WEATHER_CACHE_L2_ALIAS
+    if shared is None:
+        return fetch()
+    data = record_cache_lookup("l2", _cache_get(shared, key))
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.WEATHER_CACHE_LOCK_TIMEOUT
+    if not _cache_add(shared, lock_key, os.getpid(), lock_timeout):
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = _cache_get(shared, key)
+            if data is not None:
+                return data
+
+    try:
+        data = fetch()
+        _cache_set(shared, key, data, settings.WEATHER_CACHE_TTL)
+        return data
+    finally:
+        _cache_delete(shared, lock_key)
+
+
+def get_current_weather(city, country=None, limiter=None):
+    """
+    Météo actuelle d'une ville, servie depuis le cache si possible.
+
+    Point d'entrée unique pour les vues et les tâches Celery ; lève
+    WeatherAPIError si OpenWeatherMap refuse la requête. `limiter` (voir
+    weather/ratelimit.py) n'est consulté que si l'API doit réellement être
+    appelée.
+    """
+    key = weather_cache_key(city, country)
+    local = settings.WEATHER_CACHE_L1_ALIAS
+
+    data = record_cache_lookup("l1", _cache_get(local, key))
+    if data is not None:
+        return data
+
+    def fetch():
+        if limiter is not None:
+            limiter.acquire()
+        return get_weather_from_api(city, country)
+
+    def load():
+        data = _load_through_shared_cache(key, fetch)
+        _cache_set(
+            local,
+            key,
+            data,
+            min(settings.WEATHER_CACHE_L1_TTL, settings.WEATHER_CACHE_TTL),
+        )
+        return data
+
+    return _single_flight(key, load)
+
+
+def fetch_current_weather_many(locations, max_workers, limiter=None):
+    """
+    Récupère la météo de plusieurs (ville, pays) en parallèle (au plus
+    `max_workers` appels simultanés).
+
+    Produit (index, data, erreur) au fur et à mesure des réponses, dans
+    l'ordre d'arrivée ; une erreur n'interrompt pas les autres villes.
+    """
+
+    def fetch(city, country):
+        return get_current_weather(city, country, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(fetch, city, country): index
+            for index, (city, country) in enumerate(locations)
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def weather_search_from_payload(data):
+    """
+    WeatherSearch (non enregistrée) construite à partir d'une réponse OpenWeatherMap
+    """
+    return WeatherSearch(
+        city=data["name"],
+        country=data["sys"]["country"],
+        temperature=data["main"]["temp"],
+        humidity=data["main"]["humidity"],
+        wind_speed=data.get("wind", {}).get("speed", 0),
+        pressure=data["main"]["pressure"],
+        description=data["weather"][0]["description"],
+        icon=data["weather"][0]["icon"],
+    )
+
+
+# Variante asynchrone pour les vues ASGI : même clé, mêmes caches. Le cache L1
+# (locmem) est lu directement ; le cache L2 passe par l'API async de Django.
+
+_async_flights = {}
+
+
+async def _acache_call(alias, method, *args, default=None):
+    try:
+        return await getattr(caches[alias], method)(*args)
+    except Exception as e:
+        logger.warning(f"Cache '{alias}' indisponible ({method}): {e}")
+        return default
+
+
+async def _aload_through_shared_cache(key, city, country):
+    shared = settings.WEATHER_CACHE_L2_ALIAS
+    if shared is None:
+        return await aget_weather_from_api(city, country)
+    data = record_cache_lookup("l2", await _acache_call(shared, "aget", key))
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.WEATHER_CACHE_LOCK_TIMEOUT
+    if not await _acache_call(shared, "aadd", lock_key, os.getpid(), lock_timeout, default=True):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lock_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            data = await _acache_call(shared, "aget", key)
+            if data is not None:
+                return data
+
+    try:
+        data = await aget_weather_from_api(city, country)
+        await _acache_call(shared, "aset", key, data, settings.WEATHER_CACHE_TTL)
+        return data
+    finally:
+        await _acache_call(shared, "adelete", lock_key)
+
+
+async def aget_current_weather(city, country=None):
+    """
+    Version asynchrone de get_current_weather() : les coroutines qui demandent
+    la même ville attendent le même appel à OpenWeatherMap.
+    """
+    key = weather_cache_key(city, country)
+    local = settings.WEATHER_CACHE_L1_ALIAS
+
+    data = record_cache_lookup("l1", _cache_get(local, key))
+    if data is not None:
+        return data
+
+    loop = asyncio.get_running_loop()
+    flight = _async_flights.get(key)
+    if flight is None or flight.get_loop() is not loop:
+
+        async def load():
+            data = await _aload_through_shared_cache(key, city, country)
+            _cache_set(
+                local,
+                key,
+                data,
+                min(settings.WEATHER_CACHE_L1_TTL, settings.WEATHER_CACHE_TTL),
+            )
+            return data
+
+        flight = _async_flights[key] = loop.create_task(load())
+        flight.add_done_callback(
+            lambda task: _async_flights.pop(key, None)
+            if _async_flights.get(key) is task
+            else None
+        )
+
+    return await asyncio.shield(flight)
@@ -0,0 +1,275 @@
+"""
+Abonnements aux alertes météo (AlertSubscription) et notifications.
+
+L'insertion des recherches ne fait rien pour les abonnements. La tâche
+périodique match_alert_subscriptions lit les recherches ajoutées depuis son
+passage précédent (position enregistrée, voir weather/watermarks.py, comme
+weather/alerts.py) et ne garde que celles des villes qui ont un abonnement
+actif ; sans abonnement, la position avance sans lire les recherches. Les
+observations sont ensuite rapprochées des abonnements en masse :
+
+- les observations sont réduites à leurs extrêmes par ville, pays et mesure
+  (un abonnement "gte" est atteint si le maximum du lot l'atteint) ;
+- chaque extrême devient une condition city = %s AND metric = %s AND
+  operator = %s AND threshold <= %s (ou >=), servie par l'index partiel
+  subscription_match_idx : parcours de plage, sans boucle sur les
+  abonnements ;
+- les notifications sont mises en file (AlertNotification), une par
+  abonnement et par fenêtre d'alerte (voir weather/alerts.py), puis envoyées
+  par lots par la tâche send_alert_notifications.
+"""
+
+import logging
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .alerts import OPERATORS, window_start
+from .models import AlertNotification, AlertSubscription, WeatherSearch
+from .outbox import outbox_event
+from .services import normalize_location
+from .watermarks import advance_watermark, lock_watermark, settled_position
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "weather-subscriptions"
+
+METRICS = tuple(metric for metric, _ in AlertSubscription.METRIC_CHOICES)
+
+FIELDS = ("id", "city", "country", "searched_at", *METRICS)
+
+
+def observation(row):
+    """
+    Mesures d'une recherche (dictionnaire de FIELDS), sérialisables en JSON
+    """
+    city, country = normalize_location(row["city"], row["country"])
+    result = {
+        "id": row["id"],
+        "city": city,
+        "country": country,
+        "searched_at": row["searched_at"].isoformat(),
+    }
+    for metric in METRICS:
+        result[metric] = row[metric]
+    return result
+
+
+def _extremes(observations):
+    """
+    Observations de valeur minimale et maximale, par (ville, pays, mesure)
+    """
+    extremes = {}
+    for obs in observations:
+        for metric in METRICS:
+            key = (obs["city"], obs["country"], metric)
+            low, high = extremes.get(key, (obs, obs))
+            if obs[metric] < low[metric]:
+                low = obs
+            if obs[metric] > high[metric]:
+                high = obs
+            extremes[key] = (low, high)
+    return extremes
+
+
+def _terms(extremes):
+    for (city, country, metric), (low, high) in extremes.items():
+        countries = [country, ""] if country else [""]
+        yield Q(
+            city=city,
+            metric=metric,
+            operator="gte",
+            threshold__lte=high[metric],
+            country__in=countries,
+        )
+        yield Q(
+            city=city,
+            metric=metric,
+            operator="lte",
+            threshold__gte=low[metric],
+            country__in=countries,
+        )
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _triggering(extremes, city, country, metric, lookup, threshold):
+    """
+    Observation du lot qui atteint le seuil d'un abonnement
+    """
+    compare = OPERATORS[lookup]
+    for (obs_city, obs_country, obs_metric), (low, high) in extremes.items():
+        if obs_city != city or obs_metric != metric or country not in ("", obs_country):
+            continue
+        obs = high if lookup == "gte" else low
+        if compare(obs[metric], threshold):
+            return obs
+    return None
+
+
+def match_subscriptions(observations):
+    """
+    Met en file une notification pour chaque abonnement actif atteint par
+    les observations ; retourne le nombre de notifications candidates
+    (celles déjà émises dans la fenêtre sont ignorées à l'insertion)
+    """
+    extremes = _extremes(observations)
+    by_city = {}
+    for key, value in extremes.items():
+        by_city.setdefault(key[0], {})[key] = value
+
+    notifications = {}
+    for terms in _chunks(_terms(extremes), settings.WEATHER_ALERT_MATCH_TERMS):
+        matches = (
+            AlertSubscription.objects.filter(is_active=True)
+            .filter(reduce(operator.or_, terms))
+            .order_by()
+            .values_list("id", "city", "country", "metric", "operator", "threshold")
+        )
+        for subscription_id, city, country, metric, lookup, threshold in matches.iterator(
+            chunk_size=2000
+        ):
+            obs = _triggering(by_city[city], city, country, metric, lookup, threshold)
+            if obs is None:
+                continue
+            searched_at = parse_datetime(obs["searched_at"])
+            window = window_start(searched_at)
+            notifications.setdefault(
+                (subscription_id, window),
+                AlertNotification(
+                    subscription_id=subscription_id,
+                    window_start=window,
+                    search_id=obs["id"],
+                    value=obs[metric],
+                    searched_at=searched_at,
+                ),
+            )
+
+    if notifications:
+        with transaction.atomic():
+            AlertNotification.objects.bulk_create(
+                notifications.values(), batch_size=1000, ignore_conflicts=True
+            )
+            outbox_event("weather.tasks.send_alert_notifications").save()
+    return len(notifications)
+
+
+def match_new_searches(batch_size=None, max_batches=None):
+    """
+    Rapproche des abonnements les recherches ajoutées depuis le passage
+    précédent, par lots de `batch_size` recherches (au plus `max_batches`
+    lots). Retourne (notifications candidates, recherches lues).
+    """
+    batch_size = batch_size or settings.WEATHER_ALERT_MATCH_BATCH_SIZE
+    max_batches = max_batches or settings.WEATHER_ALERT_MATCH_MAX_BATCHES
+    cities = set()
+    if settings.WEATHER_ALERT_SUBSCRIPTIONS_ENABLED:
+        cities = set(
+            AlertSubscription.objects.filter(is_active=True).values_list("city", flat=True)
+        )
+
+    notifications = 0
+    scanned = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            watermark = lock_watermark(WATERMARK_NAME)
+            end = settled_position(watermark, WeatherSearch)
+            if not cities:
+                # Aucun abonnement : rien à rapprocher jusqu'à `end`
+                advance_watermark(watermark, end)
+                break
+            rows = list(
+                WeatherSearch.objects.filter(id__gt=watermark.position, id__lte=end)
+                .order_by("id")
+                .values(*FIELDS)[:batch_size]
+            )
+            observations = [
+                obs for obs in map(observation, rows) if obs["city"] in cities
+            ]
+            if observations:
+                notifications += match_subscriptions(observations)
+            advance_watermark(watermark, rows[-1]["id"] if len(rows) == batch_size else end)
+
+        scanned += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    return notifications, scanned
+
+
+def deliver_notifications(notifications):
+    """
+    Envoie un lot de notifications : par email si WEATHER_ALERT_EMAIL_FROM est
+    défini (une seule connexion SMTP par lot), sinon dans les logs
+    """
+    if not settings.WEATHER_ALERT_EMAIL_FROM:
+        for notification in notifications:
+            logger.info(f"Alerte météo pour {notification.subscription.user}: {notification}")
+        return
+
+    messages = [
+        EmailMessage(
+            subject=f"Alerte météo : {notification.subscription.city}",
+            body=(
+                f"{notification.subscription.get_metric_display()} : {notification.value} "
+                f"({notification.subscription.get_operator_display()} "
+                f"{notification.subscription.threshold}) "
+                f"le {notification.searched_at:%Y-%m-%d %H:%M}"
+            ),
+            from_email=settings.WEATHER_ALERT_EMAIL_FROM,
+            to=[notification.subscription.user.email],
+        )
+        for notification in notifications
+        if notification.subscription.user.email
+    ]
+    if messages:
+        get_connection().send_messages(messages)
+
+
+def send_pending_notifications(batch_size=None, max_batches=None):
+    """
+    Envoie les notifications en attente, par lots verrouillés (SKIP LOCKED
+    sur PostgreSQL : plusieurs envois peuvent tourner en parallèle).
+    Retourne le nombre de notifications envoyées.
+    """
+    batch_size = batch_size or settings.WEATHER_ALERT_NOTIFICATION_BATCH_SIZE
+    max_batches = max_batches or settings.WEATHER_ALERT_NOTIFICATION_MAX_BATCHES
+
+    sent = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            batch = list(
+                AlertNotification.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(sent_at__isnull=True)
+                .select_related("subscription__user")
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                break
+            deliver_notifications(batch)
+            AlertNotification.objects.filter(id__in=[n.id for n in batch]).update(
+                sent_at=timezone.now()
+            )
+
+        sent += len(batch)
+        if len(batch) < batch_size:
+            break
+
+    if sent:
+        logger.info(f"Notifications d'alerte envoyées: {sent}")
+    return sent
@@ -0,0 +1,136 @@
+"""
+Résultats des tâches Celery (backend django-db : une ligne TaskResult par
+tâche exécutée).
+
+- Les tâches sans lecteur de leur résultat sont déclarées ignore_result
+  (weather/tasks.py) : aucune ligne, sauf en cas d'échec
+  (CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED).
+- Un résultat volumineux (au-delà de WEATHER_TASK_RESULT_MAX_BYTES en JSON) est
+  écrit dans un fichier ; la ligne ne garde que ses valeurs simples (compteurs,
+  dates) et une référence au fichier :
+
+      WEATHER_TASK_RESULT_DIR/<tâche>-<task_id>.json
+
+- sweep_expired_results() applique CELERY_RESULT_EXPIRES par lots (DELETE
+  courts sur l'index date_done) et supprime les fichiers expirés.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+from pathlib import Path
+from uuid import uuid4
+
+from celery import current_task
+from django.conf import settings
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+from .responses import dumps
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_KEY = "result_ref"
+
+
+def _result_path(task):
+    # current_task est un proxy : faux (et non None) hors d'une tâche
+    task_id = task.request.id if task and task.request.id else uuid4().hex
+    name = task.name.rsplit(".", 1)[-1] if task else "task"
+    return Path(settings.WEATHER_TASK_RESULT_DIR) / f"{name}-{task_id}.json"
+
+
+def compact_result(result):
+    """
+    Résultat à enregistrer pour la tâche en cours : `result` tel quel s'il est
+    petit, sinon ses valeurs simples et la référence du fichier qui le contient
+    """
+    data = dumps(result)
+    if len(data) <= settings.WEATHER_TASK_RESULT_MAX_BYTES:
+        return result
+
+    path = _result_path(current_task)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+    compacted = {
+        key: value
+        for key, value in result.items()
+        if not isinstance(value, (dict, list, tuple))
+    }
+    compacted[REFERENCE_KEY] = str(path)
+    compacted["result_bytes"] = len(data)
+    return compacted
+
+
+def load_result(result):
+    """
+    Résultat complet d'une tâche (relit le fichier référencé s'il y en a un)
+    """
+    if isinstance(result, dict) and REFERENCE_KEY in result:
+        with open(result[REFERENCE_KEY], "rb") as f:
+            return json.load(f)
+    return result
+
+
+def _expires_delta(expires):
+    if isinstance(expires, timedelta):
+        return expires
+    return timedelta(seconds=expires)
+
+
+def _sweep_files(cutoff):
+    directory = Path(settings.WEATHER_TASK_RESULT_DIR)
+    if not directory.is_dir():
+        return 0
+    deleted = 0
+    limit = cutoff.timestamp()
+    for path in directory.glob("*.json"):
+        try:
+            if path.stat().st_mtime < limit:
+                path.unlink()
+                deleted += 1
+        except FileNotFoundError:
+            continue
+    return deleted
+
+
+def sweep_expired_results(expires=None, chunk_size=None, max_batches=None):
+    """
+    Supprime les résultats plus anciens que `expires` (CELERY_RESULT_EXPIRES),
+    au plus `max_batches` lots de `chunk_size` lignes, puis les fichiers de
+    résultats expirés
+    """
+    expires = settings.CELERY_RESULT_EXPIRES if expires is None else expires
+    chunk_size = chunk_size or settings.WEATHER_TASK_RESULT_SWEEP_CHUNK_SIZE
+    max_batches = max_batches or settings.WEATHER_TASK_RESULT_SWEEP_MAX_BATCHES
+    if not expires:
+        return {"deleted_count": 0, "batches": 0, "complete": True, "files_deleted": 0}
+
+    cutoff = timezone.now() - _expires_delta(expires)
+    expired = TaskResult.objects.filter(date_done__lt=cutoff).order_by()
+
+    deleted = 0
+    batches = 0
+    started = time.monotonic()
+    while batches < max_batches:
+        ids = list(expired.values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            break
+        count, _ = TaskResult.objects.filter(id__in=ids).delete()
+        deleted += count
+        batches += 1
+
+    files_deleted = _sweep_files(cutoff)
+    logger.info(
+        f"Résultats de tâches expirés: {deleted} lignes supprimées en {batches} lots, "
+        f"{files_deleted} fichiers ({time.monotonic() - started:.2f}s)"
+    )
+    return {
+        "deleted_count": deleted,
+        "batches": batches,
+        "complete": batches < max_batches,
+        "files_deleted": files_deleted,
+        "cutoff": cutoff.isoformat(),
+    }
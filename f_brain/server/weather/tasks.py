@@ -1,14 +1,41 @@
 from celery import shared_task
 import time
 import logging
+from collections import Counter
 from django.utils import timezone
-from django.db.models import Q, Count, Avg, Max, Min
-from .models import WeatherSearch
+from django.db.models import Q, Max, Min, Sum
+from django.conf import settings
+from .alerts import evaluate_alerts
+from .archive import archive_searches
+from .conditional import bump_history_version
+from .edge_cache import refresh_edge_pages
+from .exporters import export_searches
+from .ingest import save_rows, save_searches
+from .outbox import relay_all
+from .partitions import drop_partition, ensure_partitions, expired_partitions
+from .models import (
+    AlertNotification,
+    CitySearchStats,
+    WeatherAlert,
+    WeatherDailyRollup,
+    WeatherHourlyRollup,
+    WeatherSearch,
+)
+from .ratelimit import openweathermap_limit
+from .rollups import update_rollups
+from .services import (
+    WeatherAPIError,
+    fetch_current_weather_many,
+    normalize_location,
+    weather_search_from_payload,
+)
+from .subscriptions import match_new_searches, match_subscriptions, send_pending_notifications
+from .task_results import compact_result, sweep_expired_results
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True)
+@shared_task(bind=True, ignore_result=True)
 def test_celery_task(self, message="Hello from Celery!"):
     """
     Tâche de test simple pour vérifier que Celery fonctionne
@@ -34,7 +61,7 @@ def test_celery_task(self, message="Hello from Celery!"):
         raise
 
 
-@shared_task(bind=True)
+@shared_task(bind=True, ignore_result=True)
 def async_weather_processing(self, search_data):
     """
     Tâche pour traiter les recherches météo de manière asynchrone
@@ -47,19 +74,22 @@ def async_weather_processing(self, search_data):
         # - Notifications
         # - Mise en cache avancée
         # - Intégration avec d'autres APIs
+        # Une seule tâche par ville et par fenêtre (voir ingest.should_enqueue_processing)
 
-        # Simulation d'un traitement
-        time.sleep(1)
-
-        # Exemple: mettre à jour les statistiques
         city = search_data.get("city", "")
         if city:
-            # Compter les recherches pour cette ville
-            search_count = WeatherSearch.objects.filter(city__icontains=city).count()
+            # Compteur maintenu à l'insertion des recherches (pas de scan de la table)
+            city_key, country = normalize_location(city, search_data.get("country"))
+            stats = CitySearchStats.objects.filter(city=city_key, country=country).first()
 
             result = {
                 "city": city,
-                "search_count": search_count,
+                "search_count": stats.search_count if stats else 0,
+                "last_searched_at": (
+                    stats.last_searched_at.isoformat()
+                    if stats and stats.last_searched_at
+                    else None
+                ),
                 "processed_at": timezone.now().isoformat(),
                 "task_id": self.request.id,
             }
@@ -72,84 +102,225 @@ def async_weather_processing(self, search_data):
         raise
 
 
+@shared_task(ignore_result=True)
+def persist_weather_searches(rows):
+    """
+    Insère un lot de recherches mises en tampon par le mode write-behind "celery"
+    """
+    try:
+        created = save_rows(rows)
+        logger.info(f"Write-behind: {len(created)} recherches enregistrées")
+        return {"saved_count": len(created)}
+
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement différé des recherches: {e}")
+        raise
+
+
+@shared_task(ignore_result=True)
+def relay_outbox_events():
+    """
+    Publie les événements en attente dans l'outbox (filet de sécurité
+    périodique si la commande relay_outbox ne tourne pas)
+    """
+    try:
+        published = relay_all(max_batches=settings.WEATHER_OUTBOX_MAX_BATCHES)
+        return {"published_count": published}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du relais de l'outbox: {e}")
+        raise
+
+
+@shared_task(ignore_result=True)
+def refresh_edge_cache():
+    """
+    Rafraîchit l'historique en cache au proxy après de nouvelles recherches
+    (événement outbox écrit par weather/ingest.py)
+    """
+    try:
+        refreshed = refresh_edge_pages()
+        return {"status": "success", "refreshed": refreshed}
+    except Exception as e:
+        logger.error(f"Erreur lors du rafraîchissement du cache de bord: {str(e)}")
+        raise
+
+
 @shared_task
 def cleanup_old_searches():
     """
     Tâche de nettoyage des anciennes recherches météo
     """
     try:
-        # Supprimer les recherches de plus de 30 jours
+        # Supprimer les recherches plus anciennes que la durée de rétention
         from datetime import timedelta
 
-        cutoff_date = timezone.now() - timedelta(days=30)
+        cutoff_date = timezone.now() - timedelta(
+            days=settings.WEATHER_SEARCH_RETENTION_DAYS
+        )
+
+        archive = settings.WEATHER_ARCHIVE_ENABLED
+        archived_count = 0
 
-        deleted_count, _ = WeatherSearch.objects.filter(
-            searched_at__lt=cutoff_date
+        # Table partitionnée : suppression des partitions entièrement expirées,
+        # après archivage de leur contenu
+        dropped_partitions = []
+        for name, start, end in expired_partitions(cutoff_date):
+            if archive:
+                count, _ = archive_searches(
+                    WeatherSearch.objects.filter(searched_at__gte=start, searched_at__lt=end)
+                )
+                archived_count += count
+            drop_partition(name)
+            dropped_partitions.append(name)
+
+        # Reste (partition à cheval sur la date limite, ou table simple)
+        expired = WeatherSearch.objects.filter(searched_at__lt=cutoff_date)
+        if archive:
+            count, max_id = archive_searches(expired)
+            archived_count += count
+            # Uniquement les lignes archivées (pas d'insertion tardive entre-temps)
+            expired = expired.filter(id__lte=max_id or 0)
+        deleted_count, _ = expired.delete()
+        if deleted_count:
+            bump_history_version()
+        alerts_deleted, _ = WeatherAlert.objects.filter(window_start__lt=cutoff_date).delete()
+        AlertNotification.objects.filter(
+            window_start__lt=cutoff_date, sent_at__isnull=False
         ).delete()
 
-        logger.info(f"Nettoyage terminé: {deleted_count} recherches supprimées")
-        return {"deleted_count": deleted_count, "cutoff_date": cutoff_date.isoformat()}
+        logger.info(
+            f"Nettoyage terminé: {deleted_count} recherches supprimées, "
+            f"{len(dropped_partitions)} partitions supprimées, "
+            f"{archived_count} recherches archivées, {alerts_deleted} alertes supprimées"
+        )
+        return {
+            "deleted_count": deleted_count,
+            "dropped_partitions": dropped_partitions,
+            "archived_count": archived_count,
+            "alerts_deleted": alerts_deleted,
+            "cutoff_date": cutoff_date.isoformat(),
+        }
 
     except Exception as e:
         logger.error(f"Erreur lors du nettoyage: {e}")
         raise
 
 
+@shared_task
+def maintain_weather_partitions():
+    """
+    Crée à l'avance les partitions de weather_weathersearch (PostgreSQL, si
+    WEATHER_PARTITIONING est activé)
+    """
+    try:
+        partitions = ensure_partitions()
+        return {"partitions": partitions}
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la création des partitions: {e}")
+        raise
+
+
 # ================================
 # NOUVELLES TÂCHES CELERY AVANCÉES
 # ================================
 
 
+@shared_task(ignore_result=True)
+def update_weather_rollups():
+    """
+    Intègre les nouvelles recherches aux agrégats horaires et journaliers
+    """
+    try:
+        processed = update_rollups()
+        return {"processed_count": processed}
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des agrégats: {e}")
+        raise
+
+
 @shared_task
 def generate_weather_statistics():
     """
-    Génère des statistiques sur les recherches météo
+    Génère des statistiques sur les recherches météo, à partir des agrégats
+    (weather/rollups.py) : le coût ne dépend pas du nombre de recherches
     """
     try:
-        from django.db.models import Count, Avg, Max, Min
-        from collections import Counter
+        from datetime import timedelta
 
-        # Statistiques générales
-        total_searches = WeatherSearch.objects.count()
+        # Agrégats à jour avant de calculer le rapport
+        update_rollups()
 
-        # Top 10 des villes les plus recherchées
-        top_cities = (
-            WeatherSearch.objects.values("city", "country")
-            .annotate(search_count=Count("id"))
-            .order_by("-search_count")[:10]
+        # Statistiques générales
+        totals = WeatherDailyRollup.objects.aggregate(
+            total_searches=Sum("search_count"),
+            temperature_sum=Sum("temperature_sum"),
+            max_temp=Max("temperature_max"),
+            min_temp=Min("temperature_min"),
         )
+        total_searches = totals["total_searches"] or 0
+
+        # Top 10 des villes les plus recherchées (compteurs maintenus à l'insertion)
+        top_cities = [
+            {
+                "city": stats.display_city or stats.city,
+                "country": stats.country,
+                "search_count": stats.search_count,
+                "last_searched_at": (
+                    stats.last_searched_at.isoformat() if stats.last_searched_at else None
+                ),
+            }
+            for stats in CitySearchStats.objects.order_by("-search_count")[:10]
+        ]
 
         # Statistiques de température
-        temp_stats = WeatherSearch.objects.aggregate(
-            avg_temp=Avg("temperature"),
-            max_temp=Max("temperature"),
-            min_temp=Min("temperature"),
-        )
+        temp_stats = {
+            "avg_temp": (
+                totals["temperature_sum"] / total_searches if total_searches else None
+            ),
+            "max_temp": totals["max_temp"],
+            "min_temp": totals["min_temp"],
+        }
 
         # Recherches par jour des 7 derniers jours
-        from datetime import timedelta
-
         last_week = timezone.now() - timedelta(days=7)
         daily_searches = (
-            WeatherSearch.objects.filter(searched_at__gte=last_week)
-            .extra(select={"day": "date(searched_at)"})
+            WeatherDailyRollup.objects.filter(day__gte=last_week.date())
             .values("day")
-            .annotate(count=Count("id"))
+            .annotate(count=Sum("search_count"))
             .order_by("day")
         )
 
+        # Recherches par heure des dernières 24h
+        last_24h = timezone.now() - timedelta(hours=24)
+        hourly_searches = (
+            WeatherHourlyRollup.objects.filter(hour__gte=last_24h)
+            .values("hour")
+            .annotate(count=Sum("search_count"))
+            .order_by("hour")
+        )
+
         result = {
             "total_searches": total_searches,
-            "top_cities": list(top_cities),
+            "top_cities": top_cities,
             "temperature_stats": temp_stats,
-            "daily_searches_last_week": list(daily_searches),
+            "daily_searches_last_week": [
+                {"day": row["day"].isoformat(), "count": row["count"]}
+                for row in daily_searches
+            ],
+            "hourly_searches_last_24h": [
+                {"hour": row["hour"].isoformat(), "count": row["count"]}
+                for row in hourly_searches
+            ],
             "generated_at": timezone.now().isoformat(),
         }
 
         logger.info(
             f"Statistiques météo générées: {total_searches} recherches analysées"
         )
-        return result
+        return compact_result(result)
 
     except Exception as e:
         logger.error(f"Erreur lors de la génération des statistiques: {e}")
@@ -162,64 +333,48 @@ def bulk_weather_update(self, cities_list):
     Mise à jour en masse des données météo pour une liste de villes
     """
     try:
-        import requests
-        import os
-
-        api_key = os.getenv("OPENWEATHER_API_KEY")
-        if not api_key:
-            logger.warning("API key OpenWeather manquante")
-            return {"error": "API key manquante"}
+        locations = [
+            (city_data.get("city", ""), city_data.get("country", ""))
+            for city_data in cities_list
+        ]
 
-        updated_cities = []
+        searches = []
         errors = []
 
-        for i, city_data in enumerate(cities_list):
-            try:
-                city = city_data.get("city", "")
-                country = city_data.get("country", "")
-
-                # Appel API OpenWeather
-                url = "http://api.openweathermap.org/data/2.5/weather"
-                params = {"q": f"{city},{country}", "appid": api_key, "units": "metric"}
-
-                response = requests.get(url, params=params, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-
-                    # Créer ou mettre à jour la recherche
-                    weather_search = WeatherSearch.objects.create(
-                        city=data["name"],
-                        country=data["sys"]["country"],
-                        temperature=data["main"]["temp"],
-                        humidity=data["main"]["humidity"],
-                        wind_speed=data.get("wind", {}).get("speed", 0),
-                        pressure=data["main"]["pressure"],
-                        description=data["weather"][0]["description"],
-                        icon=data["weather"][0]["icon"],
-                    )
-
-                    updated_cities.append(
-                        {
-                            "city": weather_search.city,
-                            "temperature": weather_search.temperature,
-                            "id": weather_search.id,
-                        }
-                    )
-
-                    # Mettre à jour le progrès de la tâche
-                    self.update_state(
-                        state="PROGRESS",
-                        meta={"current": i + 1, "total": len(cities_list)},
-                    )
-
-                else:
-                    errors.append(f"{city}: HTTP {response.status_code}")
-
-                # Pause entre les appels API
-                time.sleep(0.5)
-
-            except Exception as e:
-                errors.append(f"{city}: {str(e)}")
+        # Appels en parallèle, cadencés par le quota OpenWeatherMap partagé
+        results = fetch_current_weather_many(
+            locations,
+            max_workers=settings.WEATHER_BULK_CONCURRENCY,
+            limiter=openweathermap_limit,
+        )
+        for done, (index, data, error) in enumerate(results, start=1):
+            city = locations[index][0]
+            if isinstance(error, WeatherAPIError):
+                errors.append(f"{city}: HTTP {error.status_code}")
+            elif error is not None:
+                errors.append(f"{city}: {str(error)}")
+            else:
+                try:
+                    searches.append(weather_search_from_payload(data))
+                except (KeyError, IndexError) as e:
+                    errors.append(f"{city}: Données de l'API incorrectes: {str(e)}")
+
+            # Mettre à jour le progrès de la tâche
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": done, "total": len(cities_list)},
+            )
+
+        # Une seule insertion pour toutes les villes
+        created = save_searches(searches)
+        updated_cities = [
+            {
+                "city": weather_search.city,
+                "temperature": weather_search.temperature,
+                "id": weather_search.id,
+            }
+            for weather_search in created
+        ]
 
         result = {
             "updated_cities": updated_cities,
@@ -233,7 +388,7 @@ def bulk_weather_update(self, cities_list):
         logger.info(
             f"Mise à jour en masse terminée: {len(updated_cities)} succès, {len(errors)} erreurs"
         )
-        return result
+        return compact_result(result)
 
     except Exception as e:
         logger.error(f"Erreur dans la mise à jour en masse: {e}")
@@ -243,67 +398,129 @@ def bulk_weather_update(self, cities_list):
 @shared_task
 def send_weather_alerts():
     """
-    Envoie des alertes pour les conditions météo extrêmes
+    Envoie des alertes pour les conditions météo extrêmes, à partir des
+    recherches ajoutées depuis le passage précédent (voir weather/alerts.py)
     """
     try:
-        # Rechercher les conditions extrêmes des dernières 24h
-        from datetime import timedelta
+        new_alerts, scanned = evaluate_alerts()
+
+        alerts = [
+            {
+                "city": alert.display_city or alert.city,
+                "country": alert.country,
+                "alert_type": alert.get_condition_display(),
+                "value": alert.value,
+                "window_start": alert.window_start.isoformat(),
+                "searched_at": alert.searched_at.isoformat(),
+            }
+            for alert in new_alerts
+        ]
 
-        last_24h = timezone.now() - timedelta(hours=24)
+        # Ici, on pourrait envoyer des emails, des notifications push, etc.
 
-        extreme_conditions = (
-            WeatherSearch.objects.filter(searched_at__gte=last_24h)
-            .filter(
-                # Conditions extrêmes
-                Q(temperature__gte=40)  # Très chaud
-                | Q(temperature__lte=-10)  # Très froid
-                | Q(wind_speed__gte=15)  # Vent fort
-                | Q(humidity__gte=90)  # Humidité très élevée
-            )
-            .distinct()
+        return compact_result(
+            {
+                "alerts_count": len(alerts),
+                "alerts": alerts,
+                "scanned_count": scanned,
+                "checked_at": timezone.now().isoformat(),
+            }
         )
 
-        alerts = []
-        for condition in extreme_conditions:
-            alert_type = []
-            if condition.temperature >= 40:
-                alert_type.append("Chaleur extrême")
-            if condition.temperature <= -10:
-                alert_type.append("Froid extrême")
-            if condition.wind_speed >= 15:
-                alert_type.append("Vent fort")
-            if condition.humidity >= 90:
-                alert_type.append("Humidité élevée")
-
-            alerts.append(
-                {
-                    "city": condition.city,
-                    "country": condition.country,
-                    "temperature": condition.temperature,
-                    "wind_speed": condition.wind_speed,
-                    "humidity": condition.humidity,
-                    "alert_types": alert_type,
-                    "searched_at": condition.searched_at.isoformat(),
-                }
-            )
+    except Exception as e:
+        logger.error(f"Erreur lors de la vérification des alertes: {e}")
+        raise
 
-        # Ici, on pourrait envoyer des emails, des notifications push, etc.
-        if alerts:
-            logger.warning(
-                f"Alertes météo générées: {len(alerts)} conditions extrêmes détectées"
-            )
 
-        return {
-            "alerts_count": len(alerts),
-            "alerts": alerts,
-            "checked_at": timezone.now().isoformat(),
-        }
+@shared_task(ignore_result=True)
+def match_alert_subscriptions(observations=None):
+    """
+    Rapproche des abonnements aux alertes les recherches ajoutées depuis le
+    passage précédent (ou `observations`, événements outbox écrits avant le
+    passage à la tâche périodique)
+    """
+    try:
+        if observations is not None:
+            return {"notifications_count": match_subscriptions(observations)}
+        notifications, scanned = match_new_searches()
+        return {"notifications_count": notifications, "scanned_count": scanned}
 
     except Exception as e:
-        logger.error(f"Erreur lors de la vérification des alertes: {e}")
+        logger.error(f"Erreur lors du rapprochement des abonnements aux alertes: {e}")
+        raise
+
+
+@shared_task(ignore_result=True)
+def send_alert_notifications():
+    """
+    Envoie les notifications d'alerte en attente
+    """
+    try:
+        return {"sent_count": send_pending_notifications()}
+
+    except Exception as e:
+        logger.error(f"Erreur lors de l'envoi des notifications d'alerte: {e}")
         raise
 
 
+@shared_task
+def sweep_task_results():
+    """
+    Supprime par lots les résultats de tâches plus anciens que
+    CELERY_RESULT_EXPIRES (voir weather/task_results.py)
+    """
+    try:
+        return sweep_expired_results()
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la purge des résultats de tâches: {e}")
+        raise
+
+
+def _delete_in_chunks(ids, chunk_size):
+    """
+    Supprime des recherches par lots d'ids (une requête DELETE courte par
+    lot) ; retourne pour chaque lot le nombre de lignes et la durée
+    """
+    passes = []
+    for start in range(0, len(ids), chunk_size):
+        started = time.monotonic()
+        deleted, _ = WeatherSearch.objects.filter(
+            id__in=ids[start:start + chunk_size]
+        ).delete()
+        passes.append(
+            {
+                "deleted": deleted,
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            }
+        )
+    return passes
+
+
+DUPLICATE_THRESHOLD = 5
+DUPLICATES_KEPT = 3
+
+# Recherches en trop (au-delà des DUPLICATES_KEPT plus récentes) des groupes
+# (ville, jour) de plus de DUPLICATE_THRESHOLD recherches, en un seul passage
+# sur la table ; la suppression se fait ensuite par lots d'ids.
+DUPLICATE_SEARCHES_SQL = """
+    SELECT id, city, day FROM (
+        SELECT
+            id,
+            city,
+            date(searched_at) AS day,
+            ROW_NUMBER() OVER (
+                PARTITION BY city, date(searched_at)
+                ORDER BY searched_at DESC, id DESC
+            ) AS rn,
+            COUNT(*) OVER (PARTITION BY city, date(searched_at)) AS group_size
+        FROM weather_weathersearch
+    ) ranked
+    WHERE rn > %s AND group_size > %s
+    ORDER BY city, day, id
+"""
+
+
 @shared_task
 def database_maintenance():
     """
@@ -319,33 +536,32 @@ def database_maintenance():
             cursor.execute("ANALYZE weather_weathersearch;")
             maintenance_results.append("Table weather_weathersearch analysée")
 
-        # 2. Nettoyer les recherches dupliquées (même ville, même heure)
-        duplicates = []
-        searches = (
-            WeatherSearch.objects.values("city", "searched_at__date")
-            .annotate(count=Count("id"))
-            .filter(count__gt=5)
-        )  # Plus de 5 recherches le même jour pour la même ville
-
-        for search_group in searches:
-            city = search_group["city"]
-            date = search_group["searched_at__date"]
-
-            # Garder seulement les 3 plus récentes
-            old_searches = WeatherSearch.objects.filter(
-                city=city, searched_at__date=date
-            ).order_by("-searched_at")[3:]
-
-            deleted_count = len(old_searches)
-            for search in old_searches:
-                search.delete()
-
-            if deleted_count > 0:
-                duplicates.append(
-                    f"{city} ({date}): {deleted_count} recherches supprimées"
-                )
+        chunk_size = settings.WEATHER_MAINTENANCE_DELETE_CHUNK_SIZE
 
-        # 3. Vérifier la cohérence des données
+        # 2. Nettoyer les recherches dupliquées (même ville, même jour) :
+        # plus de 5 recherches le même jour pour la même ville, on garde les
+        # 3 plus récentes. Les ids à supprimer et le rapport par ville
+        # viennent d'une seule requête ; un DELETE d'au plus chunk_size ids
+        # par lot.
+        with connection.cursor() as cursor:
+            cursor.execute(DUPLICATE_SEARCHES_SQL, [DUPLICATES_KEPT, DUPLICATE_THRESHOLD])
+            doomed = cursor.fetchall()
+
+        doomed_per_group = Counter((city, str(day)) for _, city, day in doomed)
+        duplicates = [
+            f"{city} ({day}): {count} recherches supprimées"
+            for (city, day), count in doomed_per_group.items()
+        ]
+        duplicate_passes = _delete_in_chunks([row[0] for row in doomed], chunk_size)
+
+        duplicate_count = sum(deletion["deleted"] for deletion in duplicate_passes)
+        if duplicate_count:
+            maintenance_results.append(
+                f"{duplicate_count} recherches dupliquées supprimées "
+                f"en {len(duplicate_passes)} lots"
+            )
+
+        # 3. Vérifier la cohérence des données (suppression par lots, verrous courts)
         inconsistent_data = WeatherSearch.objects.filter(
             Q(temperature__lt=-50)  # Température irréaliste
             | Q(temperature__gt=60)
@@ -355,24 +571,34 @@ def database_maintenance():
             | Q(pressure__gt=1100)
         )
 
-        cleaned_count = inconsistent_data.count()
+        inconsistent_passes = []
+        while True:
+            ids = list(inconsistent_data.values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            inconsistent_passes.extend(_delete_in_chunks(ids, chunk_size))
+
+        cleaned_count = sum(deletion["deleted"] for deletion in inconsistent_passes)
         if cleaned_count > 0:
-            inconsistent_data.delete()
             maintenance_results.append(
                 f"{cleaned_count} entrées avec données incohérentes supprimées"
             )
+        if duplicate_count or cleaned_count:
+            bump_history_version()
 
         result = {
             "maintenance_actions": maintenance_results,
             "duplicates_cleaned": duplicates,
+            "duplicate_delete_passes": duplicate_passes,
             "inconsistent_data_cleaned": cleaned_count,
+            "inconsistent_delete_passes": inconsistent_passes,
             "maintenance_date": timezone.now().isoformat(),
         }
 
         logger.info(
             f"Maintenance base de données terminée: {len(maintenance_results)} actions"
         )
-        return result
+        return compact_result(result)
 
     except Exception as e:
         logger.error(f"Erreur lors de la maintenance: {e}")
@@ -380,76 +606,19 @@ def database_maintenance():
 
 
 @shared_task
-def export_weather_data(export_format="json"):
+def export_weather_data(export_format="json", incremental=False):
     """
-    Exporte les données météo dans différents formats
+    Exporte les données météo dans un fichier (csv, jsonl/json ou parquet),
+    en flux ; avec incremental=True, seulement les recherches ajoutées
+    depuis l'export précédent
     """
     try:
-        from django.core import serializers
-        import json
-        import csv
-        import io
-
-        # Récupérer toutes les données
-        weather_data = WeatherSearch.objects.all().order_by("-searched_at")
-
-        if export_format.lower() == "json":
-            serialized_data = serializers.serialize("json", weather_data)
-            data = json.loads(serialized_data)
-
-        elif export_format.lower() == "csv":
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # En-têtes
-            writer.writerow(
-                [
-                    "City",
-                    "Country",
-                    "Temperature",
-                    "Humidity",
-                    "Wind Speed",
-                    "Pressure",
-                    "Description",
-                    "Icon",
-                    "Searched At",
-                ]
-            )
-
-            # Données
-            for search in weather_data:
-                writer.writerow(
-                    [
-                        search.city,
-                        search.country,
-                        search.temperature,
-                        search.humidity,
-                        search.wind_speed,
-                        search.pressure,
-                        search.description,
-                        search.icon,
-                        search.searched_at.isoformat(),
-                    ]
-                )
-
-            data = output.getvalue()
-            output.close()
-
-        else:
-            raise ValueError(f"Format d'export non supporté: {export_format}")
-
-        # Sauvegarder le fichier (ici on retourne juste les données)
-        result = {
-            "format": export_format,
-            "records_count": weather_data.count(),
-            "exported_at": timezone.now().isoformat(),
-            "data_preview": (
-                str(data)[:500] + "..." if len(str(data)) > 500 else str(data)
-            ),
-        }
+        result = export_searches(export_format, incremental=incremental)
+        result["incremental"] = incremental
+        result["exported_at"] = timezone.now().isoformat()
 
         logger.info(
-            f"Export terminé: {weather_data.count()} enregistrements en format {export_format}"
+            f"Export terminé: {result['row_count']} enregistrements en format {result['format']}"
         )
         return result
 
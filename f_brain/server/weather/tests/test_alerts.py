@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+
+from weather.alerts import WATERMARK_NAME, evaluate_alerts, window_start
+from weather.models import ProcessingWatermark, WeatherAlert
+
+from .utils import NOW, create_searches, make_search
+
+
+@override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=0, WEATHER_ALERT_WINDOW_HOURS=24)
+class EvaluateAlertsTests(TestCase):
+    def position(self):
+        return ProcessingWatermark.objects.get(name=WATERMARK_NAME).position
+
+    def test_window_start_is_aligned_on_utc(self):
+        self.assertEqual(window_start(NOW), NOW.replace(hour=0))
+        self.assertEqual(window_start(NOW + timedelta(hours=5), hours=6), NOW)
+
+    def test_one_alert_per_city_condition_and_window(self):
+        first, _, _, other_day, _ = create_searches(
+            make_search("Paris", temperature=41),
+            make_search("paris ", searched_at=NOW + timedelta(hours=1), temperature=43),
+            make_search("Paris", searched_at=NOW + timedelta(hours=2), wind_speed=20),
+            make_search("Paris", searched_at=NOW + timedelta(days=1), temperature=42),
+            make_search("Lyon", temperature=25),
+        )
+
+        alerts, scanned = evaluate_alerts(batch_size=10)
+
+        self.assertEqual(scanned, 4)
+        self.assertEqual(
+            sorted((a.city, a.condition, a.window_start, a.search_id) for a in alerts),
+            [
+                ("paris", "heat", window_start(NOW), first.id),
+                ("paris", "heat", window_start(NOW + timedelta(days=1)), other_day.id),
+                ("paris", "wind", window_start(NOW), first.id + 2),
+            ],
+        )
+        self.assertEqual(WeatherAlert.objects.count(), 3)
+
+    def test_later_runs_only_read_new_searches(self):
+        create_searches(make_search(temperature=41))
+        evaluate_alerts()
+
+        (later,) = create_searches(make_search(searched_at=NOW + timedelta(hours=1), temperature=45))
+        alerts, scanned = evaluate_alerts()
+
+        # Même fenêtre : l'alerte a déjà été émise
+        self.assertEqual((alerts, scanned), ([], 1))
+        self.assertEqual(self.position(), later.id)
+        self.assertEqual(WeatherAlert.objects.count(), 1)
+
+    def test_batches_stop_at_max_batches(self):
+        searches = create_searches(
+            *(make_search(f"Ville {i}", temperature=41) for i in range(5))
+        )
+
+        alerts, scanned = evaluate_alerts(batch_size=2, max_batches=2)
+        self.assertEqual((len(alerts), scanned), (4, 4))
+        self.assertEqual(self.position(), searches[3].id)
+
+        alerts, scanned = evaluate_alerts(batch_size=2, max_batches=2)
+        self.assertEqual((len(alerts), scanned), (1, 1))
+        self.assertEqual(self.position(), searches[4].id)
+
+    @override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=3600)
+    def test_recent_searches_wait_for_the_settle_delay(self):
+        create_searches(make_search(temperature=41))
+
+        self.assertEqual(evaluate_alerts(), ([], 0))
+        self.assertEqual(self.position(), 0)
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+
+from weather import archive
+from weather.models import WeatherSearch
+
+from .utils import NOW, create_searches, make_search
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            WEATHER_ARCHIVE_DIR=directory.name, WEATHER_ARCHIVE_FORMAT="jsonl"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_rearchiving_after_failed_delete_writes_nothing(self):
+        searches = create_searches(
+            make_search("Paris", searched_at=NOW),
+            make_search("Lyon", searched_at=NOW + timedelta(hours=1)),
+            make_search("Nice", searched_at=NOW + timedelta(days=1)),
+        )
+
+        self.assertEqual(
+            archive.archive_searches(WeatherSearch.objects.all()), (3, searches[-1].id)
+        )
+        # Suppression échouée : le passage suivant relit les mêmes lignes
+        count, max_id = archive.archive_searches(WeatherSearch.objects.all())
+
+        self.assertEqual((count, max_id), (0, searches[-1].id))
+        self.assertEqual(
+            [row["id"] for row in archive.iter_archived()], [s.id for s in searches]
+        )
+
+    def test_overlapping_files_are_merged_without_duplicates(self):
+        searches = create_searches(
+            make_search("Paris", searched_at=NOW),
+            make_search("Lyon", searched_at=NOW + timedelta(hours=2)),
+        )
+        archive.archive_searches(WeatherSearch.objects.filter(pk=searches[0].pk))
+        (path,) = archive._day_files(NOW.date())
+        # Fichier laissé par une version qui réarchivait les lignes
+        shutil.copy(path, path.with_name("searches-0-0.jsonl.gz"))
+        (later,) = create_searches(make_search("Nice", searched_at=NOW + timedelta(hours=1)))
+        archive.archive_searches(WeatherSearch.objects.filter(pk__in=[searches[1].pk, later.pk]))
+
+        self.assertEqual(
+            [row["id"] for row in archive.iter_archived()],
+            [searches[0].id, later.id, searches[1].id],
+        )
+        self.assertEqual(
+            [row["id"] for row in archive.iter_archived(newest_first=True)],
+            [searches[1].id, later.id, searches[0].id],
+        )
+
+    def test_filters_and_cursor(self):
+        searches = create_searches(
+            make_search("Paris", searched_at=NOW),
+            make_search("Lyon", searched_at=NOW + timedelta(hours=1)),
+            make_search("paris", searched_at=NOW + timedelta(days=1)),
+        )
+        archive.archive_searches(WeatherSearch.objects.all())
+
+        paris = archive.iter_archived(city="PARIS", newest_first=True)
+        self.assertEqual([row["id"] for row in paris], [searches[2].id, searches[0].id])
+
+        before = (searches[2].searched_at, searches[2].id)
+        rows = list(archive.iter_archived(newest_first=True, before=before))
+        self.assertEqual([row["id"] for row in rows], [searches[1].id, searches[0].id])
+        self.assertEqual(rows[0]["searched_at"], searches[1].searched_at)
+
+        rows = archive.iter_archived(start=NOW + timedelta(minutes=30), end=NOW + timedelta(days=1))
+        self.assertEqual([row["id"] for row in rows], [searches[1].id])
@@ -0,0 +1,32 @@
+import uuid
+
+from django.test import TestCase
+
+from weather.conditional import record_etag
+
+from .utils import create_searches, make_search
+
+
+class AsyncWeatherByIdTests(TestCase):
+    def setUp(self):
+        (self.search,) = create_searches(make_search("Paris"))
+
+    async def test_lookup_by_id_and_public_id(self):
+        for key in (self.search.id, self.search.public_id):
+            with self.subTest(key=key):
+                response = await self.async_client.get(f"/api/async/history/{key}/")
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["city"], "Paris")
+                self.assertEqual(response["ETag"], record_etag(key))
+
+    async def test_matching_etag_is_not_modified(self):
+        key = self.search.public_id
+        response = await self.async_client.get(
+            f"/api/async/history/{key}/", headers={"If-None-Match": record_etag(key)}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_unknown_public_id(self):
+        response = await self.async_client.get(f"/api/async/history/{uuid.uuid4()}/")
+        self.assertEqual(response.status_code, 404)
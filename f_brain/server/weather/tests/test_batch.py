@@ -0,0 +1,63 @@
+import json
+from unittest import mock
+
+import requests
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from weather.models import WeatherSearch
+from weather.services import UPSTREAM_ERROR_MESSAGE, WeatherAPIError
+
+from .utils import api_payload
+
+LEAKING_ERROR = requests.exceptions.ConnectionError(
+    "HTTPSConnectionPool: /data/2.5/weather?q=Rome&appid=secret-key"
+)
+
+
+@override_settings(WEATHER_WRITE_BEHIND_MODE="off", WEATHER_CACHE_L2_ALIAS=None)
+class WeatherBatchTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def post(self, body):
+        return self.client.post(
+            "/api/v1/weather/batch/", json.dumps(body), content_type="application/json"
+        )
+
+    def test_non_string_city_is_rejected(self):
+        for entry in ({"city": None}, {"city": 12}, {"city": "Rome", "country": None}, 3):
+            with self.subTest(entry=entry):
+                response = self.post({"cities": [entry]})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Ville invalide", response.json()["error"])
+
+    def test_results_and_errors_in_request_order(self):
+        def fetch_many(locations, max_workers):
+            yield 2, None, WeatherAPIError("city not found", status_code=404)
+            yield 1, None, LEAKING_ERROR
+            yield 0, api_payload("Paris", "FR"), None
+
+        with mock.patch("weather.api_views.fetch_current_weather_many", fetch_many):
+            response = self.post({"cities": ["Paris", {"city": "Rome"}, "Nowhere,XX"]})
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((body["successful"], body["failed"]), (1, 2))
+        paris, rome, nowhere = body["results"]
+        self.assertEqual(paris["query"], {"city": "Paris", "country": ""})
+        self.assertEqual(
+            paris["saved_record"]["id"], WeatherSearch.objects.get(city="Paris").id
+        )
+        self.assertEqual(rome["error"], UPSTREAM_ERROR_MESSAGE)
+        self.assertEqual(rome["status"], 500)
+        self.assertEqual(nowhere["query"], {"city": "Nowhere", "country": "XX"})
+        self.assertEqual(nowhere["status"], 404)
+        self.assertNotIn("secret-key", response.content.decode())
+
+    def test_single_city_upstream_error_hides_the_request_url(self):
+        with mock.patch("weather.api_views.get_current_weather", side_effect=LEAKING_ERROR):
+            response = self.client.get("/api/v1/weather/", {"city": "Rome"})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {"error": UPSTREAM_ERROR_MESSAGE})
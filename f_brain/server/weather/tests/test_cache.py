@@ -0,0 +1,97 @@
+import threading
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from weather import services
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+TWO_LEVELS = {
+    "default": {"BACKEND": LOCMEM, "LOCATION": "test-l1"},
+    "shared": {"BACKEND": LOCMEM, "LOCATION": "test-l2"},
+}
+PARIS = {"name": "Paris", "main": {"temp": 21}}
+
+
+class CacheTestCase(SimpleTestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.api = mock.patch.object(services, "get_weather_from_api", return_value=PARIS)
+        self.get_weather_from_api = self.api.start()
+        self.addCleanup(self.api.stop)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_load(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "valeur"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(services._single_flight("k", loader)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(services._single_flight("k", loader)))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["valeur"] * 4)
+
+    def test_error_is_not_cached(self):
+        with self.assertRaises(ValueError):
+            services._single_flight("k", mock.Mock(side_effect=ValueError))
+        self.assertEqual(services._single_flight("k", lambda: 1), 1)
+
+
+@override_settings(WEATHER_CACHE_L2_ALIAS=None)
+class LocalOnlyCacheTests(CacheTestCase):
+    def test_without_shared_cache_only_l1_is_used(self):
+        self.assertEqual(services.get_current_weather("Paris", "fr"), PARIS)
+        self.assertEqual(services.get_current_weather(" paris ", "FR"), PARIS)
+
+        self.get_weather_from_api.assert_called_once_with("Paris", "fr")
+        self.assertEqual(caches["default"].get(services.weather_cache_key("Paris", "FR")), PARIS)
+
+
+@override_settings(CACHES=TWO_LEVELS, WEATHER_CACHE_L2_ALIAS="shared", WEATHER_CACHE_LOCK_TIMEOUT=1)
+class SharedCacheTests(CacheTestCase):
+    key = services.weather_cache_key("Paris")
+
+    def test_l2_hit_fills_l1_without_calling_the_api(self):
+        caches["shared"].set(self.key, PARIS)
+
+        self.assertEqual(services.get_current_weather("Paris"), PARIS)
+
+        self.get_weather_from_api.assert_not_called()
+        self.assertEqual(caches["default"].get(self.key), PARIS)
+
+    def test_miss_publishes_to_l2_and_releases_the_lock(self):
+        self.assertEqual(services.get_current_weather("Paris"), PARIS)
+
+        self.get_weather_from_api.assert_called_once()
+        self.assertEqual(caches["shared"].get(self.key), PARIS)
+        self.assertIsNone(caches["shared"].get(f"{self.key}:lock"))
+
+    def test_waits_for_the_process_holding_the_lock(self):
+        caches["shared"].add(f"{self.key}:lock", 1)
+        publisher = threading.Timer(0.1, caches["shared"].set, (self.key, PARIS))
+        publisher.start()
+        self.addCleanup(publisher.cancel)
+
+        self.assertEqual(services._load_through_shared_cache(self.key, mock.Mock()), PARIS)
+        self.get_weather_from_api.assert_not_called()
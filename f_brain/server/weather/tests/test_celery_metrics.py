@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from weather import celery_metrics
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def fake_task(name, ignore_result=False, **request):
+    request.setdefault("eta", None)
+    request.setdefault("ignore_result", False)
+    return SimpleNamespace(
+        name=name, ignore_result=ignore_result, request=SimpleNamespace(**request)
+    )
+
+
+class CeleryMetricsTests(SimpleTestCase):
+    def test_publish_stamps_the_sent_at_header(self):
+        headers = {}
+        celery_metrics.stamp_sent_at(headers=headers)
+        self.assertAlmostEqual(headers["sent_at"], time.time(), delta=5)
+
+    def test_queue_wait_runtime_and_in_progress(self):
+        task = fake_task("test.queued", sent_at=time.time() - 30)
+
+        celery_metrics.task_started(task_id="t1", task=task)
+        self.assertEqual(sample("weather_celery_tasks_in_progress", task="test.queued"), 1)
+        celery_metrics.task_finished(task_id="t1", task=task, state="SUCCESS")
+
+        self.assertEqual(sample("weather_celery_tasks_in_progress", task="test.queued"), 0)
+        self.assertGreaterEqual(
+            sample("weather_celery_task_queue_wait_seconds_sum", task="test.queued"), 30
+        )
+        self.assertEqual(
+            sample("weather_celery_task_runtime_seconds_count", task="test.queued", state="SUCCESS"),
+            1,
+        )
+        self.assertNotIn("t1", celery_metrics._started)
+
+    def test_delayed_task_waits_from_its_eta(self):
+        eta = datetime.fromtimestamp(time.time() - 2, tz=dt_timezone.utc)
+        task = fake_task("test.delayed", sent_at=time.time() - 600, eta=eta.isoformat())
+
+        celery_metrics.task_started(task_id="t2", task=task)
+        celery_metrics.task_finished(task_id="t2", task=task, state="SUCCESS")
+
+        wait = sample("weather_celery_task_queue_wait_seconds_sum", task="test.delayed")
+        self.assertLess(wait, 60)
+
+    def test_eager_task_has_no_queue_wait(self):
+        task = fake_task("test.eager")
+        celery_metrics.task_started(task_id="t3", task=task)
+        celery_metrics.task_finished(task_id="t3", task=task, state="FAILURE")
+
+        self.assertEqual(sample("weather_celery_task_queue_wait_seconds_count", task="test.eager"), 0)
+
+    def test_failures_retries_and_result_size(self):
+        task = fake_task("test.results")
+        celery_metrics.task_failed(sender=task, exception=KeyError("city"))
+        celery_metrics.task_retried(sender=task)
+        celery_metrics.task_succeeded(sender=task, result={"status": "ok"})
+        celery_metrics.task_succeeded(sender=fake_task("test.results", ignore_result=True), result="x")
+
+        self.assertEqual(
+            sample("weather_celery_task_failures_total", task="test.results", exception="KeyError"), 1
+        )
+        self.assertEqual(sample("weather_celery_task_retries_total", task="test.results"), 1)
+        self.assertEqual(sample("weather_celery_task_result_bytes_count", task="test.results"), 1)
+        self.assertEqual(
+            sample("weather_celery_task_result_bytes_sum", task="test.results"),
+            len('{"status": "ok"}'),
+        )
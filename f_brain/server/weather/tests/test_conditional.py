@@ -0,0 +1,54 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from weather.conditional import bump_history_version, history_validators
+from weather.ingest import save_searches
+from weather.models import WeatherSearch
+from weather.tasks import cleanup_old_searches
+
+from .utils import create_searches, make_search
+
+
+@override_settings(WEATHER_EDGE_CACHE_HOSTS=[])
+class HistoryValidatorsTests(TestCase):
+    def test_history_etag_changes_on_insert_and_purge(self):
+        now = timezone.now()
+        create_searches(make_search(searched_at=now - timedelta(days=400)))
+        save_searches([make_search(searched_at=now)])
+        etag, last_modified = history_validators()
+        self.assertEqual(last_modified, int(now.timestamp()))
+
+        response = self.client.get("/api/v1/history/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Purge d'une ligne au milieu : max(id) et max(searched_at) inchangés
+        with mock.patch("weather.tasks.expired_partitions", return_value=[]):
+            self.assertEqual(cleanup_old_searches()["deleted_count"], 1)
+        self.assertNotEqual(history_validators()[0], etag)
+        response = self.client.get("/api/v1/history/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], history_validators()[0])
+
+    def test_save_searches_bumps_the_version(self):
+        etag = history_validators()[0]
+        save_searches([make_search()])
+        self.assertNotEqual(history_validators()[0], etag)
+
+    def test_bump_creates_the_version_row(self):
+        etag = history_validators()[0]
+        bump_history_version()
+        bump_history_version()
+        self.assertEqual(history_validators()[0], 'W/"history-0-2"')
+        self.assertNotEqual(etag, 'W/"history-0-2"')
+
+    def test_deleted_record_is_not_found_instead_of_not_modified(self):
+        (search,) = create_searches(make_search())
+        url = f"/api/history/{search.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        WeatherSearch.objects.filter(id=search.id).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from weather import edge_cache
+
+EDGE = {
+    "WEATHER_CACHE_L2_ALIAS": None,
+    "WEATHER_EDGE_CACHE_URL": "http://nginx:8080/",
+    "WEATHER_EDGE_CACHE_HOSTS": ["meteo.example", "localhost"],
+    "WEATHER_EDGE_CACHE_REFRESH_PATHS": ["/api/v1/history/"],
+    "WEATHER_EDGE_CACHE_REFRESH_INTERVAL": 60,
+}
+
+
+class SetEdgeCacheTests(SimpleTestCase):
+    def test_edge_and_browser_lifetimes(self):
+        response = edge_cache.set_edge_cache(HttpResponse(), 30, max_age=5)
+
+        self.assertEqual(response["X-Accel-Expires"], "30")
+        self.assertEqual(
+            set(response["Cache-Control"].split(", ")), {"public", "max-age=5", "s-maxage=30"}
+        )
+
+    def test_disabled_edge_cache_leaves_the_response_alone(self):
+        response = edge_cache.set_edge_cache(HttpResponse(), 0)
+        self.assertNotIn("X-Accel-Expires", response)
+        self.assertNotIn("Cache-Control", response)
+
+
+@override_settings(**EDGE)
+class EdgeRefreshTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_one_pending_refresh_at_a_time(self):
+        event = edge_cache.edge_refresh_event()
+        self.assertEqual(event.task_name, "weather.tasks.refresh_edge_cache")
+        self.assertIsNone(edge_cache.edge_refresh_event())
+
+        with mock.patch.object(edge_cache.requests.Session, "get") as get:
+            self.assertEqual(edge_cache.refresh_edge_pages(), 2)
+        self.assertIsNotNone(edge_cache.edge_refresh_event())
+
+        get.assert_has_calls(
+            [
+                mock.call(
+                    "http://nginx:8080/api/v1/history/", headers={"Host": host}, timeout=5
+                )
+                for host in ("meteo.example", "localhost")
+            ],
+            any_order=True,
+        )
+
+    @override_settings(WEATHER_EDGE_CACHE_URL="")
+    def test_no_event_without_edge_cache(self):
+        self.assertIsNone(edge_cache.edge_refresh_event())
+
+
+@override_settings(WEATHER_EDGE_HISTORY_MAX_AGE=30, WEATHER_HISTORY_MAX_AGE=5)
+class HistoryEdgeHeadersTests(TestCase):
+    def test_history_and_not_modified_responses_are_cacheable_at_the_edge(self):
+        response = self.client.get("/api/v1/history/")
+        self.assertEqual(response["X-Accel-Expires"], "30")
+        self.assertIn("s-maxage=30", response["Cache-Control"])
+
+        response = self.client.get("/api/v1/history/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["X-Accel-Expires"], "30")
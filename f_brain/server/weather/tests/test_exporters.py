@@ -0,0 +1,66 @@
+import csv
+import gzip
+import json
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from weather import exporters
+from weather.models import ProcessingWatermark
+
+from .utils import create_searches, make_search
+
+
+@override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=0)
+class ExportSearchesTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, export_format="csv", **kwargs):
+        return exporters.export_searches(
+            export_format, directory=self.directory.name, chunk_size=2, **kwargs
+        )
+
+    def test_full_csv_export(self):
+        create_searches(make_search("Paris"), make_search("Lyon"), make_search("Nice"))
+
+        result = self.export()
+
+        with gzip.open(result["path"], "rt", encoding="utf-8") as export_file:
+            rows = list(csv.reader(export_file))
+        self.assertEqual(rows[0], list(exporters.CSV_HEADER))
+        self.assertEqual([row[1] for row in rows[1:]], ["Paris", "Lyon", "Nice"])
+        self.assertEqual(result["row_count"], 3)
+        self.assertEqual(len(result["sha256"]), 64)
+
+    def test_incremental_export_resumes_after_previous_run(self):
+        first = create_searches(make_search("Paris"), make_search("Lyon"))
+
+        result = self.export("json", incremental=True)
+        self.assertEqual(result["format"], "jsonl")
+        self.assertEqual(result["since_id"], 0)
+        with gzip.open(result["path"], "rt", encoding="utf-8") as export_file:
+            self.assertEqual(
+                [json.loads(line)["id"] for line in export_file], [s.id for s in first]
+            )
+
+        self.assertIsNone(self.export("json", incremental=True)["path"])
+
+        (later,) = create_searches(make_search("Nice"))
+        result = self.export("json", incremental=True)
+        self.assertEqual(result["since_id"], first[-1].id)
+        self.assertEqual(result["row_count"], 1)
+        self.assertEqual(
+            ProcessingWatermark.objects.get(name="weather-export-jsonl").position, later.id
+        )
+
+    def test_concurrent_advance_discards_the_file(self):
+        create_searches(make_search())
+
+        with mock.patch.object(exporters, "swap_watermark", return_value=False):
+            result = self.export(incremental=True)
+
+        self.assertIsNone(result["path"])
+        self.assertEqual(list(exporters.Path(self.directory.name).iterdir()), [])
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from weather.history import clamp_limit, decode_cursor, encode_cursor
+
+from .utils import NOW, create_searches, make_search
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(NOW, 42)), (NOW, 42))
+
+    def test_invalid_cursors(self):
+        for token in ("", "%%%", encode_cursor(NOW, 1)[:-3], "WyJ4IiwgMV0"):
+            with self.subTest(token=token), self.assertRaises(ValueError):
+                decode_cursor(token)
+
+    @override_settings(WEATHER_HISTORY_MAX_LIMIT=50)
+    def test_clamp_limit(self):
+        self.assertEqual(clamp_limit(None), 10)
+        self.assertEqual(clamp_limit("abc"), 10)
+        self.assertEqual(clamp_limit("0"), 1)
+        self.assertEqual(clamp_limit("500"), 50)
+
+
+@override_settings(WEATHER_EDGE_CACHE_URL="")
+class HistoryPaginationTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        # Deux recherches à la même date : départagées par l'id
+        self.searches = create_searches(
+            make_search("Paris", searched_at=NOW - timedelta(hours=2)),
+            make_search("Lyon", searched_at=NOW - timedelta(hours=1)),
+            make_search("Paris", searched_at=NOW - timedelta(hours=1)),
+            make_search("Nice", searched_at=NOW),
+            make_search("Paris", searched_at=NOW + timedelta(days=2)),
+        )
+
+    def pages(self, **params):
+        ids = []
+        cursor = None
+        while True:
+            query = dict(params, limit=2, **({"cursor": cursor} if cursor else {}))
+            response = self.client.get("/api/v1/history/", query)
+            self.assertEqual(response.status_code, 200)
+            ids.append([row["id"] for row in response.json()])
+            cursor = response.get("X-Next-Cursor")
+            if cursor is None:
+                self.assertNotIn("Link", response)
+                return ids
+            self.assertIn('rel="next"', response["Link"])
+
+    def test_walks_every_search_once_newest_first(self):
+        s = self.searches
+        self.assertEqual(
+            self.pages(), [[s[4].id, s[3].id], [s[2].id, s[1].id], [s[0].id]]
+        )
+
+    def test_filters_apply_to_every_page(self):
+        s = self.searches
+        self.assertEqual(
+            self.pages(city="paris", end=NOW.date().isoformat()),
+            [[s[2].id, s[0].id]],
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/v1/history/", {"cursor": "invalide"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Curseur invalide"})
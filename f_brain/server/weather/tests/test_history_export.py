@@ -0,0 +1,84 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+
+from weather.exporters import CSV_HEADER
+from weather.history import accepts_gzip
+
+from .utils import NOW, create_searches, make_search
+
+
+class AcceptsGzipTests(SimpleTestCase):
+    def test_accept_encoding_values(self):
+        cases = {
+            "": False,
+            "gzip": True,
+            "br, GZIP;q=0.5": True,
+            "x-gzip": True,
+            "gzip;q=0": False,
+            "gzip;q=abc": False,
+            "*": True,
+            "deflate, *;q=0": False,
+            "identity": False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertIs(accepts_gzip(header), expected)
+
+
+class ExportWeatherHistoryTests(TestCase):
+    def setUp(self):
+        self.searches = create_searches(
+            make_search("Paris", searched_at=NOW),
+            make_search("Lyon", searched_at=NOW - timedelta(hours=1)),
+            make_search("Paris", searched_at=NOW - timedelta(days=3)),
+        )
+
+    def export(self, export_format, gzipped=False, **params):
+        headers = {"HTTP_ACCEPT_ENCODING": "gzip" if gzipped else "identity"}
+        response = self.client.get(
+            "/api/v1/history/export/", {"format": export_format, **params}, **headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = b"".join(response.streaming_content)
+        if gzipped:
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            content = gzip.decompress(content)
+        else:
+            self.assertNotIn("Content-Encoding", response)
+        return response, content.decode("utf-8")
+
+    def test_csv_export(self):
+        for gzipped in (False, True):
+            with self.subTest(gzipped=gzipped):
+                response, content = self.export("csv", gzipped)
+
+                self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+                rows = list(csv.reader(io.StringIO(content)))
+                self.assertEqual(rows[0], list(CSV_HEADER))
+                self.assertEqual(
+                    [row[0] for row in rows[1:]],
+                    [str(search.id) for search in reversed(self.searches)],
+                )
+
+    def test_ndjson_export_with_filters(self):
+        for gzipped in (False, True):
+            with self.subTest(gzipped=gzipped):
+                response, content = self.export(
+                    "ndjson", gzipped, city="paris", start=(NOW - timedelta(days=1)).isoformat()
+                )
+
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                (record,) = [json.loads(line) for line in content.splitlines()]
+                self.assertEqual(record["id"], self.searches[0].id)
+                self.assertEqual(record["searched_at"], NOW.isoformat())
+
+    def test_unknown_format(self):
+        response = self.client.get("/api/v1/history/export/", {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from urllib3.exceptions import MaxRetryError
+from urllib3.response import HTTPResponse
+
+from weather import http_client
+from weather.http_client import BudgetedRetry, RetryBudget
+
+
+class RetryBudgetTests(SimpleTestCase):
+    def test_withdrawals_are_bounded_by_deposits(self):
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_deposits_are_capped_by_the_reserve(self):
+        budget = RetryBudget(ratio=1, reserve=1)
+        for _ in range(5):
+            budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+class BudgetedRetryTests(SimpleTestCase):
+    def increment(self, retry):
+        return retry.increment(
+            method="GET", url="/data/2.5/weather", response=HTTPResponse(status=503)
+        )
+
+    def test_retries_while_the_budget_lasts(self):
+        budget = RetryBudget(ratio=0, reserve=1)
+        retry = BudgetedRetry(total=3, status_forcelist=(503,), raise_on_status=False)
+
+        with mock.patch.object(http_client, "_retry_budget", budget):
+            retry = self.increment(retry)
+            self.assertEqual(retry.total, 2)
+            # Budget épuisé : plus de nouvelle tentative malgré total=2
+            with self.assertRaises(MaxRetryError):
+                self.increment(retry)
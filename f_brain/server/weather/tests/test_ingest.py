@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from weather.ingest import record_searches, save_searches, should_enqueue_processing
+from weather.models import CitySearchStats, OutboxEvent
+
+from .utils import NOW, make_search
+
+
+@override_settings(
+    WEATHER_CACHE_L2_ALIAS=None,
+    WEATHER_PROCESSING_COALESCE_WINDOW=60,
+    WEATHER_WRITE_BEHIND_MODE="off",
+    WEATHER_EDGE_CACHE_URL="",
+)
+class ProcessingCoalescingTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_one_processing_task_per_city_and_window(self):
+        self.assertTrue(should_enqueue_processing(make_search("Paris", "fr")))
+        self.assertFalse(should_enqueue_processing(make_search(" PARIS ", "FR")))
+        self.assertTrue(should_enqueue_processing(make_search("Paris", "US")))
+
+    @override_settings(WEATHER_PROCESSING_COALESCE_WINDOW=0)
+    def test_disabled_window_always_enqueues(self):
+        self.assertTrue(should_enqueue_processing(make_search()))
+        self.assertTrue(should_enqueue_processing(make_search()))
+
+    def test_record_searches_writes_one_outbox_event_per_city(self):
+        record_searches(
+            [make_search("Paris"), make_search("paris"), make_search("Lyon")],
+            enqueue_processing=True,
+        )
+
+        events = OutboxEvent.objects.filter(task_name="weather.tasks.async_weather_processing")
+        self.assertEqual(sorted(event.args[0]["city"] for event in events), ["Lyon", "Paris"])
+
+
+@override_settings(WEATHER_EDGE_CACHE_URL="")
+class CitySearchStatsTests(TestCase):
+    def stats(self, city="paris", country="FR"):
+        return CitySearchStats.objects.get(city=city, country=country)
+
+    def test_counts_by_normalized_city_with_the_latest_observation(self):
+        save_searches(
+            [
+                make_search("Paris", temperature=18, searched_at=NOW - timedelta(hours=1)),
+                make_search(" PARIS ", "fr", temperature=21, description="nuageux"),
+                make_search("Lyon", temperature=25),
+            ]
+        )
+
+        stats = self.stats()
+        self.assertEqual(stats.search_count, 2)
+        self.assertEqual(stats.display_city, " PARIS ")
+        self.assertEqual(
+            (stats.last_searched_at, stats.last_temperature, stats.last_description),
+            (NOW, 21, "nuageux"),
+        )
+        self.assertEqual(self.stats("lyon").search_count, 1)
+
+    def test_increments_keep_the_most_recent_observation(self):
+        save_searches([make_search(temperature=21)])
+        # Écriture différée d'une recherche plus ancienne
+        save_searches([make_search(temperature=12, searched_at=NOW - timedelta(days=1))])
+
+        stats = self.stats()
+        self.assertEqual(stats.search_count, 2)
+        self.assertEqual((stats.last_searched_at, stats.last_temperature), (NOW, 21))
+
+        save_searches([make_search(temperature=30, searched_at=NOW + timedelta(hours=1))])
+        stats = self.stats()
+        self.assertEqual(stats.search_count, 3)
+        self.assertEqual(stats.last_temperature, 30)
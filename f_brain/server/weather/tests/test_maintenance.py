@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from weather.models import WeatherSearch
+from weather.tasks import (
+    DUPLICATE_SEARCHES_SQL,
+    DUPLICATE_THRESHOLD,
+    DUPLICATES_KEPT,
+    database_maintenance,
+)
+
+from .utils import NOW, create_searches, make_search
+
+
+def searches(city, count, day):
+    return [
+        make_search(city, searched_at=day + timedelta(minutes=minute))
+        for minute in range(count)
+    ]
+
+
+class DuplicateSearchesTests(TestCase):
+    def setUp(self):
+        yesterday = NOW - timedelta(days=1)
+        self.paris = create_searches(*searches("Paris", 7, NOW))
+        self.paris_yesterday = create_searches(*searches("Paris", 6, yesterday))
+        # Au seuil : pas de doublon
+        self.lyon = create_searches(*searches("Lyon", DUPLICATE_THRESHOLD, NOW))
+
+    def test_selects_all_but_the_newest_of_large_groups(self):
+        with connection.cursor() as cursor:
+            cursor.execute(DUPLICATE_SEARCHES_SQL, [DUPLICATES_KEPT, DUPLICATE_THRESHOLD])
+            doomed = [row[0] for row in cursor.fetchall()]
+
+        expected = self.paris_yesterday[:-DUPLICATES_KEPT] + self.paris[:-DUPLICATES_KEPT]
+        self.assertEqual(doomed, [search.id for search in expected])
+
+    @override_settings(WEATHER_MAINTENANCE_DELETE_CHUNK_SIZE=2)
+    def test_maintenance_deletes_in_bounded_chunks(self):
+        result = database_maintenance()
+
+        kept = self.paris[-DUPLICATES_KEPT:] + self.paris_yesterday[-DUPLICATES_KEPT:] + self.lyon
+        self.assertEqual(
+            set(WeatherSearch.objects.values_list("id", flat=True)), {s.id for s in kept}
+        )
+        passes = result["duplicate_delete_passes"]
+        self.assertEqual([deletion["deleted"] for deletion in passes], [2, 2, 2, 1])
+        self.assertEqual(
+            result["duplicates_cleaned"],
+            [
+                f"Paris ({(NOW - timedelta(days=1)).date()}): 3 recherches supprimées",
+                f"Paris ({NOW.date()}): 4 recherches supprimées",
+            ],
+        )
@@ -0,0 +1,61 @@
+import time
+from types import SimpleNamespace
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from weather import metrics
+from weather.metrics import record_cache_lookup, record_upstream
+
+from .utils import create_searches, make_search
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class UpstreamAndCacheMetricsTests(SimpleTestCase):
+    def test_cache_lookups_by_layer_and_result(self):
+        hits = sample("weather_cache_lookups_total", layer="l2", result="hit")
+        misses = sample("weather_cache_lookups_total", layer="l2", result="miss")
+
+        self.assertEqual(record_cache_lookup("l2", {"name": "Paris"}), {"name": "Paris"})
+        self.assertIsNone(record_cache_lookup("l2", None))
+
+        self.assertEqual(sample("weather_cache_lookups_total", layer="l2", result="hit"), hits + 1)
+        self.assertEqual(
+            sample("weather_cache_lookups_total", layer="l2", result="miss"), misses + 1
+        )
+
+    def test_upstream_status_and_latency(self):
+        labels = {"endpoint": "test-endpoint"}
+        record_upstream("test-endpoint", time.perf_counter(), SimpleNamespace(status_code=429))
+        record_upstream("test-endpoint", time.perf_counter())
+
+        self.assertEqual(sample("weather_upstream_responses_total", status="429", **labels), 1)
+        self.assertEqual(sample("weather_upstream_responses_total", status="error", **labels), 1)
+        self.assertEqual(sample("weather_upstream_request_duration_seconds_count", **labels), 2)
+
+
+@override_settings(WEATHER_EDGE_CACHE_URL="")
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_sql_queries_are_counted_per_view(self):
+        create_searches(make_search())
+        labels = {"view": "api_get_history"}
+        requests_before = sample("weather_http_request_db_queries_count", **labels)
+        queries_before = sample("weather_http_request_db_queries_sum", **labels)
+
+        self.assertEqual(self.client.get("/api/v1/history/").status_code, 200)
+
+        self.assertEqual(
+            sample("weather_http_request_db_queries_count", **labels), requests_before + 1
+        )
+        self.assertGreaterEqual(
+            sample("weather_http_request_db_queries_sum", **labels), queries_before + 2
+        )
+        self.assertEqual(sample("weather_http_requests_in_flight"), 0)
+        self.assertIsNone(metrics._request_queries.get())
@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from weather.models import OutboxEvent
+from weather.outbox import outbox_event, relay_all, relay_outbox
+
+
+class RelayOutboxTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("weather.outbox.current_app")
+        self.app = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.producer = self.app.producer_or_acquire.return_value.__enter__.return_value
+        OutboxEvent.objects.bulk_create(
+            [outbox_event("weather.tasks.process", i, city=f"Ville {i}") for i in range(3)]
+        )
+
+    def published(self):
+        return [(call.args[0], call.kwargs["args"]) for call in self.app.send_task.call_args_list]
+
+    def test_publishes_a_batch_in_order_then_deletes_it(self):
+        self.assertEqual(relay_outbox(batch_size=2), 2)
+
+        self.assertEqual(
+            self.published(), [("weather.tasks.process", [0]), ("weather.tasks.process", [1])]
+        )
+        self.assertEqual(self.app.send_task.call_args.kwargs["kwargs"], {"city": "Ville 1"})
+        self.assertIs(self.app.send_task.call_args.kwargs["producer"], self.producer)
+        self.assertEqual(list(OutboxEvent.objects.values_list("args", flat=True)), [[2]])
+
+    def test_relay_all_empties_the_outbox(self):
+        self.assertEqual(relay_all(batch_size=2), 3)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(relay_outbox(), 0)
+
+    def test_relay_all_stops_after_max_batches(self):
+        self.assertEqual(relay_all(batch_size=1, max_batches=2), 2)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_failed_publication_keeps_the_events(self):
+        self.app.send_task.side_effect = [None, ConnectionError("broker indisponible")]
+
+        with self.assertRaises(ConnectionError):
+            relay_outbox()
+
+        self.assertEqual(OutboxEvent.objects.count(), 3)
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from weather import partitions
+from weather.models import WeatherSearch
+
+from .utils import NOW, create_searches, make_search
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class PeriodTests(SimpleTestCase):
+    def test_periods_and_names(self):
+        moment = utc(2026, 12, 31, 23, 30)
+        self.assertEqual(partitions.period_start(moment, "day"), utc(2026, 12, 31))
+        self.assertEqual(partitions.period_start(moment, "month"), utc(2026, 12, 1))
+        self.assertEqual(partitions.next_period(utc(2026, 12, 31), "day"), utc(2027, 1, 1))
+        self.assertEqual(partitions.next_period(utc(2026, 12, 1), "month"), utc(2027, 1, 1))
+        self.assertEqual(
+            partitions.partition_name(utc(2026, 7, 1), "month"), "weather_weathersearch_p202607"
+        )
+
+    def test_bounds_are_read_back_from_the_name(self):
+        self.assertEqual(
+            partitions._partition_bounds("weather_weathersearch_p20260714"),
+            (utc(2026, 7, 14), utc(2026, 7, 15)),
+        )
+        self.assertEqual(
+            partitions._partition_bounds("weather_weathersearch_p202602"),
+            (utc(2026, 2, 1), utc(2026, 3, 1)),
+        )
+        self.assertIsNone(partitions._partition_bounds(partitions.DEFAULT_PARTITION))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "partitionnement PostgreSQL")
+@override_settings(WEATHER_PARTITIONING="month", WEATHER_PARTITIONS_AHEAD=1)
+class PartitioningTests(TestCase):
+    def setUp(self):
+        self.searches = create_searches(
+            make_search("Paris", searched_at=NOW),
+            make_search("Lyon", searched_at=NOW + timedelta(days=30)),
+        )
+        self.assertTrue(partitions.convert_to_partitioned())
+
+    def names(self):
+        return [name for name, _, _ in partitions.list_partitions()]
+
+    def test_conversion_keeps_rows_and_ids(self):
+        self.assertTrue(partitions.is_partitioned())
+        self.assertFalse(partitions.convert_to_partitioned())
+        self.assertEqual(self.names()[0], "weather_weathersearch_p202607")
+        self.assertEqual(
+            list(WeatherSearch.objects.order_by("id").values_list("id", flat=True)),
+            [search.id for search in self.searches],
+        )
+
+        (later,) = create_searches(make_search("Nice"))
+        self.assertGreater(later.id, self.searches[-1].id)
+
+    def test_rows_outside_the_partitions_are_moved_out_of_the_default(self):
+        (future,) = create_searches(make_search("Nice", searched_at=utc(2030, 3, 5)))
+
+        created = partitions.ensure_partitions()
+
+        self.assertIn("weather_weathersearch_p203003", created)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partitions.DEFAULT_PARTITION}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertTrue(WeatherSearch.objects.filter(pk=future.pk).exists())
+
+    def test_expired_partitions_are_dropped_whole(self):
+        dropped = partitions.drop_partitions_before(utc(2026, 8, 1))
+
+        self.assertEqual(dropped, ["weather_weathersearch_p202607"])
+        self.assertEqual(
+            list(WeatherSearch.objects.values_list("id", flat=True)), [self.searches[1].id]
+        )
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from weather.ratelimit import SharedTokenBucket, TokenBucket
+
+REDIS = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://redis.invalid:6379/0",
+    },
+}
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=1, capacity=2)
+
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+
+        bucket._updated_at -= 1
+        self.assertTrue(bucket.acquire(timeout=0))
+
+
+@override_settings(CACHES=REDIS)
+class SharedTokenBucketTests(SimpleTestCase):
+    def make_bucket(self, alias="shared"):
+        self.fallback = mock.Mock(spec=TokenBucket)
+        return SharedTokenBucket(
+            alias, "test:ratelimit", rate=1, capacity=2, fallback=self.fallback
+        )
+
+    def test_without_shared_cache_uses_the_local_bucket(self):
+        bucket = self.make_bucket(alias=None)
+        bucket.acquire(timeout=3)
+        self.fallback.acquire.assert_called_once_with(3)
+
+    @override_settings(CACHES={"default": REDIS["default"], "shared": REDIS["default"]})
+    def test_non_redis_cache_uses_the_local_bucket(self):
+        bucket = self.make_bucket()
+        bucket.acquire()
+        self.fallback.acquire.assert_called_once_with(None)
+
+    def test_waits_for_the_next_shared_token(self):
+        bucket = self.make_bucket()
+        with mock.patch.object(bucket, "_take", side_effect=[0.5, 0.0]), mock.patch(
+            "weather.ratelimit.time.sleep"
+        ) as sleep:
+            self.assertTrue(bucket.acquire())
+
+        sleep.assert_called_once_with(0.5)
+        self.fallback.acquire.assert_not_called()
+
+    def test_gives_up_after_timeout(self):
+        bucket = self.make_bucket()
+        with mock.patch.object(bucket, "_take", return_value=5.0), mock.patch(
+            "weather.ratelimit.time.sleep"
+        ), mock.patch("weather.ratelimit.time.monotonic", side_effect=[0.0, 0.0, 1.0]):
+            self.assertFalse(bucket.acquire(timeout=1))
+
+    def test_redis_errors_fall_back_to_the_local_bucket(self):
+        bucket = self.make_bucket()
+        with mock.patch.object(bucket, "_take", side_effect=ConnectionError("refusé")):
+            bucket.acquire()
+        self.fallback.acquire.assert_called_once_with(None)
+
+    def test_script_receives_the_prefixed_key_and_bucket_settings(self):
+        bucket = self.make_bucket()
+        client = mock.Mock()
+        client.register_script.return_value.return_value = b"0"
+        with mock.patch(
+            "django.core.cache.backends.redis.RedisCacheClient.get_client", return_value=client
+        ), mock.patch("django.core.cache.backends.redis.RedisCacheClient.__init__", return_value=None):
+            self.assertEqual(bucket._take(), 0.0)
+
+        client.register_script.return_value.assert_called_once_with(
+            keys=[":1:test:ratelimit"], args=[1.0, 2.0]
+        )
@@ -0,0 +1,97 @@
+import json
+import uuid
+from unittest import mock
+
+from django.core.cache import caches
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from weather import responses
+from weather.responses import (
+    SEARCH_FIELDS,
+    FastJsonResponse,
+    project_rows,
+    requested_fields,
+    search_serializer,
+    weather_result,
+)
+
+from .utils import NOW, api_payload, create_searches, make_search
+
+
+class SerializationTests(SimpleTestCase):
+    def test_json_fallback_matches_orjson_rendering(self):
+        public_id = uuid.UUID("12345678-1234-5678-1234-567812345678")
+        data = {"searched_at": NOW, "public_id": public_id, "city": "Zürich"}
+
+        with mock.patch.object(responses, "orjson", None):
+            encoded = responses.dumps(data)
+
+        self.assertEqual(
+            json.loads(encoded),
+            {"searched_at": NOW.isoformat(), "public_id": str(public_id), "city": "Zürich"},
+        )
+        self.assertIn("Zürich".encode("utf-8"), encoded)
+
+    def test_unsafe_data_must_be_allowed(self):
+        with self.assertRaises(TypeError):
+            FastJsonResponse([1, 2])
+        self.assertEqual(FastJsonResponse([1, 2], safe=False)["Content-Type"], "application/json")
+
+    def test_requested_fields(self):
+        self.assertEqual(requested_fields(QueryDict(), SEARCH_FIELDS), SEARCH_FIELDS)
+        self.assertEqual(
+            requested_fields(QueryDict("fields=city, temperature,city"), SEARCH_FIELDS),
+            ("city", "temperature"),
+        )
+        for value in ("fields=password", "fields=,"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                requested_fields(QueryDict(value), SEARCH_FIELDS)
+
+    def test_serializer_and_projection(self):
+        search = make_search("Paris", temperature=21.5)
+        self.assertEqual(search_serializer(("city",))(search), {"city": "Paris"})
+        self.assertEqual(
+            search_serializer(("city", "temperature"))(search),
+            {"city": "Paris", "temperature": 21.5},
+        )
+
+        rows = [{"id": 1, "searched_at": NOW, "city": "Paris", "archived": True}]
+        self.assertEqual(project_rows(rows, ("city",)), [{"city": "Paris", "archived": True}])
+        self.assertIs(project_rows(rows, ("id", "searched_at")), rows)
+
+    def test_slim_result_drops_the_upstream_payload(self):
+        search = make_search("Paris")
+        self.assertEqual(
+            weather_result({"name": "Paris"}, search, ("city",), slim=True, query={"city": "Paris"}),
+            {"query": {"city": "Paris"}, "saved_record": {"city": "Paris"}},
+        )
+
+
+@override_settings(
+    WEATHER_WRITE_BEHIND_MODE="off", WEATHER_CACHE_L2_ALIAS=None, WEATHER_EDGE_CACHE_URL=""
+)
+class FieldsParameterTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_history_with_fields(self):
+        create_searches(make_search("Paris"), make_search("Lyon"))
+
+        response = self.client.get("/api/v1/history/", {"fields": "city"})
+
+        self.assertEqual(response.json(), [{"city": "Lyon"}, {"city": "Paris"}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/v1/history/", {"fields": "city,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_slim_weather_with_fields(self):
+        with mock.patch(
+            "weather.api_views.get_current_weather", return_value=api_payload("Paris", "FR")
+        ):
+            response = self.client.get(
+                "/api/v1/weather/", {"city": "Paris", "slim": "1", "fields": "city,temperature"}
+            )
+
+        self.assertEqual(response.json(), {"saved_record": {"city": "Paris", "temperature": 21.5}})
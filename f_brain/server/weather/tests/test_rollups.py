@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+
+from weather.models import ProcessingWatermark, WeatherDailyRollup, WeatherHourlyRollup
+from weather.rollups import WATERMARK_NAME, update_rollups
+
+from .utils import NOW, create_searches, make_search
+
+
+@override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=0)
+class UpdateRollupsTests(TestCase):
+    def hourly(self, hour=NOW):
+        return WeatherHourlyRollup.objects.get(city="paris", country="FR", hour=hour)
+
+    def test_hourly_and_daily_aggregates(self):
+        create_searches(
+            make_search("Paris", temperature=10, humidity=40),
+            make_search("paris", searched_at=NOW + timedelta(minutes=30), temperature=20, humidity=60),
+            make_search("Paris", searched_at=NOW + timedelta(hours=2), temperature=30),
+            make_search("Lyon", temperature=25),
+        )
+
+        self.assertEqual(update_rollups(), 4)
+
+        hourly = self.hourly()
+        self.assertEqual(hourly.search_count, 2)
+        self.assertEqual(
+            (hourly.temperature_sum, hourly.temperature_min, hourly.temperature_max),
+            (30, 10, 20),
+        )
+        self.assertEqual((hourly.humidity_min, hourly.humidity_max), (40, 60))
+        daily = WeatherDailyRollup.objects.get(city="paris", country="FR", day=NOW.date())
+        self.assertEqual((daily.search_count, daily.temperature_max), (3, 30))
+
+    def test_each_search_is_counted_once_across_runs_and_batches(self):
+        create_searches(make_search(temperature=10), make_search(temperature=20))
+        self.assertEqual(update_rollups(batch_size=1, max_batches=1), 1)
+        self.assertEqual(update_rollups(batch_size=1), 1)
+        self.assertEqual(update_rollups(), 0)
+
+        (later,) = create_searches(make_search(temperature=5))
+        self.assertEqual(update_rollups(), 1)
+
+        hourly = self.hourly()
+        self.assertEqual(hourly.search_count, 3)
+        self.assertEqual((hourly.temperature_sum, hourly.temperature_min), (35, 5))
+        self.assertEqual(ProcessingWatermark.objects.get(name=WATERMARK_NAME).position, later.id)
+
+    @override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=3600)
+    def test_recent_searches_wait_for_the_settle_delay(self):
+        create_searches(make_search())
+
+        self.assertEqual(update_rollups(), 0)
+        self.assertFalse(WeatherHourlyRollup.objects.exists())
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from weather.ingest import save_searches
+from weather.models import AlertNotification, AlertSubscription, OutboxEvent, ProcessingWatermark
+from weather.subscriptions import WATERMARK_NAME, match_new_searches
+
+from .utils import NOW, create_searches, make_search
+
+
+@override_settings(
+    WEATHER_WATERMARK_SETTLE_SECONDS=0,
+    WEATHER_ALERT_MATCH_TERMS=2,
+    WEATHER_EDGE_CACHE_URL="",
+)
+class MatchNewSearchesTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("alice", "alice@example.com")
+
+    def subscribe(self, **values):
+        fields = {"city": "Paris", "metric": "temperature", "operator": "gte", "threshold": 30}
+        fields.update(values)
+        return AlertSubscription.objects.create(user=self.user, **fields)
+
+    def position(self):
+        return ProcessingWatermark.objects.get(name=WATERMARK_NAME).position
+
+    def test_ingest_writes_no_subscription_event(self):
+        self.subscribe()
+        save_searches([make_search(temperature=35)])
+        self.assertFalse(
+            OutboxEvent.objects.filter(task_name="weather.tasks.match_alert_subscriptions").exists()
+        )
+
+    def test_without_subscriptions_the_position_advances_without_matching(self):
+        (search,) = create_searches(make_search(temperature=35))
+
+        self.assertEqual(match_new_searches(), (0, 0))
+        self.assertEqual(self.position(), search.id)
+
+    def test_notifies_each_subscription_once_per_window(self):
+        hot = self.subscribe()
+        self.subscribe(operator="lte", threshold=0)
+        anywhere = self.subscribe(city=" LYON ", metric="wind_speed", threshold=10)
+        elsewhere = self.subscribe(city="lyon", country="us", metric="wind_speed", threshold=10)
+        searches = create_searches(
+            make_search("Paris", temperature=35),
+            make_search("paris", temperature=36),
+            make_search("Lyon", wind_speed=12),
+            make_search("Nice", temperature=45),
+        )
+
+        self.assertEqual(match_new_searches(batch_size=2), (2, 4))
+
+        notifications = {n.subscription_id: n for n in AlertNotification.objects.all()}
+        self.assertEqual(set(notifications), {hot.id, anywhere.id})
+        self.assertNotIn(elsewhere.id, notifications)
+        self.assertEqual(notifications[hot.id].search_id, searches[1].id)
+        self.assertEqual(notifications[hot.id].value, 36)
+        self.assertEqual(notifications[hot.id].searched_at, NOW)
+        self.assertTrue(
+            OutboxEvent.objects.filter(task_name="weather.tasks.send_alert_notifications").exists()
+        )
+        self.assertEqual(self.position(), searches[-1].id)
+
+        # Déjà émise dans la fenêtre : pas de seconde notification
+        create_searches(make_search("Paris", temperature=40))
+        match_new_searches()
+        self.assertEqual(AlertNotification.objects.filter(subscription=hot).count(), 1)
+
+    def test_inactive_subscriptions_are_ignored(self):
+        self.subscribe(is_active=False)
+        create_searches(make_search(temperature=35))
+
+        match_new_searches()
+        self.assertFalse(AlertNotification.objects.exists())
@@ -0,0 +1,79 @@
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+from weather.task_results import (
+    REFERENCE_KEY,
+    _result_path,
+    compact_result,
+    load_result,
+    sweep_expired_results,
+)
+
+
+class TaskResultsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(
+            WEATHER_TASK_RESULT_DIR=directory.name, WEATHER_TASK_RESULT_MAX_BYTES=100
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_small_result_is_kept_as_is(self):
+        result = {"status": "ok", "count": 3}
+        self.assertIs(compact_result(result), result)
+        self.assertEqual(load_result(result), result)
+
+    def test_large_result_is_moved_to_a_file(self):
+        result = {"status": "ok", "count": 200, "cities": [f"Ville {i}" for i in range(50)]}
+
+        compacted = compact_result(result)
+
+        self.assertEqual(compacted["status"], "ok")
+        self.assertEqual(compacted["count"], 200)
+        self.assertNotIn("cities", compacted)
+        self.assertEqual(Path(compacted[REFERENCE_KEY]).parent, self.directory)
+        self.assertGreater(compacted["result_bytes"], 100)
+        self.assertEqual(load_result(compacted), result)
+
+    def test_result_file_is_named_after_the_task(self):
+        task = SimpleNamespace(name="weather.tasks.export_searches", request=SimpleNamespace(id="abc"))
+        self.assertEqual(_result_path(task), self.directory / "export_searches-abc.json")
+
+    def test_sweep_deletes_expired_rows_in_batches_and_old_files(self):
+        TaskResult.objects.bulk_create(
+            [TaskResult(task_id=f"task-{i}", status="SUCCESS") for i in range(5)]
+        )
+        old = timezone.now() - timedelta(days=3)
+        TaskResult.objects.filter(task_id__in=["task-0", "task-1", "task-2"]).update(date_done=old)
+        old_file = self.directory / "old.json"
+        old_file.write_text("{}")
+        os.utime(old_file, (old.timestamp(), old.timestamp()))
+        recent_file = self.directory / "recent.json"
+        recent_file.write_text("{}")
+
+        report = sweep_expired_results(expires=86400, chunk_size=2, max_batches=1)
+        self.assertEqual((report["deleted_count"], report["complete"]), (2, False))
+        self.assertEqual(report["files_deleted"], 1)
+        self.assertFalse(old_file.exists())
+        self.assertTrue(recent_file.exists())
+
+        report = sweep_expired_results(expires=timedelta(days=1), chunk_size=2, max_batches=5)
+        self.assertEqual((report["deleted_count"], report["complete"]), (1, True))
+        self.assertEqual(TaskResult.objects.count(), 2)
+
+    def test_sweep_disabled_without_expiry(self):
+        TaskResult.objects.create(task_id="task", status="SUCCESS")
+        TaskResult.objects.update(date_done=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(sweep_expired_results(expires=0)["deleted_count"], 0)
+        self.assertEqual(TaskResult.objects.count(), 1)
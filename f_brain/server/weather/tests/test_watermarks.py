@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from weather.models import WeatherSearch
+from weather.watermarks import (
+    advance_watermark,
+    get_watermark,
+    lock_watermark,
+    settled_position,
+    swap_watermark,
+)
+
+from .utils import create_searches, make_search
+
+
+@override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=30)
+class SettledPositionTests(TestCase):
+    def test_stops_before_recently_inserted_rows(self):
+        old, recent = create_searches(make_search(), make_search())
+        WeatherSearch.objects.filter(id=old.id).update(
+            recorded_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        watermark = lock_watermark("test")
+        self.assertEqual(settled_position(watermark, WeatherSearch), old.id)
+
+        WeatherSearch.objects.filter(id=recent.id).update(
+            recorded_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(settled_position(watermark, WeatherSearch), recent.id)
+
+    def test_never_goes_back(self):
+        (search,) = create_searches(make_search())
+        watermark = lock_watermark("test")
+        advance_watermark(watermark, search.id + 10)
+
+        self.assertEqual(settled_position(watermark, WeatherSearch), search.id + 10)
+        self.assertEqual(lock_watermark("test").position, search.id + 10)
+
+    @override_settings(WEATHER_WATERMARK_SETTLE_SECONDS=0)
+    def test_inserted_rows_settle_without_waiting(self):
+        first, last = create_searches(make_search(), make_search())
+        watermark = lock_watermark("test")
+        self.assertEqual(settled_position(watermark, WeatherSearch), last.id)
+
+
+class SwapWatermarkTests(TestCase):
+    def test_only_advances_from_the_position_read(self):
+        first = get_watermark("test")
+        second = get_watermark("test")
+
+        self.assertTrue(swap_watermark(first, 10))
+        self.assertFalse(swap_watermark(second, 5))
+        self.assertEqual(get_watermark("test").position, 10)
@@ -0,0 +1,133 @@
+import json
+import signal
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from weather.ingest import WriteBehindBuffer, save_rows, search_to_row
+from weather.models import WeatherSearch
+
+from .utils import make_search
+
+
+class WriteBehindBufferTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_dir = Path(directory.name)
+        self.written = []
+        self.failing = set()
+
+    def flush_batch(self, rows):
+        if any(row["city"] in self.failing for row in rows):
+            raise RuntimeError("insertion impossible")
+        self.written.extend(row["city"] for row in rows)
+
+    def make_buffer(self, **kwargs):
+        options = {"batch_size": 2, "interval": 60, "max_rows": 10, "max_attempts": 2}
+        options.update(kwargs)
+        buffer = WriteBehindBuffer(self.flush_batch, spool_dir=self.spool_dir, **options)
+        # Pas de thread d'arrière-plan : les vidages sont appelés par le test
+        buffer._ensure_thread = lambda: None
+        return buffer
+
+    def rows(self, *cities):
+        return [{"city": city} for city in cities]
+
+    def spooled(self, directory):
+        return [
+            [json.loads(line)["city"] for line in path.read_text().splitlines()]
+            for path in sorted(directory.glob("*.jsonl"))
+        ]
+
+    def test_flush_writes_in_batches(self):
+        buffer = self.make_buffer()
+        buffer.add(self.rows("a", "b", "c"))
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(self.written, ["a", "b", "c"])
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_failing_batch_does_not_block_the_others(self):
+        buffer = self.make_buffer()
+        self.failing = {"a"}
+        buffer.add(self.rows("a", "b", "c", "d"))
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(self.written, ["c", "d"])
+        self.assertEqual(buffer.pending(), 2)
+
+        # Deuxième échec : lot déposé dans le dead-letter, tampon vidé
+        buffer.add(self.rows("e"))
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(self.spooled(buffer.dead_letter_dir), [["a", "b"]])
+
+        self.failing = set()
+        self.assertEqual(buffer.replay_spool(), 0)
+        self.assertEqual(buffer.replay_spool(dead_letter=True), 2)
+        self.assertEqual(self.written, ["c", "d", "e", "a", "b"])
+        self.assertEqual(self.spooled(buffer.dead_letter_dir), [])
+
+    def test_full_buffer_inserts_synchronously(self):
+        buffer = self.make_buffer(max_rows=3)
+        buffer.add(self.rows("a", "b"))
+        buffer.add(self.rows("c", "d"))
+
+        self.assertEqual(self.written, ["c", "d"])
+        self.assertEqual(buffer.pending(), 2)
+
+    def test_shutdown_spools_what_cannot_be_written(self):
+        buffer = self.make_buffer()
+        self.failing = {"a"}
+        buffer.add(self.rows("a", "b", "c"))
+
+        buffer.shutdown()
+        self.assertEqual(self.written, ["c"])
+        self.assertEqual(self.spooled(self.spool_dir), [["a", "b"]])
+
+        self.failing = set()
+        replaying = self.make_buffer()
+        self.assertEqual(replaying.replay_spool(), 2)
+        self.assertEqual(self.written, ["c", "a", "b"])
+        self.assertEqual(self.spooled(self.spool_dir), [])
+
+    def test_failed_replay_keeps_the_spool_file(self):
+        buffer = self.make_buffer()
+        buffer.add(self.rows("a"))
+        buffer.spool_pending()
+
+        self.failing = {"a"}
+        self.assertEqual(buffer.replay_spool(), 0)
+        self.assertEqual(self.spooled(self.spool_dir), [["a"]])
+
+    def test_signal_spools_then_calls_previous_handler(self):
+        buffer = self.make_buffer()
+        buffer.add(self.rows("a"))
+        previous = mock.Mock()
+        handlers = {}
+
+        with mock.patch("weather.ingest.signal.getsignal", return_value=previous), mock.patch(
+            "weather.ingest.signal.signal", side_effect=handlers.__setitem__
+        ):
+            buffer.install_signal_handlers(signals=(signal.SIGTERM,))
+        handlers[signal.SIGTERM](signal.SIGTERM, None)
+
+        previous.assert_called_once_with(signal.SIGTERM, None)
+        self.assertEqual(self.spooled(self.spool_dir), [["a"]])
+        self.assertEqual(buffer.pending(), 0)
+
+
+@override_settings(WEATHER_EDGE_CACHE_HOSTS=[])
+class SaveRowsTests(TestCase):
+    def test_rows_round_trip_to_the_database(self):
+        search = make_search("Lyon")
+        row = json.loads(json.dumps(search_to_row(search)))
+
+        (created,) = save_rows([row])
+
+        saved = WeatherSearch.objects.get(id=created.id)
+        self.assertEqual(saved.public_id, search.public_id)
+        self.assertEqual(saved.searched_at, search.searched_at)
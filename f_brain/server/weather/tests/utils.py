@@ -0,0 +1,38 @@
+from datetime import datetime, timezone as dt_timezone
+
+from weather.models import WeatherSearch
+
+NOW = datetime(2026, 7, 14, 12, tzinfo=dt_timezone.utc)
+
+
+def make_search(city="Paris", country="FR", searched_at=NOW, **values):
+    """
+    Recherche non enregistrée, mesures par défaut tempérées
+    """
+    fields = {
+        "temperature": 20.0,
+        "humidity": 50,
+        "wind_speed": 3.0,
+        "pressure": 1013,
+        "description": "ciel dégagé",
+        "icon": "01d",
+    }
+    fields.update(values)
+    return WeatherSearch(city=city, country=country, searched_at=searched_at, **fields)
+
+
+def create_searches(*searches):
+    return WeatherSearch.objects.bulk_create(searches)
+
+
+def api_payload(city, country):
+    """
+    Réponse OpenWeatherMap minimale pour weather_search_from_payload()
+    """
+    return {
+        "name": city,
+        "sys": {"country": country},
+        "main": {"temp": 21.5, "humidity": 40, "pressure": 1012},
+        "wind": {"speed": 2.0},
+        "weather": [{"description": "ciel dégagé", "icon": "01d"}],
+    }
@@ -1,99 +1,141 @@
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
 import json
 import requests
-import os
-from dotenv import load_dotenv
+from .conditional import (
+    history_cache_control,
+    history_validators,
+    not_modified,
+    record_cache_control,
+    record_etag,
+    set_validators,
+)
+from .history import clamp_limit, history_queryset, paginate, set_next_page
+from .ingest import record_search
 from .models import WeatherSearch
+from .responses import (
+    SEARCH_FIELDS,
+    FastJsonResponse,
+    project_rows,
+    requested_fields,
+    search_serializer,
+)
+from .services import UPSTREAM_ERROR_MESSAGE, WeatherAPIError, get_current_weather
+
+HISTORY_FIELDS = ("id", "city", "country", "temperature", "humidity", "description", "icon", "searched_at")
+RECORD_FIELDS = ("id", "public_id", "city", "country", "temperature", "humidity", "wind_speed", "pressure", "description", "icon", "searched_at")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def record_data(search, fields):
+    """
+    Recherche limitée à `fields`, date au format des endpoints /api/
+    """
+    data = search_serializer(fields)(search)
+    if "searched_at" in data:
+        data["searched_at"] = data["searched_at"].strftime(DATE_FORMAT)
+    return data
 
-# Load environment variables
-load_dotenv()
-OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY', 'ee56bd2e1c87bf3900aa88cfd2cee8ac')
 
 @csrf_exempt
 def get_weather(request):
     if request.method == "GET":
         city = request.GET.get('city')
         if not city:
-            return JsonResponse({"error": "City parameter is required"}, status=400)
-        
-        # Call OpenWeatherMap API
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHERMAP_API_KEY}&units=metric"
-        response = requests.get(url)
-        
-        if response.status_code == 200:
-            data = response.json()
-            weather_data = {
-                "city": data["name"],
-                "country": data["sys"]["country"],
-                "temperature": round(data["main"]["temp"], 1),
-                "humidity": data["main"]["humidity"],
-                "wind_speed": data["wind"]["speed"],
-                "pressure": data["main"]["pressure"],
-                "description": data["weather"][0]["description"],
-                "icon": data["weather"][0]["icon"],
-            }
-            
-            # Save search to database
-            search = WeatherSearch.objects.create(
-                city=weather_data["city"],
-                country=weather_data["country"],
-                temperature=weather_data["temperature"],
-                humidity=weather_data["humidity"],
-                wind_speed=weather_data["wind_speed"],
-                pressure=weather_data["pressure"],
-                description=weather_data["description"],
-                icon=weather_data["icon"]
+            return FastJsonResponse({"error": "City parameter is required"}, status=400)
+
+        # Météo actuelle (cache partagé, puis OpenWeatherMap)
+        try:
+            data = get_current_weather(city)
+        except WeatherAPIError as e:
+            return FastJsonResponse({"error": f"Could not retrieve weather data: {e.message}"}, status=e.status_code)
+        except requests.exceptions.RequestException:
+            return FastJsonResponse(
+                {"error": f"Could not retrieve weather data: {UPSTREAM_ERROR_MESSAGE}"},
+                status=502,
             )
-            
-            weather_data["id"] = search.id
-            return JsonResponse(weather_data)
-        else:
-            return JsonResponse({"error": f"Could not retrieve weather data: {response.json()['message']}"}, status=response.status_code)
-    
-    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+        weather_data = {
+            "city": data["name"],
+            "country": data["sys"]["country"],
+            "temperature": round(data["main"]["temp"], 1),
+            "humidity": data["main"]["humidity"],
+            "wind_speed": data["wind"]["speed"],
+            "pressure": data["main"]["pressure"],
+            "description": data["weather"][0]["description"],
+            "icon": data["weather"][0]["icon"],
+        }
+
+        # Save search to database (possibly deferred, see weather/ingest.py)
+        search = record_search(WeatherSearch(
+            city=weather_data["city"],
+            country=weather_data["country"],
+            temperature=weather_data["temperature"],
+            humidity=weather_data["humidity"],
+            wind_speed=weather_data["wind_speed"],
+            pressure=weather_data["pressure"],
+            description=weather_data["description"],
+            icon=weather_data["icon"]
+        ))
+
+        weather_data["id"] = search.id
+        weather_data["public_id"] = str(search.public_id)
+        return FastJsonResponse(weather_data)
+
+    return FastJsonResponse({"error": "Method not allowed"}, status=405)
 
 def get_history(request):
     if request.method == "GET":
-        limit = int(request.GET.get('limit', 10))
-        history = WeatherSearch.objects.all()[:limit]
-        
-        results = [
-            {
-                "id": entry.id,
-                "city": entry.city,
-                "country": entry.country,
-                "temperature": entry.temperature,
-                "humidity": entry.humidity,
-                "description": entry.description,
-                "icon": entry.icon,
-                "searched_at": entry.searched_at.strftime("%Y-%m-%d %H:%M:%S"),
-            }
-            for entry in history
-        ]
-        return JsonResponse(results, safe=False)
+        # Pas de nouvelle recherche depuis la version du client : 304
+        etag, last_modified = history_validators()
+        response = not_modified(request, etag, last_modified, **history_cache_control())
+        if response is not None:
+            return response
+
+        # Pages bornées, curseur de la page suivante dans X-Next-Cursor
+        limit = clamp_limit(request.GET.get('limit'))
+        try:
+            fields = requested_fields(request.GET, SEARCH_FIELDS, default=HISTORY_FIELDS)
+            rows, next_cursor = paginate(
+                history_queryset(WeatherSearch.objects.all(), request.GET, fields, limit),
+                limit,
+            )
+        except ValueError as e:
+            return FastJsonResponse({"error": str(e)}, status=400)
+
+        results = project_rows(rows, fields)
+        if "searched_at" in fields:
+            for entry in results:
+                entry["searched_at"] = entry["searched_at"].strftime(DATE_FORMAT)
+        response = set_next_page(FastJsonResponse(results, safe=False), request, next_cursor)
+        return set_validators(response, etag, last_modified, **history_cache_control())
     
-    return JsonResponse({"error": "Method not allowed"}, status=405)
+    return FastJsonResponse({"error": "Method not allowed"}, status=405)
+
+def get_weather_by_id(request, search_id=None, public_id=None):
+    if public_id is not None:
+        searches = WeatherSearch.objects.filter(public_id=public_id)
+    else:
+        searches = WeatherSearch.objects.filter(pk=search_id)
+    # Recherche immuable : ETag connu sans lire la ligne, 304 si elle existe encore
+    if not searches.exists():
+        return FastJsonResponse({"error": "Weather search not found"}, status=404)
+    etag = record_etag(public_id if public_id is not None else search_id)
+    response = not_modified(request, etag=etag, **record_cache_control())
+    if response is not None:
+        return response
 
-def get_weather_by_id(request, search_id):
     try:
-        search = WeatherSearch.objects.get(pk=search_id)
-        weather_data = {
-            "id": search.id,
-            "city": search.city,
-            "country": search.country,
-            "temperature": search.temperature,
-            "humidity": search.humidity,
-            "wind_speed": search.wind_speed,
-            "pressure": search.pressure,
-            "description": search.description,
-            "icon": search.icon,
-            "searched_at": search.searched_at.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        return JsonResponse(weather_data)
+        fields = requested_fields(request.GET, SEARCH_FIELDS, default=RECORD_FIELDS)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    try:
+        search = searches.get()
+        weather_data = record_data(search, fields)
+        return set_validators(FastJsonResponse(weather_data), etag, **record_cache_control())
     except WeatherSearch.DoesNotExist:
-        return JsonResponse({"error": "Weather search not found"}, status=404)
+        return FastJsonResponse({"error": "Weather search not found"}, status=404)
 
 def dashboard(request):
     return render(request, 'weather/dashboard.html')
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Traitements incrémentaux sur WeatherSearch, repérés par un id (high-water mark).
+
+Un id plus petit que le maximum visible peut encore apparaître : il a été
+alloué par une transaction pas encore validée. On ne traite donc que jusqu'au
+plus grand id inséré (recorded_at, fixé par la base) il y a au moins
+WEATHER_WATERMARK_SETTLE_SECONDS secondes : les transactions qui ont pu
+allouer un id plus petit sont alors terminées.
+
+Usage (dans transaction.atomic(), pour avancer la position en même temps que
+les écritures du traitement) :
+
+    watermark = lock_watermark("rollups")
+    end = settled_position(watermark, WeatherSearch)
+    ... traiter les lignes id__gt=watermark.position, id__lte=end ...
+    advance_watermark(watermark, last_id)
+
+Un traitement long (export de fichier) lit la position avec get_watermark,
+travaille hors transaction puis l'avance avec swap_watermark.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ProcessingWatermark
+
+
+def lock_watermark(name):
+    """
+    Position du traitement `name`, verrouillée jusqu'à la fin de la transaction
+    """
+    watermark, _ = ProcessingWatermark.objects.select_for_update().get_or_create(
+        name=name
+    )
+    return watermark
+
+
+def get_watermark(name):
+    """
+    Position du traitement `name`, sans verrou
+    """
+    watermark, _ = ProcessingWatermark.objects.get_or_create(name=name)
+    return watermark
+
+
+def settled_position(watermark, model):
+    """
+    Plus grand id qui peut être traité sans sauter de ligne encore invisible.
+    Parcourt la clé primaire depuis la fin : seules les lignes des dernières
+    secondes sont lues.
+    """
+    settle = timedelta(seconds=settings.WEATHER_WATERMARK_SETTLE_SECONDS)
+    last_id = (
+        model.objects.filter(
+            id__gt=watermark.position, recorded_at__lte=timezone.now() - settle
+        )
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return max(watermark.position, last_id or 0)
+
+
+def advance_watermark(watermark, position):
+    """
+    Enregistre la nouvelle position
+    """
+    watermark.position = max(watermark.position, position)
+    watermark.save(update_fields=["position", "updated_at"])
+
+
+def swap_watermark(watermark, position):
+    """
+    Avance la position lue par get_watermark, sauf si un autre traitement l'a
+    déplacée entre-temps (compare-and-swap) ; retourne True si elle a avancé
+    """
+    swapped = ProcessingWatermark.objects.filter(
+        pk=watermark.pk, position=watermark.position
+    ).update(position=position, updated_at=timezone.now())
+    if swapped:
+        watermark.position = position
+    return bool(swapped)